@@ -0,0 +1,74 @@
+"""expert_scores table
+
+Revision ID: b7e3c1a90f42
+Revises: e0976fa06e9d
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3c1a90f42"
+down_revision: Union[str, Sequence[str], None] = "e0976fa06e9d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "expert_scores",
+        sa.Column("expert_id", sa.BigInteger(), nullable=False),
+        sa.Column("expert_trust", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("expert_distrust", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("community_trust", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "community_distrust", sa.Integer(), server_default="0", nullable=False
+        ),
+        sa.Column("expert_score", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("community_score", sa.Integer(), server_default="0", nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(
+            ["expert_id"], ["expert_profiles.user_vk_id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("expert_id"),
+    )
+    op.create_index(
+        "ix_expert_scores_ranking",
+        "expert_scores",
+        ["expert_score", "community_score"],
+    )
+
+    # Первичное заполнение из существующих голосов
+    op.execute(
+        """
+        INSERT INTO expert_scores (
+            expert_id, expert_trust, expert_distrust,
+            community_trust, community_distrust,
+            expert_score, community_score
+        )
+        SELECT
+            expert_id,
+            SUM(CASE WHEN rating_type = 'expert' AND vote_value = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating_type = 'expert' AND vote_value = -1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating_type = 'community' AND vote_value = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating_type = 'community' AND vote_value = -1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating_type = 'expert' THEN vote_value ELSE 0 END),
+            SUM(CASE WHEN rating_type = 'community' THEN vote_value ELSE 0 END)
+        FROM expert_ratings
+        GROUP BY expert_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_expert_scores_ranking", table_name="expert_scores")
+    op.drop_table("expert_scores")
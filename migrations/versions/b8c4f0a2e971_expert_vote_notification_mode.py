@@ -0,0 +1,34 @@
+"""expert vote notification mode
+
+Revision ID: b8c4f0a2e971
+Revises: a3e9b7d21c64
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b8c4f0a2e971"
+down_revision: Union[str, Sequence[str], None] = "a3e9b7d21c64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "expert_profiles",
+        sa.Column(
+            "vote_notification_mode",
+            sa.Enum("instant", "digest"),
+            server_default="instant",
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("expert_profiles", "vote_notification_mode")
@@ -0,0 +1,53 @@
+"""event_vote_stats table
+
+Revision ID: c4d8e2f61a37
+Revises: b7e3c1a90f42
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c4d8e2f61a37"
+down_revision: Union[str, Sequence[str], None] = "b7e3c1a90f42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_vote_stats",
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("votes_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("trust_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("distrust_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("last_vote_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["event_id"], ["events.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("event_id"),
+    )
+
+    # Первичное заполнение из существующих отзывов
+    op.execute(
+        """
+        INSERT INTO event_vote_stats (
+            event_id, votes_count, trust_count, distrust_count, last_vote_at
+        )
+        SELECT
+            event_id,
+            COUNT(*),
+            SUM(CASE WHEN rating_snapshot = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating_snapshot = -1 THEN 1 ELSE 0 END),
+            MAX(created_at)
+        FROM event_feedbacks
+        WHERE event_id IS NOT NULL
+        GROUP BY event_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("event_vote_stats")
@@ -0,0 +1,29 @@
+"""expert rating previous value
+
+Revision ID: c9d2e4f6a813
+Revises: b8c4f0a2e971
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c9d2e4f6a813"
+down_revision: Union[str, Sequence[str], None] = "b8c4f0a2e971"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "expert_ratings",
+        sa.Column("previous_value", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("expert_ratings", "previous_value")
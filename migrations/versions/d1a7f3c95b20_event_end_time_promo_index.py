@@ -0,0 +1,48 @@
+"""event end_time and promo availability index
+
+Revision ID: d1a7f3c95b20
+Revises: c4d8e2f61a37
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d1a7f3c95b20"
+down_revision: Union[str, Sequence[str], None] = "c4d8e2f61a37"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "events", sa.Column("end_time", sa.TIMESTAMP(timezone=True), nullable=True)
+    )
+    op.execute(
+        "UPDATE events SET end_time = "
+        "event_date + INTERVAL COALESCE(duration_minutes, 0) MINUTE"
+    )
+    op.alter_column(
+        "events",
+        "end_time",
+        existing_type=sa.TIMESTAMP(timezone=True),
+        nullable=False,
+    )
+
+    # Старые записи могли сохраниться без нормализации
+    op.execute("UPDATE events SET promo_word = UPPER(TRIM(promo_word))")
+
+    op.create_index(
+        "ix_events_promo_status_end",
+        "events",
+        ["promo_word", "status", "end_time"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_promo_status_end", table_name="events")
+    op.drop_column("events", "end_time")
@@ -0,0 +1,33 @@
+"""event lifecycle indexes
+
+Revision ID: e5b9c0d47a18
+Revises: d1a7f3c95b20
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b9c0d47a18"
+down_revision: Union[str, Sequence[str], None] = "d1a7f3c95b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_events_expert_status_end",
+        "events",
+        ["expert_id", "status", "end_time"],
+    )
+    op.create_index("ix_events_status_end", "events", ["status", "end_time"])
+    op.create_index("ix_events_status_date", "events", ["status", "event_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_status_date", table_name="events")
+    op.drop_index("ix_events_status_end", table_name="events")
+    op.drop_index("ix_events_expert_status_end", table_name="events")
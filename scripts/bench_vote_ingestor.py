@@ -0,0 +1,183 @@
+"""
+Замер записи голосов: поштучный vote_crud.write_vote против пачек
+VoteIngestor при одинаковой конкурентной нагрузке.
+
+Пишет в базу из DATABASE_URL — запускайте только на тестовой. Эксперты,
+голосующие и мероприятия создаются в диапазоне vk_id от --id-base и
+удаляются (каскадом) после каждого режима.
+
+Запуск: python -m scripts.bench_vote_ingestor --votes 2000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event
+
+from src.core.dependencies import AsyncSessionLocal, engine
+from src.crud import vote_crud
+from src.models import Event, ExpertProfile, User
+from src.services.vote_ingestor import VoteIngestor
+
+
+async def _setup(id_base: int, experts: int, voters: int) -> tuple[list, list]:
+    expert_ids = list(range(id_base, id_base + experts))
+    voter_ids = list(range(id_base + experts, id_base + experts + voters))
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            User(vk_id=vk_id, first_name="Bench", last_name=str(vk_id))
+            for vk_id in expert_ids + voter_ids
+        )
+        await db.flush()
+        db.add_all(
+            ExpertProfile(user_vk_id=vk_id, status="approved") for vk_id in expert_ids
+        )
+        await db.flush()
+        events = [
+            Event(
+                expert_id=vk_id,
+                name="Bench",
+                promo_word=f"BENCH{vk_id}",
+                event_date=now,
+                duration_minutes=60,
+                end_time=now + timedelta(minutes=60),
+                status="approved",
+            )
+            for vk_id in expert_ids
+        ]
+        db.add_all(events)
+        await db.commit()
+        return [(e.expert_id, e.id) for e in events], voter_ids
+
+
+async def _cleanup(id_base: int, count: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(User).where(User.vk_id.between(id_base, id_base + count - 1))
+        )
+        await db.commit()
+
+
+def _make_votes(events: list, voter_ids: list, count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    votes = []
+    for _ in range(count):
+        expert_id, event_id = rng.choice(events)
+        votes.append(
+            {
+                "expert_id": expert_id,
+                "voter_id": rng.choice(voter_ids),
+                "rating_type": "expert",
+                "vote_value": rng.choice((1, -1)),
+                "comment": "bench",
+                "event_id": event_id,
+            }
+        )
+    return votes
+
+
+async def _write_direct(vote: dict):
+    async with AsyncSessionLocal() as db:
+        await vote_crud.write_vote(db, **vote)
+
+
+async def _measure(write, votes: list[dict], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(vote):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await write(vote)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    commits = 0
+
+    def on_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    event.listen(engine.sync_engine, "commit", on_commit)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(vote) for vote in votes))
+    finally:
+        elapsed = time.perf_counter() - started
+        event.remove(engine.sync_engine, "commit", on_commit)
+
+    latencies.sort()
+    return {
+        "votes_per_second": round(len(latencies) / elapsed, 1),
+        "commits": commits,
+        "errors": errors,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else 0,
+        "p95_ms": (
+            round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1)
+            if latencies
+            else 0
+        ),
+    }
+
+
+async def run(args):
+    total_users = args.experts + args.voters
+    results = {}
+    for mode in ("direct", "batched"):
+        try:
+            events, voter_ids = await _setup(args.id_base, args.experts, args.voters)
+            votes = _make_votes(events, voter_ids, args.votes, args.seed)
+            if mode == "direct":
+                results[mode] = await _measure(_write_direct, votes, args.concurrency)
+            else:
+                ingestor = VoteIngestor(
+                    AsyncSessionLocal, args.batch_size, args.batch_delay_ms
+                )
+                try:
+                    results[mode] = await _measure(
+                        lambda vote: ingestor.submit(**vote), votes, args.concurrency
+                    )
+                finally:
+                    await ingestor.stop()
+        finally:
+            await _cleanup(args.id_base, total_users)
+
+    print(
+        f"{args.votes} votes, concurrency {args.concurrency}, "
+        f"{args.experts} experts, {args.voters} voters"
+    )
+    for mode, stats in results.items():
+        print(f"{mode:>8}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m scripts.bench_vote_ingestor")
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--experts", type=int, default=3)
+    parser.add_argument("--voters", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--batch-delay-ms", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--id-base",
+        type=int,
+        default=9_000_000_000,
+        help="первый vk_id служебных пользователей замера",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
-from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional
+
+import orjson
 
 import redis.asyncio as redis
-from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from redis.exceptions import LockError
 from sqlalchemy import and_, select
@@ -14,20 +18,40 @@ from src.core.dependencies import (
     get_current_admin_user,
     get_current_user,
     get_db,
+    get_event_cache,
+    get_leaderboard,
+    get_live_event_state,
+    get_live_tally_broadcaster,
     get_notifier,
     get_redis,
     get_validated_vk_id,
+    get_vote_digest,
+    get_vote_ingestor,
     save_idempotency_result,
 )
-from src.crud import event_crud
-from src.models import Event, ExpertRating, User
+from src.core.pagination import decode_cursor, encode_cursor, should_include_total
+from src.core.profile_cache import invalidate_user_profile
+from src.crud import event_crud, outbox_crud
+from src.models import Event, ExpertRating
 from src.schemas import event_schemas
 from src.schemas.expert_schemas import VotedExpertInfo
 from src.services import excel_generator
+from src.services.event_cache import EventCache
+from src.services.leaderboard import Leaderboard
+from src.services.live_event_state import (
+    EventVoteLimitError,
+    LiveEventState,
+    LiveTallyBroadcaster,
+)
 from src.services.notifier import Notifier
+from src.services.outbox_worker import POST_EVENT_ANNOUNCEMENT
+from src.services.vote_digest import VoteDigest
+from src.services.vote_ingestor import VoteIngestor
 
 router = APIRouter(prefix="/events", tags=["Events & Voting"])
 
+LIVE_HEARTBEAT_SECONDS = 15
+
 
 @router.post("/check-availability", response_model=Dict)
 async def check_event_availability(
@@ -52,7 +76,6 @@ async def create_event(
     event_data: event_schemas.EventCreate,
     db: AsyncSession = Depends(get_db),
     current_user: Dict = Depends(get_current_user),
-    notifier: Notifier = Depends(get_notifier),
     cache: redis.Redis = Depends(get_redis),
 ):
     if not current_user.get("is_expert"):
@@ -94,7 +117,9 @@ async def create_event(
                     db=db, event_data=event_data, expert_id=expert_id
                 )
 
-                await notifier.send_new_event_to_admin(
+                await outbox_crud.enqueue_notification(
+                    db,
+                    "send_new_event_to_admin",
                     event_name=new_event.name,
                     expert_name=current_user.get("first_name"),
                 )
@@ -118,7 +143,7 @@ async def delete_event(
     event_id: int,
     db: AsyncSession = Depends(get_db),
     current_user: Dict = Depends(get_current_user),
-    notifier: Notifier = Depends(get_notifier),
+    event_cache: EventCache = Depends(get_event_cache),
 ):
     expert_id = current_user["vk_id"]
     try:
@@ -128,10 +153,13 @@ async def delete_event(
             and event_to_delete.expert_id == expert_id
             and event_to_delete.wall_post_id
         ):
-            await notifier.delete_wall_post(event_to_delete.wall_post_id)
+            outbox_crud.add_notification(
+                db, "delete_wall_post", post_id=event_to_delete.wall_post_id
+            )
 
+        # Задание на удаление поста коммитится вместе с удалением мероприятия
         success = await event_crud.delete_event_by_id(
-            db=db, event_id=event_id, expert_id=expert_id
+            db=db, event_id=event_id, expert_id=expert_id, event_cache=event_cache
         )
         if not success:
             raise HTTPException(
@@ -148,11 +176,12 @@ async def stop_event_voting(
     event_id: int,
     db: AsyncSession = Depends(get_db),
     current_user: Dict = Depends(get_current_user),
+    event_cache: EventCache = Depends(get_event_cache),
 ):
     expert_id = current_user["vk_id"]
     try:
         updated_event = await event_crud.stop_event_voting(
-            db=db, event_id=event_id, expert_id=expert_id
+            db=db, event_id=event_id, expert_id=expert_id, event_cache=event_cache
         )
         if not updated_event:
             raise HTTPException(
@@ -164,6 +193,63 @@ async def stop_event_voting(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+async def _live_tallies_stream(
+    event_id: int,
+    end_time: datetime,
+    initial: Dict[str, int],
+    broadcaster: LiveTallyBroadcaster,
+) -> AsyncIterator[str]:
+    async with broadcaster.subscribe(event_id) as updates:
+        yield _sse("tallies", initial)
+        while True:
+            remaining = (end_time - datetime.now(timezone.utc)).total_seconds()
+            if remaining <= 0:
+                yield _sse("finished", {})
+                return
+            try:
+                tallies = await asyncio.wait_for(
+                    updates.get(), min(remaining, LIVE_HEARTBEAT_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                # Комментарий SSE не даёт прокси закрыть простаивающее соединение
+                yield ": ping\n\n"
+                continue
+            yield _sse("tallies", tallies)
+
+
+@router.get("/{event_id}/live")
+async def stream_event_live(
+    event_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Dict = Depends(get_current_user),
+    live_state: LiveEventState = Depends(get_live_event_state),
+    broadcaster: LiveTallyBroadcaster = Depends(get_live_tally_broadcaster),
+):
+    """
+    SSE-трансляция счётчиков идущего мероприятия для его эксперта.
+    Обновления приходят из Redis pub/sub после каждого голоса, поэтому
+    открытая панель не опрашивает /events/my.
+    """
+    event = await db.get(Event, event_id)
+    if not event or event.expert_id != current_user["vk_id"]:
+        raise HTTPException(status_code=404, detail="Мероприятие не найдено.")
+    end_time = event.end_time.replace(tzinfo=timezone.utc)
+    # После холодного старта Redis счётчики берутся из MySQL, а не нули
+    initial = await live_state.get_or_seed_tallies(db, event_id, end_time)
+    # Трансляция может длиться часами: соединение с БД ей не нужно
+    await db.close()
+
+    return StreamingResponse(
+        _live_tallies_stream(event_id, end_time, initial, broadcaster),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/my", response_model=List[event_schemas.EventRead])
 async def get_my_events(
     db: AsyncSession = Depends(get_db), current_user: Dict = Depends(get_current_user)
@@ -188,12 +274,15 @@ async def get_my_events(
 @router.post("/vote")
 async def submit_vote(
     vote_data: event_schemas.VoteCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
     voter_id: int = Depends(get_validated_vk_id),
     cache: redis.Redis = Depends(get_redis),
     idempotency_key: Optional[str] = Depends(check_idempotency_key),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
+    ingestor: Optional[VoteIngestor] = Depends(get_vote_ingestor),
+    event_cache: EventCache = Depends(get_event_cache),
+    live_state: LiveEventState = Depends(get_live_event_state),
+    vote_digest: VoteDigest = Depends(get_vote_digest),
 ):
     vote_data.voter_vk_id = voter_id
 
@@ -203,61 +292,84 @@ async def submit_vote(
             detail="Комментарий обязателен (минимум 3 символа).",
         )
 
-    lock_key = f"lock:vote:event:{voter_id}:{vote_data.promo_word}"
-
-    try:
-        async with cache.lock(lock_key, timeout=5, blocking_timeout=2):
-            event = await event_crud.get_event_by_promo(db, vote_data.promo_word)
-            if not event:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Активное мероприятие с таким промо-словом не найдено.",
-                )
-            if event.expert_id == vote_data.voter_vk_id:
-                raise HTTPException(
-                    status_code=403,
-                    detail="Эксперт не может голосовать на собственном мероприятии.",
-                )
-
-            now = datetime.now(timezone.utc)
-            start_time = event.event_date.replace(tzinfo=timezone.utc)
-            end_time = start_time + timedelta(minutes=event.duration_minutes)
-            if not (start_time <= now <= end_time):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Голосование на этом мероприятии сейчас неактивно.",
-                )
+    event = await event_cache.get_by_promo(db, vote_data.promo_word)
+    if not event:
+        raise HTTPException(
+            status_code=404,
+            detail="Активное мероприятие с таким промо-словом не найдено.",
+        )
+    if event.expert_id == vote_data.voter_vk_id:
+        raise HTTPException(
+            status_code=403,
+            detail="Эксперт не может голосовать на собственном мероприятии.",
+        )
 
-            try:
-                await event_crud.create_vote(db=db, vote_data=vote_data, event=event)
+    if event.status(datetime.now(timezone.utc)) != "active":
+        raise HTTPException(
+            status_code=403,
+            detail="Голосование на этом мероприятии сейчас неактивно.",
+        )
 
-                background_tasks.add_task(
-                    notifier.send_new_vote_notification,
-                    expert_id=event.expert_id,
-                    vote_data=vote_data,
-                )
-                if event.voter_thank_you_message:
-                    background_tasks.add_task(
-                        notifier.send_vote_action_notification,
-                        user_vk_id=vote_data.voter_vk_id,
-                        message_override=event.voter_thank_you_message,
-                    )
-                res = {
-                    "status": "ok",
-                    "message": "Your vote has been accepted.",
-                    "thank_you_message": event.voter_thank_you_message,
-                }
-                if idempotency_key:
-                    await save_idempotency_result(idempotency_key, res, cache)
-                return res
-            except ValueError as e:
-                raise HTTPException(status_code=400, detail=str(e))
-            except IntegrityError:
-                await db.rollback()
-                raise HTTPException(status_code=409, detail="Ошибка сохранения голоса.")
+    vote_notification = (
+        "send_new_vote_notification",
+        {
+            "expert_id": event.expert_id,
+            "vote_data": vote_data.model_dump(mode="json"),
+        },
+    )
+    digest_mode = event.vote_notification_mode == "digest"
+    # Уведомления пишутся в outbox в одной транзакции с голосом
+    notifications = [] if digest_mode else [vote_notification]
+    if event.voter_thank_you_message:
+        notifications.append(
+            (
+                "send_vote_action_notification",
+                {
+                    "user_vk_id": vote_data.voter_vk_id,
+                    "message_override": event.voter_thank_you_message,
+                },
+            )
+        )
 
-    except LockError:
-        raise HTTPException(status_code=429, detail="Too many requests.")
+    try:
+        await event_crud.create_vote(
+            db=db,
+            vote_data=vote_data,
+            event=event,
+            ingestor=ingestor,
+            live_state=live_state,
+            notifications=notifications,
+        )
+        if digest_mode and not await vote_digest.add(
+            expert_id=event.expert_id,
+            event_id=event.id,
+            promo_word=vote_data.promo_word,
+            vote_type=vote_data.vote_type,
+            comment=vote_data.comment,
+        ):
+            # Redis недоступен: голос уже сохранён, уведомляем без сводки
+            kind, payload = vote_notification
+            await outbox_crud.enqueue_notification(db, kind, **payload)
+        await leaderboard.sync_expert(db, event.expert_id)
+
+        res = {
+            "status": "ok",
+            "message": "Your vote has been accepted.",
+            "thank_you_message": event.voter_thank_you_message,
+        }
+        if idempotency_key:
+            await save_idempotency_result(idempotency_key, res, cache)
+        return res
+    except EventVoteLimitError:
+        raise HTTPException(
+            status_code=403,
+            detail="На этом мероприятии уже проголосовало максимальное число участников для тарифа эксперта.",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Ошибка сохранения голоса.")
 
 
 @router.get("/status/{promo_word}", response_model=event_schemas.EventStatusResponse)
@@ -265,22 +377,12 @@ async def get_event_status_by_promo(
     promo_word: str,
     db: AsyncSession = Depends(get_db),
     current_user: Dict = Depends(get_current_user),
+    event_cache: EventCache = Depends(get_event_cache),
 ):
-    event = await event_crud.get_event_by_promo(db, promo_word)
+    event = await event_cache.get_by_promo(db, promo_word)
     if not event:
         raise HTTPException(status_code=404, detail="Мероприятие не найдено")
 
-    now = datetime.now(timezone.utc)
-    start_time = event.event_date.replace(tzinfo=timezone.utc)
-    end_time = start_time + timedelta(minutes=event.duration_minutes)
-    status = (
-        "active"
-        if start_time <= now <= end_time
-        else "not_started"
-        if now < start_time
-        else "finished"
-    )
-
     voter_id = current_user.get("vk_id")
     current_vote_data = None
 
@@ -304,22 +406,13 @@ async def get_event_status_by_promo(
             "last_comment": "",
         }
 
-    expert_profile = event.expert
-    user = expert_profile.user
-
     return {
-        "status": status,
+        "status": event.status(datetime.now(timezone.utc)),
         "event_name": event.name,
-        "start_time": start_time.isoformat(),
-        "end_time": end_time.isoformat(),
+        "start_time": event.start_time.isoformat(),
+        "end_time": event.end_time.isoformat(),
         "current_vote": current_vote_data,
-        "expert": {
-            "vk_id": user.vk_id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "photo_url": str(user.photo_url),
-            "regalia": expert_profile.regalia,
-        },
+        "expert": event.expert,
         "has_message": bool(event.voter_thank_you_message),
     }
 
@@ -333,6 +426,15 @@ async def get_public_events(db: AsyncSession = Depends(get_db)):
     ]
 
 
+@router.get("/live", response_model=List[event_schemas.EventRead])
+async def get_live_events(db: AsyncSession = Depends(get_db)):
+    events = await event_crud.get_live_public_events(db=db)
+    return [
+        event_schemas.EventRead.model_validate(event, from_attributes=True)
+        for event in events
+    ]
+
+
 @router.get("/feed", response_model=event_schemas.PaginatedEventsResponse)
 async def get_events_feed(
     db: AsyncSession = Depends(get_db),
@@ -341,15 +443,23 @@ async def get_events_feed(
     search: Optional[str] = None,
     region: Optional[str] = None,
     category_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
 ):
-    events, total_count = await event_crud.get_public_events_feed(
-        db=db,
-        page=page,
-        size=size,
-        search_query=search,
-        region=region,
-        category_id=category_id,
-    )
+    after = decode_cursor(cursor, {"d": str, "id": int})
+    try:
+        events, total_count, next_cursor = await event_crud.get_public_events_feed(
+            db=db,
+            page=page,
+            size=size,
+            search_query=search,
+            region=region,
+            category_id=category_id,
+            cursor=after,
+            include_total=should_include_total(after, include_total),
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     response_items = []
     for event in events:
         event_data = event_schemas.EventRead.model_validate(event, from_attributes=True)
@@ -363,6 +473,7 @@ async def get_events_feed(
         "total_count": total_count,
         "page": page,
         "size": size,
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
     }
 
 
@@ -384,24 +495,19 @@ async def get_pending_events_for_admin(db: AsyncSession = Depends(get_db)):
 async def approve_event(
     event_id: int,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
+    event_cache: EventCache = Depends(get_event_cache),
 ):
     event = await event_crud.set_event_status(
-        db=db, event_id=event_id, status="approved"
+        db=db, event_id=event_id, status="approved", event_cache=event_cache
     )
     if not event:
         raise HTTPException(status_code=404, detail="Event not found.")
 
     if not event.is_private:
-        expert_user = await db.get(User, event.expert_id)
-        if expert_user:
-            expert_name = f"{expert_user.first_name} {expert_user.last_name}"
-            post_id = await notifier.post_announcement_to_wall(event, expert_name)
-            if post_id:
-                event.wall_post_id = post_id
-                await db.commit()
-
-    await notifier.send_event_status_notification(
+        outbox_crud.add_notification(db, POST_EVENT_ANNOUNCEMENT, event_id=event.id)
+    await outbox_crud.enqueue_notification(
+        db,
+        "send_event_status_notification",
         expert_id=event.expert_id,
         event_name=event.name,
         approved=True,
@@ -415,15 +521,21 @@ async def reject_event(
     event_id: int,
     body: dict = Body(...),
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
+    event_cache: EventCache = Depends(get_event_cache),
 ):
     reason = body.get("reason", "Причина не указана")
     event = await event_crud.set_event_status(
-        db=db, event_id=event_id, status="rejected", reason=reason
+        db=db,
+        event_id=event_id,
+        status="rejected",
+        reason=reason,
+        event_cache=event_cache,
     )
     if not event:
         raise HTTPException(status_code=404, detail="Event not found.")
-    await notifier.send_event_status_notification(
+    await outbox_crud.enqueue_notification(
+        db,
+        "send_event_status_notification",
         expert_id=event.expert_id,
         event_name=event.name,
         approved=False,
@@ -439,17 +551,18 @@ async def cancel_event_vote(
     db: AsyncSession = Depends(get_db),
     current_user: Dict = Depends(get_current_user),
     cache: redis.Redis = Depends(get_redis),
+    live_state: LiveEventState = Depends(get_live_event_state),
 ):
     voter_vk_id = current_user["vk_id"]
     success = await event_crud.delete_event_vote(
-        db=db, vote_id=vote_id, voter_vk_id=voter_vk_id
+        db=db, vote_id=vote_id, voter_vk_id=voter_vk_id, live_state=live_state
     )
     if not success:
         raise HTTPException(
             status_code=404, detail="Голос для отмены не найден или у вас нет прав."
         )
 
-    await cache.delete(f"user_profile:{voter_vk_id}")
+    await invalidate_user_profile(cache, voter_vk_id)
 
     return {"status": "ok", "message": "Vote cancelled."}
 
@@ -2,7 +2,6 @@ from typing import Dict, List, Optional
 
 import redis.asyncio as redis
 from fastapi import APIRouter, Depends, HTTPException, Query
-from redis.exceptions import LockError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -12,15 +11,21 @@ from src.core.dependencies import (
     get_current_admin_user,
     get_current_user,
     get_db,
+    get_leaderboard,
     get_notifier,
     get_redis,
     get_validated_vk_id,
     save_idempotency_result,
+    tariff_catalog,
 )
-from src.crud import expert_crud
+from src.core.pagination import decode_cursor, encode_cursor, should_include_total
+from src.core.profile_cache import invalidate_user_profile
+from src.crud import expert_crud, outbox_crud
 from src.schemas import expert_schemas
 from src.services import excel_generator
+from src.services.leaderboard import Leaderboard
 from src.services.notifier import Notifier
+from src.services.tariff_catalog import resolve_tariff
 
 router = APIRouter(prefix="/experts", tags=["Experts"])
 
@@ -29,21 +34,21 @@ router = APIRouter(prefix="/experts", tags=["Experts"])
 async def register_expert(
     expert_data: expert_schemas.ExpertCreate,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
     cache: redis.Redis = Depends(get_redis),
     vk_id_from_token: int = Depends(get_validated_vk_id),
 ):
     try:
         expert_data.user_data.vk_id = vk_id_from_token
         await expert_crud.create_expert_request(db=db, expert_data=expert_data)
-        cache_key = f"user_profile:{vk_id_from_token}"
-        await cache.delete(cache_key)
+        await invalidate_user_profile(cache, vk_id_from_token)
 
         user_info_for_notifier = {
-            **expert_data.user_data.model_dump(),
+            **expert_data.user_data.model_dump(mode="json"),
             "regalia": expert_data.profile_data.regalia,
         }
-        await notifier.send_new_request_to_admin(user_info_for_notifier)
+        await outbox_crud.enqueue_notification(
+            db, "send_new_request_to_admin", user_data=user_info_for_notifier
+        )
         return {"status": "ok", "message": "Request sent for moderation"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -57,14 +62,25 @@ async def get_top_experts(
     search: Optional[str] = None,
     region: Optional[str] = None,
     category_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
-    experts_data, total_count = await expert_crud.get_top_experts_paginated(
+    after = decode_cursor(cursor, {"o": int, "r": int})
+    (
+        experts_data,
+        total_count,
+        next_cursor,
+    ) = await expert_crud.get_top_experts_paginated(
         db=db,
         page=page,
         size=size,
         search_query=search,
         region=region,
         category_id=category_id,
+        leaderboard=leaderboard,
+        cursor=after,
+        include_total=should_include_total(after, include_total),
     )
 
     response_users = []
@@ -89,6 +105,7 @@ async def get_top_experts(
         "total_count": total_count,
         "page": page,
         "size": size,
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
     }
 
 
@@ -97,6 +114,7 @@ async def get_expert_profile(
     vk_id: int,
     db: AsyncSession = Depends(get_db),
     current_user: Dict = Depends(get_current_user),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     result = await expert_crud.get_full_user_profile_with_stats(db=db, vk_id=vk_id)
     if not result:
@@ -123,6 +141,8 @@ async def get_expert_profile(
         response_data.topics = [
             f"{theme.category.name} > {theme.name}" for theme in profile.selected_themes
         ]
+        if profile.status == "approved":
+            response_data.rank = await leaderboard.get_rank(vk_id)
     return response_data
 
 
@@ -132,9 +152,9 @@ async def create_vote_for_expert(
     vote_data: expert_schemas.CommunityVoteCreate,
     db: AsyncSession = Depends(get_db),
     cache: redis.Redis = Depends(get_redis),
-    notifier: Notifier = Depends(get_notifier),
     voter_id: int = Depends(get_validated_vk_id),
     idempotency_key: Optional[str] = Depends(check_idempotency_key),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     if vk_id == voter_id:
         raise HTTPException(status_code=400, detail="Вы не можете голосовать за себя.")
@@ -145,36 +165,28 @@ async def create_vote_for_expert(
             detail="Комментарий является обязательным для этого действия.",
         )
 
-    lock_key = f"lock:vote:community:{voter_id}:{vk_id}"
-
     try:
-        async with cache.lock(lock_key, timeout=5, blocking_timeout=2):
-            try:
-                await expert_crud.create_community_vote(
-                    db=db,
-                    expert_vk_id=vk_id,
-                    vote_data=vote_data,
-                    voter_vk_id=voter_id,
-                    notifier=notifier,
-                )
-            except ValueError as e:
-                raise HTTPException(status_code=400, detail=str(e))
-            except IntegrityError:
-                await db.rollback()
-                raise HTTPException(status_code=409, detail="Вы уже проголосовали.")
-            except Exception:
-                raise
-
-            await cache.delete(f"user_profile:{vk_id}")
-            await cache.delete(f"user_profile:{voter_id}")
-
-            res = {"status": "ok", "message": "Your vote has been processed."}
-            if idempotency_key:
-                await save_idempotency_result(idempotency_key, res, cache)
-            return res
-
-    except LockError:
-        raise HTTPException(status_code=429, detail="Слишком много запросов.")
+        await expert_crud.create_community_vote(
+            db=db,
+            expert_vk_id=vk_id,
+            vote_data=vote_data,
+            voter_vk_id=voter_id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Вы уже проголосовали.")
+    except Exception:
+        raise
+
+    await invalidate_user_profile(cache, vk_id, voter_id)
+    await leaderboard.sync_expert(db, vk_id)
+
+    res = {"status": "ok", "message": "Your vote has been processed."}
+    if idempotency_key:
+        await save_idempotency_result(idempotency_key, res, cache)
+    return res
 
 
 @router.delete("/{vk_id}/vote", status_code=200)
@@ -185,6 +197,7 @@ async def cancel_vote_for_expert(
     current_user: Dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
     cache: redis.Redis = Depends(get_redis),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     voter_vk_id = current_user["vk_id"]
 
@@ -197,8 +210,8 @@ async def cancel_vote_for_expert(
             status_code=404, detail="Активный голос для отмены не найден."
         )
 
-    await cache.delete(f"user_profile:{vk_id}")
-    await cache.delete(f"user_profile:{voter_vk_id}")
+    await invalidate_user_profile(cache, vk_id, voter_vk_id)
+    await leaderboard.sync_expert(db, vk_id)
 
     return {"status": "ok", "message": "Your vote has been cancelled."}
 
@@ -215,8 +228,7 @@ async def withdraw_expert_application(
         raise HTTPException(
             status_code=404, detail="No pending request found to withdraw."
         )
-    cache_key = f"user_profile:{vk_id}"
-    await cache.delete(cache_key)
+    await invalidate_user_profile(cache, vk_id)
     return {"status": "ok", "message": "Your expert application has been withdrawn."}
 
 
@@ -259,58 +271,46 @@ async def get_all_users(
     search: Optional[str] = None,
     user_type: Optional[str] = Query(None, enum=["all", "user", "expert"]),
     sort_by_date: Optional[str] = Query(None, enum=["asc", "desc"]),
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
 ):
-    users_with_profiles, total_count = await expert_crud.get_all_users_paginated(
-        db=db,
-        page=page,
-        size=size,
-        search_query=search,
-        user_type_filter=user_type,
-        date_sort_order=sort_by_date,
-    )
+    after = decode_cursor(cursor, {"d": str, "id": int})
+    try:
+        (
+            users_with_profiles,
+            total_count,
+            next_cursor,
+        ) = await expert_crud.get_all_users_paginated(
+            db=db,
+            page=page,
+            size=size,
+            search_query=search,
+            user_type_filter=user_type,
+            date_sort_order=sort_by_date,
+            cursor=after,
+            include_total=should_include_total(after, include_total),
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    tariffs = await tariff_catalog.get_active()
     response_users = []
-    for user, profile in users_with_profiles:
+    for user, profile, stats_dict, topics in users_with_profiles:
         user_data = expert_schemas.UserPrivateRead.model_validate(
             user, from_attributes=True
         )
+        user_data.stats = expert_schemas.StatsPrivate(**stats_dict)
+        user_data.topics = topics
         if profile:
             user_data.status = profile.status
+            user_data.tariff_plan = resolve_tariff(tariffs, user).name
         response_users.append(user_data)
 
-    from sqlalchemy import select
-
-    from src.models.tariff import Tariff
-
-    tariffs_result = await db.execute(
-        select(Tariff).where(Tariff.is_active).order_by(Tariff.price.desc())
-    )
-    all_tariffs = tariffs_result.scalars().all()
-
-    final_response_users = []
-    for user_data, (user, profile) in zip(response_users, users_with_profiles):
-        if profile:
-            current_tariff_name = "Начальный"
-
-            if user.forced_tariff_id:
-                forced_tariff = next(
-                    (t for t in all_tariffs if t.id == user.forced_tariff_id), None
-                )
-                if forced_tariff:
-                    current_tariff_name = forced_tariff.name
-            elif user.subscription and user.subscription.is_active:
-                for tariff in all_tariffs:
-                    if user.subscription.amount >= tariff.price:
-                        current_tariff_name = tariff.name
-                        break
-
-            user_data.tariff_plan = current_tariff_name
-        final_response_users.append(user_data)
-
     return {
-        "items": final_response_users,
+        "items": response_users,
         "total_count": total_count,
         "page": page,
         "size": size,
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
     }
 
 
@@ -322,14 +322,17 @@ async def get_all_users(
 async def approve_expert(
     vk_id: int,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
     cache: redis.Redis = Depends(get_redis),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     profile = await expert_crud.set_expert_status(db=db, vk_id=vk_id, status="approved")
     if not profile:
         raise HTTPException(status_code=404, detail="Expert profile not found")
-    await cache.delete(f"user_profile:{vk_id}")
-    await notifier.send_moderation_result(vk_id=vk_id, approved=True)
+    await invalidate_user_profile(cache, vk_id)
+    await leaderboard.sync_expert(db, vk_id)
+    await outbox_crud.enqueue_notification(
+        db, "send_moderation_result", vk_id=vk_id, approved=True
+    )
     return {"status": "ok", "message": "Expert approved"}
 
 
@@ -341,15 +344,20 @@ async def approve_expert(
 async def reject_expert(
     vk_id: int,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
     cache: redis.Redis = Depends(get_redis),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     profile = await expert_crud.set_expert_status(db=db, vk_id=vk_id, status="rejected")
     if not profile:
         raise HTTPException(status_code=404, detail="Expert profile not found")
-    await cache.delete(f"user_profile:{vk_id}")
-    await notifier.send_moderation_result(
-        vk_id=vk_id, approved=False, reason="Несоответствие требованиям"
+    await invalidate_user_profile(cache, vk_id)
+    await leaderboard.sync_expert(db, vk_id)
+    await outbox_crud.enqueue_notification(
+        db,
+        "send_moderation_result",
+        vk_id=vk_id,
+        approved=False,
+        reason="Несоответствие требованиям",
     )
     return {"status": "ok", "message": "Expert rejected"}
 
@@ -363,10 +371,12 @@ async def delete_expert_endpoint(
     vk_id: int,
     db: AsyncSession = Depends(get_db),
     cache: redis.Redis = Depends(get_redis),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     success = await expert_crud.delete_user_by_vk_id(db=db, vk_id=vk_id, cache=cache)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
+    await leaderboard.remove(vk_id)
     return {"status": "ok", "message": "User deleted"}
 
 
@@ -375,7 +385,6 @@ async def request_profile_update(
     update_data: expert_schemas.ExpertProfileUpdate,
     current_user: Dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
 ):
     if not current_user.get("is_expert"):
         raise HTTPException(
@@ -387,9 +396,11 @@ async def request_profile_update(
             db=db, vk_id=current_user["vk_id"], update_data=update_data
         )
 
-        await notifier.send_message(
-            settings.ADMIN_ID,
-            f"📝 Новая заявка на изменение профиля от ID {current_user['vk_id']}",
+        await outbox_crud.enqueue_notification(
+            db,
+            "send_message",
+            peer_id=settings.ADMIN_ID,
+            message=f"📝 Новая заявка на изменение профиля от ID {current_user['vk_id']}",
         )
 
         return {
@@ -444,8 +455,8 @@ async def moderate_update_request(
     request_id: int,
     action: str,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
     cache: redis.Redis = Depends(get_redis),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     if action not in ["approve", "reject"]:
         raise HTTPException(status_code=400, detail="Invalid action")
@@ -454,14 +465,18 @@ async def moderate_update_request(
     if not result:
         raise HTTPException(status_code=404, detail="Request not found")
 
-    await cache.delete(f"user_profile:{result.expert_vk_id}")
+    await invalidate_user_profile(cache, result.expert_vk_id)
+    if action == "approve":
+        await leaderboard.sync_expert(db, result.expert_vk_id)
 
     msg = (
         "✅ Ваш профиль успешно обновлен!"
         if action == "approve"
         else "❌ Изменения профиля отклонены."
     )
-    await notifier.send_message(result.expert_vk_id, msg)
+    await outbox_crud.enqueue_notification(
+        db, "send_message", peer_id=result.expert_vk_id, message=msg
+    )
 
     return {"status": "ok"}
 
@@ -503,7 +518,7 @@ async def update_user_tariff(
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    await cache.delete(f"user_profile:{user_vk_id}")
+    await invalidate_user_profile(cache, user_vk_id)
     return {"status": "ok", "message": f"Tariff updated (ID: {tariff_id})"}
 
 
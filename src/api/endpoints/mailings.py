@@ -8,54 +8,49 @@ from src.core.dependencies import (
     get_current_admin_user,
     get_notifier,
 )
-from src.crud import mailing_crud
+from src.crud import broadcast_crud, mailing_crud
 from src.schemas import mailing_schemas
 from src.services.notifier import Notifier
-
-from fastapi import BackgroundTasks
 from src.schemas.mailing_schemas import AdminBroadcastCreate
-from src.models import User
-from sqlalchemy import select
 
 router = APIRouter(prefix="/mailings", tags=["Mailings"])
 
 
-@router.post("/admin/broadcast", dependencies=[Depends(get_current_admin_user)])
+@router.post(
+    "/admin/broadcast",
+    response_model=mailing_schemas.BroadcastJobRead,
+    status_code=202,
+)
 async def send_admin_broadcast(
     data: AdminBroadcastCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    notifier: Notifier = Depends(get_notifier),
+    current_user: Dict = Depends(get_current_admin_user),
 ):
-    query = select(User.vk_id).where(User.allow_notifications)
-
-    if data.target_group == "experts":
-        query = query.where(User.is_expert)
-    elif data.target_group == "users":
-        query = query.where(not User.is_expert)
-
-    result = await db.execute(query)
-    user_ids = result.scalars().all()
-
-    if not user_ids:
-        return {"status": "ok", "message": "No users found for broadcast."}
+    # Рассылку отправляет воркер outbox чанками, ход — в /admin/broadcast/{id}
+    return await broadcast_crud.create_broadcast_job(
+        db, data.message, data.target_group, current_user.get("vk_id")
+    )
 
-    background_tasks.add_task(_broadcast_task, user_ids, data.message, notifier)
 
-    return {
-        "status": "ok",
-        "message": f"Рассылка запущена для {len(user_ids)} пользователей.",
-    }
+@router.get(
+    "/admin/broadcast",
+    response_model=List[mailing_schemas.BroadcastJobRead],
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_admin_broadcasts(db: AsyncSession = Depends(get_db)):
+    return await broadcast_crud.get_recent_broadcast_jobs(db)
 
 
-async def _broadcast_task(user_ids: list[int], message: str, notifier: Notifier):
-    for vk_id in user_ids:
-        try:
-            await notifier.send_message(
-                vk_id, f"📢 Сообщение от администратора:\n\n{message}"
-            )
-        except Exception as e:
-            print(f"Failed to send broadcast to {vk_id}: {e}")
+@router.get(
+    "/admin/broadcast/{job_id}",
+    response_model=mailing_schemas.BroadcastJobRead,
+    dependencies=[Depends(get_current_admin_user)],
+)
+async def get_admin_broadcast(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await broadcast_crud.get_broadcast_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Рассылка не найдена.")
+    return job
 
 
 @router.post("/create", response_model=mailing_schemas.MailingRead)
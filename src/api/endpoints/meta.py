@@ -2,7 +2,16 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from src.core.dependencies import get_db, get_optional_validated_vk_id
+from src.core.dependencies import (
+    get_current_admin_user,
+    get_db,
+    get_optional_validated_vk_id,
+    token_manager,
+    vk_breaker,
+    vk_group_limiter,
+    vk_http,
+    vk_service_limiter,
+)
 from src.crud import meta_crud
 
 router = APIRouter(prefix="/meta", tags=["Metadata"])
@@ -22,3 +31,17 @@ async def get_all_regions(
     vk_id: int | None = Depends(get_optional_validated_vk_id),
 ):
     return await meta_crud.get_all_regions(db)
+
+
+@router.get("/admin/stats", dependencies=[Depends(get_current_admin_user)])
+async def get_runtime_stats():
+    # Счётчики локальны для воркера, отвечающего на запрос
+    return {
+        "token_cache": token_manager.get_stats(),
+        "vk_breaker": vk_breaker.get_stats(),
+        "vk_http": vk_http.get_stats(),
+        "vk_rate_limit": {
+            "group": vk_group_limiter.get_stats(),
+            "service": vk_service_limiter.get_stats(),
+        },
+    }
@@ -24,7 +24,8 @@ from src.core.dependencies import (
     check_idempotency_key,
     save_idempotency_result,
 )
-from src.crud import expert_crud, promo_crud
+from src.core.profile_cache import invalidate_user_profile
+from src.crud import expert_crud, outbox_crud, promo_crud
 from .tariffs import TARIFFS_INFO
 from src.schemas import payment_schemas
 from src.services.notifier import Notifier
@@ -106,9 +107,11 @@ async def yookassa_webhook(
                                 user_vk_id, report_path, "Ваш отчет по эксперту готов!"
                             )
                         else:
-                            await notifier.send_message(
-                                user_vk_id,
-                                "Не удалось сгенерировать отчет. Обратитесь в поддержку.",
+                            await outbox_crud.enqueue_notification(
+                                task_db,
+                                "send_message",
+                                peer_id=user_vk_id,
+                                message="Не удалось сгенерировать отчет. Обратитесь в поддержку.",
                             )
 
                 background_tasks.add_task(generation_task)
@@ -123,8 +126,11 @@ async def yookassa_webhook(
                 if not tariff_name:
                     raise ValueError(f"Unknown tariff_id in metadata: {tariff_id}")
 
-                await cache.delete(f"user_profile:{user_vk_id}")
-                await notifier.send_message(
+                await invalidate_user_profile(cache, user_vk_id)
+                # Ошибка VK не должна превращать вебхук в 500 и повтор ЮKassa
+                await outbox_crud.enqueue_notification(
+                    db,
+                    "send_message",
                     peer_id=user_vk_id,
                     message=f"✅ Оплата прошла успешно! Ваш тариф обновлен до '{tariff_name}'. Спасибо!",
                 )
@@ -8,6 +8,7 @@ from src.core.dependencies import (
     get_current_user,
     get_redis,
 )
+from src.core.profile_cache import invalidate_user_profile
 from src.crud import promo_crud
 from src.schemas import promo_schemas
 from src.models import Tariff
@@ -31,7 +32,7 @@ async def activate_promo(
             db, code=req.code, user_vk_id=current_user["vk_id"]
         )
 
-        await cache.delete(f"user_profile:{current_user['vk_id']}")
+        await invalidate_user_profile(cache, current_user["vk_id"])
 
         tariff = await db.get(Tariff, promo.tariff_id)
         tariff_name = tariff.name if tariff else "Специальный"
@@ -1,9 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from typing import List
 
-from src.core.dependencies import get_db
+from src.core.dependencies import get_db, tariff_catalog
 from src.models.tariff import Tariff
 from src.schemas.base_schemas import TariffRead
 from pydantic import BaseModel
@@ -16,11 +15,8 @@ router = APIRouter(prefix="/tariffs", tags=["Tariffs"])
 
 
 @router.get("", response_model=List[TariffRead])
-async def get_all_tariffs(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Tariff).where(Tariff.is_active).order_by(Tariff.price)
-    )
-    tariffs = result.scalars().all()
+async def get_all_tariffs():
+    tariffs = sorted(await tariff_catalog.get_active(), key=lambda t: t.price)
 
     response = []
     for t in tariffs:
@@ -119,4 +115,5 @@ async def update_tariff(
         setattr(tariff, key, value)
 
     await db.commit()
+    await tariff_catalog.publish_invalidation()
     return {"status": "ok"}
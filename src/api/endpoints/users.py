@@ -6,12 +6,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import settings
 from src.core.dependencies import (
+    fetch_and_cache_user_profile,
     get_current_user,
     get_db,
+    get_leaderboard,
     get_redis,
     get_validated_vk_id,
 )
-from src.crud import expert_crud, event_crud
+from src.core.profile_cache import invalidate_user_profile
+from src.crud import expert_crud
 from src.schemas.event_schemas import EventRead
 from src.schemas.expert_schemas import (
     UserPrivateRead,
@@ -21,7 +24,7 @@ from src.schemas.expert_schemas import (
     VotedExpertInfo,
     UserRegaliaUpdate,
 )
-from src.schemas import expert_schemas
+from src.services.leaderboard import Leaderboard
 from pydantic import EmailStr, TypeAdapter
 from loguru import logger
 
@@ -51,83 +54,8 @@ async def update_user_email(
         if not updated_user:
             raise HTTPException(status_code=404, detail="User not found.")
 
-        await cache.delete(f"user_profile:{vk_id}")
-
-        result = await expert_crud.get_full_user_profile_with_stats(db, vk_id=vk_id)
-        if not result:
-            raise HTTPException(status_code=404, detail="User disappeared.")
-
-        user, profile, stats_dict, my_votes_stats_dict = result
-
-        response_data = UserPrivateRead.model_validate(user, from_attributes=True)
-        response_data.stats = stats_dict
-        response_data.my_votes_stats = my_votes_stats_dict
-        response_data.is_admin = user.is_admin or (user.vk_id == settings.ADMIN_ID)
-        response_data.email = user.email
-
-        if profile:
-            response_data.is_expert = profile.status == "approved"
-            response_data.status = profile.status
-            response_data.show_community_rating = profile.show_community_rating
-
-            current_tariff_name = "Начальный"
-            current_tariff_limit = 3
-
-            from src.models.tariff import Tariff
-            from sqlalchemy import select
-
-            tariffs_result = await db.execute(
-                select(Tariff).where(Tariff.is_active).order_by(Tariff.price.desc())
-            )
-            all_tariffs = tariffs_result.scalars().all()
-
-            start_tariff = next((t for t in all_tariffs if t.price == 0), None)
-            if start_tariff:
-                current_tariff_limit = start_tariff.event_limit
-
-            if user.forced_tariff_id:
-                forced_tariff = next(
-                    (t for t in all_tariffs if t.id == user.forced_tariff_id), None
-                )
-                if forced_tariff:
-                    current_tariff_name = forced_tariff.name
-                    current_tariff_limit = forced_tariff.event_limit
-            elif user.subscription and user.subscription.is_active:
-                for tariff in all_tariffs:
-                    if user.subscription.amount >= tariff.price:
-                        current_tariff_name = tariff.name
-                        current_tariff_limit = tariff.event_limit
-                        break
-
-                if user.subscription.next_payment_date:
-                    response_data.next_payment_date = (
-                        user.subscription.next_payment_date
-                    )
-
-            response_data.tariff_plan = current_tariff_name
-
-            if response_data.is_expert:
-                limit = current_tariff_limit
-                current_count = (
-                    await event_crud.get_expert_active_event_count_current_month(
-                        db, vk_id
-                    )
-                )
-                response_data.event_usage = expert_schemas.EventUsage(
-                    current_count=current_count, limit=limit
-                )
-
-            response_data.topics = [
-                f"{theme.category.name} > {theme.name}"
-                for theme in profile.selected_themes
-            ]
-            response_data.regalia = profile.regalia
-            response_data.social_link = str(profile.social_link)
-
-        response_data.allow_notifications = user.allow_notifications
-        response_data.allow_expert_mailings = user.allow_expert_mailings
-
-        return response_data
+        await invalidate_user_profile(cache, vk_id)
+        return await fetch_and_cache_user_profile(vk_id, db, cache)
 
     except ValueError:
         raise HTTPException(status_code=400, detail="Некорректный формат email.")
@@ -158,57 +86,8 @@ async def update_user_regalia(
         if not success:
             raise HTTPException(status_code=404, detail="User profile not found.")
 
-        await cache.delete(f"user_profile:{vk_id}")
-
-        result = await expert_crud.get_full_user_profile_with_stats(db, vk_id=vk_id)
-        if not result:
-            raise HTTPException(status_code=404, detail="User disappeared.")
-
-        user, profile, stats_dict, my_votes_stats_dict = result
-        response_data = UserPrivateRead.model_validate(user, from_attributes=True)
-        response_data.stats = stats_dict
-        response_data.my_votes_stats = my_votes_stats_dict
-        response_data.is_admin = user.is_admin or (user.vk_id == settings.ADMIN_ID)
-
-        if profile:
-            response_data.is_expert = profile.status == "approved"
-            response_data.status = profile.status
-            response_data.show_community_rating = profile.show_community_rating
-            if user.subscription and user.subscription.is_active:
-                if user.subscription.amount >= 3999:
-                    response_data.tariff_plan = "Профи"
-                elif user.subscription.amount >= 999:
-                    response_data.tariff_plan = "Стандарт"
-                else:
-                    response_data.tariff_plan = "Начальный"
-
-                if user.subscription.next_payment_date:
-                    response_data.next_payment_date = (
-                        user.subscription.next_payment_date
-                    )
-            else:
-                response_data.tariff_plan = "Начальный"
-
-            if response_data.is_expert:
-                tariff = response_data.tariff_plan or "Начальный"
-                limit = settings.TARIFF_EVENT_LIMITS.get(tariff, 3)
-                current_count = (
-                    await event_crud.get_expert_active_event_count_current_month(
-                        db, vk_id
-                    )
-                )
-                response_data.event_usage = expert_schemas.EventUsage(
-                    current_count=current_count, limit=limit
-                )
-
-            response_data.regalia = profile.regalia
-            response_data.social_link = str(profile.social_link)
-            response_data.topics = [
-                f"{theme.category.name} > {theme.name}"
-                for theme in profile.selected_themes
-            ]
-
-        return response_data
+        await invalidate_user_profile(cache, vk_id)
+        return await fetch_and_cache_user_profile(vk_id, db, cache)
 
     except Exception as e:
         logger.error(f"Failed to update regalia for user {vk_id}: {e}")
@@ -221,13 +100,18 @@ async def read_users_me(
     current_user: Dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
     cache: redis.Redis = Depends(get_redis),
+    leaderboard: Leaderboard = Depends(get_leaderboard),
 ):
     if refresh:
-        from src.core.dependencies import fetch_and_cache_user_profile
-
-        return await fetch_and_cache_user_profile(
+        current_user = await fetch_and_cache_user_profile(
             vk_user_id=current_user["vk_id"], db=db, cache=cache
         )
+    if current_user.get("is_expert"):
+        # Место в рейтинге меняется чаще, чем живёт кэш профиля
+        return {
+            **current_user,
+            "rank": await leaderboard.get_rank(current_user["vk_id"]),
+        }
     return current_user
 
 
@@ -358,74 +242,5 @@ async def update_user_settings(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-    await cache.delete(f"user_profile:{vk_id}")
-
-    result = await expert_crud.get_full_user_profile_with_stats(db, vk_id=vk_id)
-    if not result:
-        raise HTTPException(status_code=404, detail="User not found after update.")
-
-    user, profile, stats_dict, my_votes_stats_dict = result
-
-    response_data = UserPrivateRead.model_validate(user, from_attributes=True)
-    response_data.stats = stats_dict
-    response_data.my_votes_stats = my_votes_stats_dict
-    response_data.is_admin = user.is_admin or (user.vk_id == settings.ADMIN_ID)
-
-    if profile:
-        response_data.is_expert = profile.status == "approved"
-        response_data.status = profile.status
-        response_data.show_community_rating = profile.show_community_rating
-
-        current_tariff_name = "Начальный"
-        current_tariff_limit = 3
-
-        from src.models.tariff import Tariff
-        from sqlalchemy import select
-
-        tariffs_result = await db.execute(
-            select(Tariff).where(Tariff.is_active).order_by(Tariff.price.desc())
-        )
-        all_tariffs = tariffs_result.scalars().all()
-
-        start_tariff = next((t for t in all_tariffs if t.price == 0), None)
-        if start_tariff:
-            current_tariff_limit = start_tariff.event_limit
-
-        if user.forced_tariff_id:
-            forced_tariff = next(
-                (t for t in all_tariffs if t.id == user.forced_tariff_id), None
-            )
-            if forced_tariff:
-                current_tariff_name = forced_tariff.name
-                current_tariff_limit = forced_tariff.event_limit
-        elif user.subscription and user.subscription.is_active:
-            for tariff in all_tariffs:
-                if user.subscription.amount >= tariff.price:
-                    current_tariff_name = tariff.name
-                    current_tariff_limit = tariff.event_limit
-                    break
-
-            if user.subscription.next_payment_date:
-                response_data.next_payment_date = user.subscription.next_payment_date
-
-        response_data.tariff_plan = current_tariff_name
-
-        if response_data.is_expert:
-            limit = current_tariff_limit
-            current_count = (
-                await event_crud.get_expert_active_event_count_current_month(db, vk_id)
-            )
-            response_data.event_usage = expert_schemas.EventUsage(
-                current_count=current_count, limit=limit
-            )
-
-        response_data.topics = [
-            f"{theme.category.name} > {theme.name}" for theme in profile.selected_themes
-        ]
-        response_data.regalia = profile.regalia
-        response_data.social_link = str(profile.social_link)
-
-    response_data.allow_notifications = user.allow_notifications
-    response_data.allow_expert_mailings = user.allow_expert_mailings
-
-    return response_data
+    await invalidate_user_profile(cache, vk_id)
+    return await fetch_and_cache_user_profile(vk_id, db, cache)
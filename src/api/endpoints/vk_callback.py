@@ -6,6 +6,8 @@ from datetime import datetime
 
 from src.core.config import settings
 from src.core.dependencies import get_db, get_notifier, get_redis
+from src.core.profile_cache import invalidate_user_profile
+from src.crud import outbox_crud
 from src.services.notifier import Notifier
 from src.models import DonutSubscription, User
 from sqlalchemy import select
@@ -39,11 +41,18 @@ async def vk_callback_handler(
         "donut_subscription_prolonged",
         "donut_subscription_price_changed",
     ]:
-        await handle_donut_active(object_data, db, notifier, cache, event_type)
+        await handle_donut_active(object_data, db, cache, event_type)
         return Response(content="ok", media_type="text/plain")
 
     elif event_type in ["donut_subscription_expired", "donut_subscription_cancelled"]:
-        await handle_donut_inactive(object_data, db, notifier, cache, event_type)
+        await handle_donut_inactive(object_data, db, cache, event_type)
+        return Response(content="ok", media_type="text/plain")
+
+    # 3. Разрешение на сообщения от сообщества
+    elif event_type in ["message_allow", "message_deny"]:
+        await notifier.remember_messages_permission(
+            int(object_data.get("user_id")), event_type == "message_allow"
+        )
         return Response(content="ok", media_type="text/plain")
 
     return Response(content="ok", media_type="text/plain")
@@ -52,7 +61,6 @@ async def vk_callback_handler(
 async def handle_donut_active(
     data: dict,
     db: AsyncSession,
-    notifier: Notifier,
     cache: redis.Redis,
     event_type: str,
 ):
@@ -103,21 +111,24 @@ async def handle_donut_active(
         db.add(sub)
 
     await db.commit()
-    await cache.delete(f"user_profile:{user_vk_id}")
+    await invalidate_user_profile(cache, user_vk_id)
 
     if user.is_expert and user.allow_notifications:
         if event_type == "donut_subscription_create":
             msg = "Спасибо за поддержку! Подписка VK Donut оформлена. Ваш уровень обновлен."
-            await notifier.send_message(user_vk_id, msg)
+            await outbox_crud.enqueue_notification(
+                db, "send_message", peer_id=user_vk_id, message=msg
+            )
         elif event_type == "donut_subscription_prolonged":
             msg = "Подписка VK Donut продлена. Спасибо, что остаетесь с нами!"
-            await notifier.send_message(user_vk_id, msg)
+            await outbox_crud.enqueue_notification(
+                db, "send_message", peer_id=user_vk_id, message=msg
+            )
 
 
 async def handle_donut_inactive(
     data: dict,
     db: AsyncSession,
-    notifier: Notifier,
     cache: redis.Redis,
     event_type: str,
 ):
@@ -135,11 +146,14 @@ async def handle_donut_inactive(
         )
         sub.is_active = False
         await db.commit()
-        await cache.delete(f"user_profile:{user_vk_id}")
+        await invalidate_user_profile(cache, user_vk_id)
 
         user_res = await db.execute(select(User).filter(User.vk_id == user_vk_id))
         user = user_res.scalars().first()
         if user and user.allow_notifications:
-            await notifier.send_message(
-                user_vk_id, "Ваша подписка VK Donut истекла или была отменена."
+            await outbox_crud.enqueue_notification(
+                db,
+                "send_message",
+                peer_id=user_vk_id,
+                message="Ваша подписка VK Donut истекла или была отменена.",
             )
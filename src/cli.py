@@ -0,0 +1,73 @@
+"""
+Служебные команды обслуживания.
+
+Запуск: python -m src.cli <command>
+"""
+
+import argparse
+import asyncio
+
+from loguru import logger
+
+from src.core.config import settings
+from src.core.dependencies import AsyncSessionLocal, leaderboard, notifier, vk_http
+from src.crud import event_stats_crud, outbox_crud, score_crud
+from src.services.outbox_worker import OutboxWorker
+
+
+async def rebuild_scores():
+    async with AsyncSessionLocal() as db:
+        count = await score_crud.rebuild_expert_scores(db)
+    logger.success(f"Expert scores rebuilt for {count} experts.")
+
+
+async def rebuild_event_stats():
+    async with AsyncSessionLocal() as db:
+        count = await event_stats_crud.rebuild_event_stats(db)
+    logger.success(f"Vote stats rebuilt for {count} events.")
+
+
+async def rebuild_leaderboard():
+    async with AsyncSessionLocal() as db:
+        await leaderboard.rebuild(db)
+
+
+async def outbox_worker():
+    worker = OutboxWorker(
+        AsyncSessionLocal,
+        notifier,
+        concurrency=settings.OUTBOX_CONCURRENCY,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+    logger.info("Outbox worker started.")
+    try:
+        await worker.run_forever()
+    finally:
+        await notifier.close()
+        await vk_http.aclose()
+
+
+async def outbox_requeue_dead():
+    async with AsyncSessionLocal() as db:
+        count = await outbox_crud.requeue_dead(db)
+    logger.success(f"Requeued {count} dead notifications.")
+
+
+COMMANDS = {
+    "rebuild-scores": rebuild_scores,
+    "rebuild-leaderboard": rebuild_leaderboard,
+    "rebuild-event-stats": rebuild_event_stats,
+    "outbox-worker": outbox_worker,
+    "outbox-requeue-dead": outbox_requeue_dead,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m src.cli")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command]())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import time
+from typing import Dict, Optional
+
+
+class CircuitBreaker:
+    """
+    Простой размыкатель в памяти воркера: после `failure_threshold` ошибок
+    подряд запросы не выполняются `reset_timeout` секунд, затем пропускается
+    одна пробная попытка. Если её исход не записан за `trial_timeout`
+    секунд (запрос отменён или потерян), пропускается следующая.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        trial_timeout: Optional[float] = None,
+    ):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._trial_timeout = trial_timeout or reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight():
+            self._trial_started_at = time.monotonic()
+            return True
+        return False
+
+    def _trial_in_flight(self) -> bool:
+        return (
+            self._trial_started_at is not None
+            and time.monotonic() - self._trial_started_at < self._trial_timeout
+        )
+
+    def release_trial(self):
+        """Освобождает пробную попытку, не записывая исход (например, отмена)."""
+        self._trial_started_at = None
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_started_at = None
+        if self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict:
+        return {"state": self.state, "consecutive_failures": self._failures}
@@ -14,10 +14,47 @@ class Settings:
     VK_APP_SECRET_KEY: str = os.environ.get("VK_APP_SECRET_KEY")
     VK_SERVICE_KEY: str = os.environ.get("VK_SERVICE_KEY")
     VK_APP_ID: int = int(os.environ.get("VK_APP_ID", 0))
+    # Сколько секунд с vk_ts принимаются подписанные параметры запуска
+    VK_LAUNCH_PARAMS_MAX_AGE: int = int(
+        os.environ.get("VK_LAUNCH_PARAMS_MAX_AGE", 86400)
+    )
     VK_GROUP_ID: int = int(os.environ.get("VK_GROUP_ID", 0))
     VK_CONFIRMATION_CODE: str = os.environ.get("VK_CONFIRMATION_CODE")
+    VK_API_URL: str = os.environ.get("VK_API_URL", "https://api.vk.com/method")
+    VK_API_CONNECT_TIMEOUT: float = float(os.environ.get("VK_API_CONNECT_TIMEOUT", 2))
+    VK_API_READ_TIMEOUT: float = float(os.environ.get("VK_API_READ_TIMEOUT", 5))
+    VK_HTTP_MAX_CONNECTIONS: int = int(os.environ.get("VK_HTTP_MAX_CONNECTIONS", 50))
+    VK_HTTP_MAX_KEEPALIVE: int = int(os.environ.get("VK_HTTP_MAX_KEEPALIVE", 20))
+    VK_HTTP_KEEPALIVE_EXPIRY: float = float(
+        os.environ.get("VK_HTTP_KEEPALIVE_EXPIRY", 30)
+    )
+    VK_HTTP_CONNECT_RETRIES: int = int(os.environ.get("VK_HTTP_CONNECT_RETRIES", 2))
+    VK_HTTP_READ_RETRIES: int = int(os.environ.get("VK_HTTP_READ_RETRIES", 1))
+    # Работает только при установленном пакете h2 (httpx[http2])
+    VK_HTTP2: bool = os.environ.get("VK_HTTP2", "1") == "1"
+    VK_BREAKER_THRESHOLD: int = int(os.environ.get("VK_BREAKER_THRESHOLD", 5))
+    VK_BREAKER_RESET_TIMEOUT: int = int(os.environ.get("VK_BREAKER_RESET_TIMEOUT", 30))
+    VK_EXECUTE_MAX_DELAY_MS: int = int(os.environ.get("VK_EXECUTE_MAX_DELAY_MS", 20))
+    VK_MSG_PERMISSION_TTL: int = int(os.environ.get("VK_MSG_PERMISSION_TTL", 86400))
+    # Лимиты VK API на токен, запросов в секунду (общие для всех воркеров)
+    VK_GROUP_RPS: float = float(os.environ.get("VK_GROUP_RPS", 20))
+    VK_SERVICE_RPS: float = float(os.environ.get("VK_SERVICE_RPS", 5))
+    VK_SERVICE_MAX_WAIT: float = float(os.environ.get("VK_SERVICE_MAX_WAIT", 2))
 
     REDIS_URL: str = os.environ.get("REDIS_URL")
+
+    # "direct" — голос пишется в запросе, "batched" — через VoteIngestor
+    VOTE_INGESTION_MODE: str = os.environ.get("VOTE_INGESTION_MODE", "direct")
+    VOTE_BATCH_MAX_SIZE: int = int(os.environ.get("VOTE_BATCH_MAX_SIZE", 200))
+    VOTE_BATCH_MAX_DELAY_MS: int = int(os.environ.get("VOTE_BATCH_MAX_DELAY_MS", 5))
+    # Окно сводки голосов для экспертов в режиме digest
+    VOTE_DIGEST_WINDOW_SECONDS: int = int(
+        os.environ.get("VOTE_DIGEST_WINDOW_SECONDS", 120)
+    )
+    # 0 — отправлять outbox только отдельным `python -m src.cli outbox-worker`
+    OUTBOX_WORKER_EMBEDDED: bool = os.environ.get("OUTBOX_WORKER_EMBEDDED", "1") == "1"
+    OUTBOX_CONCURRENCY: int = int(os.environ.get("OUTBOX_CONCURRENCY", 5))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8))
     SENTRY_DSN: str | None = os.environ.get("SENTRY_DSN", None)
 
     YOOKASSA_SHOP_ID: str = os.environ.get("YOOKASSA_SHOP_ID")
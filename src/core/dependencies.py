@@ -1,7 +1,7 @@
+import asyncio
 import json
 from typing import Optional, Dict
 
-import httpx
 import redis.asyncio as redis
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, Header, status
@@ -9,9 +9,22 @@ from loguru import logger
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
+from src.core.circuit_breaker import CircuitBreaker
 from src.core.config import settings
+from src.core.exceptions import InvalidTokenError, TokenCheckUnavailableError
+from src.core.profile_cache import get_or_build_profile, set_cached_profile
+from src.core.rate_limiter import RateLimitTimeout, VkRateLimiter
+from src.core.token_manager import TokenManager
+from src.core.vk_http import VkHttpClient
+from src.core.vk_launch_params import verify_launch_params
 from src.crud import expert_crud
+from src.services.event_cache import EventCache
+from src.services.leaderboard import Leaderboard
+from src.services.live_event_state import LiveEventState, LiveTallyBroadcaster
 from src.services.notifier import Notifier
+from src.services.tariff_catalog import TariffCatalog
+from src.services.vote_digest import VoteDigest
+from src.services.vote_ingestor import VoteIngestor
 from src.schemas import expert_schemas
 
 from src.crud import event_crud
@@ -28,42 +41,110 @@ async def get_db() -> AsyncSession:
         yield session
 
 
-notifier = Notifier(token=settings.VK_BOT_TOKEN)
+redis_pool = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+async def get_redis() -> redis.Redis:
+    return redis_pool
+
+
+vk_http = VkHttpClient(
+    max_connections=settings.VK_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.VK_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=settings.VK_HTTP_KEEPALIVE_EXPIRY,
+    connect_timeout=settings.VK_API_CONNECT_TIMEOUT,
+    read_timeout=settings.VK_API_READ_TIMEOUT,
+    connect_retries=settings.VK_HTTP_CONNECT_RETRIES,
+    read_retries=settings.VK_HTTP_READ_RETRIES,
+    http2=settings.VK_HTTP2,
+)
+
+vk_group_limiter = VkRateLimiter(
+    redis_pool, settings.VK_BOT_TOKEN, rate=settings.VK_GROUP_RPS
+)
+vk_service_limiter = VkRateLimiter(
+    redis_pool, settings.VK_SERVICE_KEY, rate=settings.VK_SERVICE_RPS
+)
+
+# Ошибки VK пробрасываются, чтобы воркер outbox повторял доставку
+notifier = Notifier(
+    token=settings.VK_BOT_TOKEN,
+    redis_client=redis_pool,
+    raise_errors=True,
+    rate_limiter=vk_group_limiter,
+    http_client=vk_http,
+)
 
 
 def get_notifier() -> Notifier:
     return notifier
 
 
-redis_pool = redis.from_url(settings.REDIS_URL, decode_responses=True)
+leaderboard = Leaderboard(redis_pool)
+tariff_catalog = TariffCatalog(AsyncSessionLocal, redis_pool)
+event_cache = EventCache(redis_pool, tariff_catalog)
+live_event_state = LiveEventState(redis_pool)
+live_tally_broadcaster = LiveTallyBroadcaster(redis_pool)
 
 
-async def get_redis() -> redis.Redis:
-    return redis_pool
+def get_event_cache() -> EventCache:
+    return event_cache
 
 
-async def get_validated_vk_id(
-    authorization: Optional[str] = Header(None),
-    cache: redis.Redis = Depends(get_redis),
-) -> int:
-    if authorization is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authorization header is missing",
-        )
-    token_type, _, access_token = authorization.partition(" ")
-    if token_type.lower() != "bearer" or not access_token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token format"
-        )
+def get_live_event_state() -> LiveEventState:
+    return live_event_state
 
-    token_cache_key = f"token_to_id:{access_token}"
-    cached_id = await cache.get(token_cache_key)
 
-    if cached_id:
-        vk_user_id = int(cached_id)
-        logger.trace(f"VK User ID {vk_user_id} found in token cache.")
-        return vk_user_id
+def get_live_tally_broadcaster() -> LiveTallyBroadcaster:
+    return live_tally_broadcaster
+
+
+vote_digest = VoteDigest(redis_pool)
+
+
+def get_vote_digest() -> VoteDigest:
+    return vote_digest
+
+
+vote_ingestor = VoteIngestor(
+    AsyncSessionLocal,
+    max_batch_size=settings.VOTE_BATCH_MAX_SIZE,
+    max_delay_ms=settings.VOTE_BATCH_MAX_DELAY_MS,
+)
+
+
+def get_vote_ingestor() -> Optional[VoteIngestor]:
+    if settings.VOTE_INGESTION_MODE == "batched":
+        return vote_ingestor
+    return None
+
+
+def get_leaderboard() -> Leaderboard:
+    return leaderboard
+
+
+token_manager = TokenManager(redis_pool, cache_lifetime=300)
+
+
+vk_breaker = CircuitBreaker(
+    failure_threshold=settings.VK_BREAKER_THRESHOLD,
+    reset_timeout=settings.VK_BREAKER_RESET_TIMEOUT,
+)
+
+# Коды VK API, означающие сбой на стороне VK, а не невалидный токен
+VK_TRANSIENT_ERROR_CODES = {1, 6, 9, 10}
+
+
+async def _check_token_via_vk(access_token: str) -> int:
+    # Слот лимита берётся до размыкателя: иначе тайм-аут очереди занял бы
+    # пробную попытку half-open без записи исхода
+    try:
+        await vk_service_limiter.acquire(max_wait=settings.VK_SERVICE_MAX_WAIT)
+    except RateLimitTimeout:
+        logger.warning("VK service key rate limit queue is full")
+        raise TokenCheckUnavailableError()
+    if not vk_breaker.allow():
+        raise TokenCheckUnavailableError()
 
     logger.trace("Checking token via VK API...")
     params = {
@@ -71,41 +152,91 @@ async def get_validated_vk_id(
         "access_token": settings.VK_SERVICE_KEY,
         "v": "5.199",
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                "https://api.vk.com/method/secure.checkToken", params=params
-            )
-            response.raise_for_status()
-            data = response.json()
-        except Exception as e:
-            logger.error(f"VK API connection error: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Could not connect to VK API",
-            )
+    try:
+        response = await vk_http.get(
+            f"{settings.VK_API_URL}/secure.checkToken", params=params
+        )
+        response.raise_for_status()
+        data = response.json()
+    except asyncio.CancelledError:
+        # Отмена ничего не говорит о VK: пробная попытка не должна зависнуть
+        vk_breaker.release_trial()
+        raise
+    except Exception as e:
+        logger.error(f"VK API connection error: {e}")
+        vk_breaker.record_failure()
+        raise TokenCheckUnavailableError()
 
     if "error" in data:
+        if data["error"].get("error_code") in VK_TRANSIENT_ERROR_CODES:
+            logger.error(f"VK API transient error: {data['error']}")
+            vk_breaker.record_failure()
+            raise TokenCheckUnavailableError()
+        vk_breaker.record_success()
         error_msg = data["error"].get("error_msg", "Unknown error")
         logger.warning(f"Invalid token attempt: {error_msg}")
+        raise InvalidTokenError(error_msg)
+
+    vk_breaker.record_success()
+    return data["response"]["user_id"]
+
+
+async def get_validated_vk_id(
+    authorization: Optional[str] = Header(None),
+) -> int:
+    if authorization is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Invalid token: {error_msg}",
+            detail="Authorization header is missing",
+        )
+    token_type, _, access_token = authorization.partition(" ")
+    if token_type.lower() == "vk" and access_token:
+        # Подписанные параметры запуска проверяются локально, без сети
+        if not settings.VK_APP_SECRET_KEY or not settings.VK_APP_ID:
+            logger.error("VK_APP_SECRET_KEY or VK_APP_ID is not set")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Launch params auth is not configured",
+            )
+        vk_user_id = verify_launch_params(
+            access_token,
+            settings.VK_APP_SECRET_KEY,
+            settings.VK_APP_ID,
+            settings.VK_LAUNCH_PARAMS_MAX_AGE,
         )
+        if vk_user_id is None:
+            logger.warning("Invalid VK launch params signature")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid launch params signature",
+            )
+        return vk_user_id
 
-    vk_user_id = data["response"]["user_id"]
+    if token_type.lower() != "bearer" or not access_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token format"
+        )
 
-    await cache.set(token_cache_key, vk_user_id, ex=300)
-    return vk_user_id
+    try:
+        return await token_manager.resolve(access_token, _check_token_via_vk)
+    except InvalidTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid token: {e.reason}",
+        )
+    except TokenCheckUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not connect to VK API",
+        )
 
 
 async def get_optional_validated_vk_id(
     authorization: Optional[str] = Header(None),
-    cache: redis.Redis = Depends(get_redis),
 ) -> Optional[int]:
     if authorization is None:
         return None
-    return await get_validated_vk_id(authorization, cache)
+    return await get_validated_vk_id(authorization)
 
 
 async def get_current_user(
@@ -113,19 +244,11 @@ async def get_current_user(
     db: AsyncSession = Depends(get_db),
     cache: redis.Redis = Depends(get_redis),
 ) -> Dict:
-    cache_key = f"user_profile:{vk_user_id}"
-    cached_user_str = await cache.get(cache_key)
-
-    if cached_user_str:
-        user_dict = json.loads(cached_user_str)
-        if user_dict.get("is_expert") and "event_usage" not in user_dict:
-            logger.info(
-                f"Cache for user {vk_user_id} is outdated (missing event_usage), refreshing..."
-            )
-        else:
-            return user_dict
-
-    return await fetch_and_cache_user_profile(vk_user_id, db, cache)
+    return await get_or_build_profile(
+        cache,
+        vk_user_id,
+        lambda: fetch_and_cache_user_profile(vk_user_id, db, cache),
+    )
 
 
 async def fetch_and_cache_user_profile(
@@ -153,6 +276,7 @@ async def fetch_and_cache_user_profile(
         response_data.is_expert = profile.status == "approved"
         response_data.status = profile.status
         response_data.show_community_rating = profile.show_community_rating
+        response_data.vote_notification_mode = profile.vote_notification_mode
         response_data.regalia = profile.regalia
         response_data.social_link = str(profile.social_link)
         if profile.selected_themes:
@@ -160,54 +284,24 @@ async def fetch_and_cache_user_profile(
                 f"{theme.category.name} > {theme.name}"
                 for theme in profile.selected_themes
             ]
-        current_tariff_name = "Начальный"
-        current_tariff_limit = 3
-
-        from src.models.tariff import Tariff
-        from sqlalchemy import select
-
-        tariffs_result = await db.execute(
-            select(Tariff).where(Tariff.is_active).order_by(Tariff.price.desc())
-        )
-        all_tariffs = tariffs_result.scalars().all()
-
-        start_tariff = next((t for t in all_tariffs if t.price == 0), None)
-        if start_tariff:
-            current_tariff_limit = start_tariff.event_limit
-
-        if user.forced_tariff_id:
-            forced_tariff = next(
-                (t for t in all_tariffs if t.id == user.forced_tariff_id), None
-            )
-            if forced_tariff:
-                current_tariff_name = forced_tariff.name
-                current_tariff_limit = forced_tariff.event_limit
-        elif user.subscription and user.subscription.is_active:
-            for tariff in all_tariffs:
-                if user.subscription.amount >= tariff.price:
-                    current_tariff_name = tariff.name
-                    current_tariff_limit = tariff.event_limit
-                    break
-
-            if user.subscription.next_payment_date:
-                response_data.next_payment_date = user.subscription.next_payment_date
-
-        response_data.tariff_plan = current_tariff_name
+        tariff = await tariff_catalog.resolve(user)
+        response_data.tariff_plan = tariff.name
+        subscription = user.subscription
+        if not user.forced_tariff_id and subscription and subscription.is_active:
+            response_data.next_payment_date = subscription.next_payment_date
 
         if response_data.is_expert:
-            limit = current_tariff_limit
             current_count = (
                 await event_crud.get_expert_active_event_count_current_month(
                     db, vk_user_id
                 )
             )
             response_data.event_usage = expert_schemas.EventUsage(
-                current_count=current_count, limit=limit
+                current_count=current_count, limit=tariff.event_limit
             )
 
     current_user_dict = response_data.model_dump(mode="json")
-    cache_key = f"user_profile:{vk_user_id}"
-    await cache.set(cache_key, json.dumps(current_user_dict), ex=3600)
+    await set_cached_profile(cache, vk_user_id, current_user_dict)
     return current_user_dict
 
 
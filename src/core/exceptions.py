@@ -46,3 +46,12 @@ async def idempotent_exception_handler(request: Request, exc: IdempotentExceptio
         content=exc.content,
         headers={"X-Idempotency-Cached": "true"},
     )
+
+
+class InvalidTokenError(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+class TokenCheckUnavailableError(Exception):
+    pass
@@ -0,0 +1,46 @@
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: Optional[str], fields: Optional[dict] = None
+) -> Optional[dict]:
+    """
+    Разбирает непрозрачный курсор из query-параметра и проверяет, что в нём
+    есть все поля fields {ключ: тип} нужных типов.
+    Некорректный курсор — ошибка клиента, а не повод начать с первой страницы.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data, dict) or not all(
+            _is_instance(data.get(key), type_) for key, type_ in (fields or {}).items()
+        ):
+            raise ValueError("malformed cursor payload")
+        return data
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def _is_instance(value, type_: type) -> bool:
+    # bool в JSON — не число, хотя в Python это подкласс int
+    return isinstance(value, type_) and not isinstance(value, bool)
+
+
+def should_include_total(cursor: Optional[dict], include_total: Optional[bool]) -> bool:
+    # Без курсора клиент работает в старом режиме page/size и ждёт total_count
+    if include_total is None:
+        return cursor is None
+    return include_total
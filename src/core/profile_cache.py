@@ -0,0 +1,61 @@
+from typing import Awaitable, Callable, Dict, Optional
+
+import orjson
+import redis.asyncio as redis
+from loguru import logger
+from redis.exceptions import LockError
+
+# Увеличивается при любом изменении состава UserPrivateRead: старые ключи
+# просто перестают читаться и истекают сами, без ручных проверок полей.
+PROFILE_CACHE_VERSION = 3
+PROFILE_CACHE_TTL = 3600
+
+
+def profile_cache_key(vk_id: int) -> str:
+    return f"user_profile:v{PROFILE_CACHE_VERSION}:{vk_id}"
+
+
+async def get_cached_profile(cache: redis.Redis, vk_id: int) -> Optional[Dict]:
+    cached = await cache.get(profile_cache_key(vk_id))
+    if cached is None:
+        return None
+    return orjson.loads(cached)
+
+
+async def set_cached_profile(cache: redis.Redis, vk_id: int, profile: Dict):
+    await cache.set(
+        profile_cache_key(vk_id), orjson.dumps(profile), ex=PROFILE_CACHE_TTL
+    )
+
+
+async def invalidate_user_profile(cache: redis.Redis, *vk_ids: int):
+    if vk_ids:
+        await cache.delete(*(profile_cache_key(vk_id) for vk_id in vk_ids))
+
+
+async def get_or_build_profile(
+    cache: redis.Redis, vk_id: int, build: Callable[[], Awaitable[Dict]]
+) -> Dict:
+    """
+    Читает профиль из кеша, а при промахе собирает его под Redis-блокировкой,
+    чтобы параллельные запросы одного пользователя (в том числе из разных
+    воркеров) не пересобирали профиль одновременно. `build` сам пишет в кеш.
+    """
+    profile = await get_cached_profile(cache, vk_id)
+    if profile is not None:
+        return profile
+
+    lock = cache.lock(f"lock:user_profile:{vk_id}", timeout=10, blocking_timeout=5)
+    if not await lock.acquire():
+        logger.warning(f"Profile lock for user {vk_id} timed out, building anyway")
+        return await build()
+    try:
+        profile = await get_cached_profile(cache, vk_id)
+        if profile is not None:
+            return profile
+        return await build()
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            pass
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional
+
+import redis.asyncio as redis
+from loguru import logger
+
+# Токен-бакет: KEYS[1] — hash {tokens, ts}, ARGV — скорость (токенов в
+# секунду) и ёмкость. Время берётся из Redis, чтобы у всех воркеров были
+# одни часы (на Redis < 5 для этого нужен replicate_commands). Возвращает
+# 0, если токен выдан, иначе сколько мс ждать.
+_ACQUIRE_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimitTimeout(Exception):
+    pass
+
+
+class VkRateLimiter:
+    """
+    Общий для всех воркеров лимит запросов к VK API на один access token.
+    Ключ в Redis строится по хешу токена, поэтому ключ сообщества и
+    сервисный ключ ограничиваются независимо. Вызывающий ждёт свободный
+    слот, а не получает ошибку 6; внутри воркера ожидающие идут по очереди.
+
+    Если Redis недоступен, запросы пропускаются без ограничения.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        access_token: Optional[str],
+        rate: float,
+        burst: Optional[float] = None,
+    ):
+        digest = hashlib.sha256((access_token or "").encode()).hexdigest()[:16]
+        self._key = f"vk_rate:{digest}"
+        self._rate = rate
+        self._burst = burst or rate
+        self._script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+        self._acquired = 0
+        self._delayed = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def acquire(self, max_wait: Optional[float] = None):
+        """
+        Ждёт слот. С max_wait бросает RateLimitTimeout, если слот не
+        освободится за это время.
+        """
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self._lock.acquire(), max_wait)
+            except asyncio.TimeoutError:
+                self._timeouts += 1
+                raise RateLimitTimeout()
+            try:
+                await self._take_token(started, max_wait)
+            finally:
+                self._lock.release()
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - started
+        self._acquired += 1
+        if waited >= 0.01:
+            self._delayed += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    async def _take_token(self, started: float, max_wait: Optional[float]):
+        while True:
+            try:
+                wait_ms = await self._script(
+                    keys=[self._key], args=[self._rate, self._burst]
+                )
+            except redis.RedisError as e:
+                logger.error(f"VK rate limiter unavailable, passing through: {e}")
+                return
+            if not wait_ms:
+                return
+            wait = wait_ms / 1000
+            if max_wait is not None and time.monotonic() - started + wait > max_wait:
+                self._timeouts += 1
+                raise RateLimitTimeout()
+            await asyncio.sleep(wait)
+
+    def get_stats(self) -> Dict:
+        return {
+            "rate_per_second": self._rate,
+            "queue_depth": self._waiting,
+            "acquired": self._acquired,
+            "delayed": self._delayed,
+            "timeouts": self._timeouts,
+            "wait_seconds_total": round(self._wait_total, 3),
+            "wait_seconds_avg": (
+                round(self._wait_total / self._delayed, 3) if self._delayed else 0.0
+            ),
+            "wait_seconds_max": round(self._wait_max, 3),
+        }
@@ -1,30 +1,143 @@
 import asyncio
-from collections import defaultdict
-import json
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict
+
 import redis.asyncio as redis
-from typing import Dict
+from loguru import logger
+
+from src.core.exceptions import InvalidTokenError, TokenCheckUnavailableError
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
 
 
 class TokenManager:
+    """
+    Двухуровневый кеш token -> vk_id: ограниченный LRU/TTL в памяти воркера
+    поверх Redis. Промах по обоим уровням проверяется через `check` ровно
+    один раз на токен в пределах воркера (single-flight).
+    Отклонённые токены кешируются ненадолго, а при недоступности VK
+    отдаётся последний подтверждённый vk_id из долгоживущего ключа.
+    """
 
-    def __init__(self, redis_client: redis.Redis, cache_lifetime: int):
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        cache_lifetime: int,
+        local_ttl: int = 60,
+        max_size: int = 10000,
+        negative_ttl: int = 60,
+        stale_ttl: int = 86400,
+    ):
         self._redis = redis_client
         self._cache_lifetime = cache_lifetime
-        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._local_ttl = local_ttl
+        self._max_size = max_size
+        self._negative_ttl = negative_ttl
+        self._stale_ttl = stale_ttl
+        self._local: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        # Блокировка живёт, пока её кто-то ждёт, и удаляется последним владельцем
+        self._locks: Dict[str, list] = {}
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "negative_hits": 0,
+            "stale_served": 0,
+        }
+
+    def _get_local(self, key: str) -> int | None:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        vk_id, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return vk_id
+
+    def _set_local(self, key: str, vk_id: int):
+        self._local[key] = (vk_id, time.monotonic() + self._local_ttl)
+        self._local.move_to_end(key)
+        while len(self._local) > self._max_size:
+            self._local.popitem(last=False)
+
+    @asynccontextmanager
+    async def _lock(self, key: str):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    async def resolve(self, token: str, check: Callable[[str], Awaitable[int]]) -> int:
+        key = hash_token(token)
+        vk_id = self._get_local(key)
+        if vk_id is not None:
+            self._stats["local_hits"] += 1
+            return vk_id
+
+        async with self._lock(key):
+            vk_id = self._get_local(key)
+            if vk_id is not None:
+                self._stats["coalesced"] += 1
+                return vk_id
+
+            cached_id = await self._redis.get(f"token_to_id:{token}")
+            if cached_id:
+                self._stats["redis_hits"] += 1
+                vk_id = int(cached_id)
+            else:
+                vk_id = await self._check(token, key, check)
+
+            self._set_local(key, vk_id)
+            return vk_id
 
-    def get_lock(self, token: str) -> asyncio.Lock:
-        return self._locks[token]
+    async def _check(
+        self, token: str, key: str, check: Callable[[str], Awaitable[int]]
+    ) -> int:
+        rejected_reason = await self._redis.get(f"token_invalid:{key}")
+        if rejected_reason is not None:
+            self._stats["negative_hits"] += 1
+            raise InvalidTokenError(rejected_reason)
 
-    async def get_user_from_cache(self, token: str) -> Dict | None:
-        cache_key = f"token:{token}"
-        cached_user_str = await self._redis.get(cache_key)
-        if cached_user_str:
-            return json.loads(cached_user_str)
-        return None
+        self._stats["misses"] += 1
+        try:
+            vk_id = await check(token)
+        except InvalidTokenError as e:
+            await self._redis.set(
+                f"token_invalid:{key}", e.reason, ex=self._negative_ttl
+            )
+            raise
+        except TokenCheckUnavailableError:
+            stale_id = await self._redis.get(f"token_stale:{key}")
+            if stale_id is None:
+                raise
+            self._stats["stale_served"] += 1
+            logger.warning("VK unavailable, serving last confirmed identity")
+            return int(stale_id)
 
-    async def set_user_to_cache(self, token: str, user_data: Dict):
-        cache_key = f"token:{token}"
-        if user_data.get("registration_date"):
-            user_data["registration_date"] = user_data["registration_date"].isoformat()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"token_to_id:{token}", vk_id, ex=self._cache_lifetime)
+            pipe.set(f"token_stale:{key}", vk_id, ex=self._stale_ttl)
+            await pipe.execute()
+        return vk_id
 
-        await self._redis.setex(cache_key, self._cache_lifetime, json.dumps(user_data))
+    def get_stats(self) -> Dict:
+        return {
+            **self._stats,
+            "local_size": len(self._local),
+            "pending_locks": len(self._locks),
+        }
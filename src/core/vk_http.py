@@ -0,0 +1,93 @@
+from typing import Dict
+
+import httpx
+from loguru import logger
+
+try:
+    import h2  # noqa: F401
+except ImportError:
+    h2 = None
+
+# Запрос мог дойти до VK: повторяем только идемпотентные
+_READ_ERRORS = (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+
+class VkHttpClient:
+    """
+    Один пул соединений к VK на процесс: для проверки токенов и для
+    Notifier. Keep-alive избавляет горячий путь от повторных TLS-рукопожатий,
+    HTTP/2 даёт пакет h2 из httpx[http2]; без него клиент работает по HTTP/1.1.
+
+    Неудачное подключение повторяет транспорт (запрос ещё не отправлен),
+    сбой при чтении ответа — только для идемпотентных запросов.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        connect_timeout: float,
+        read_timeout: float,
+        connect_retries: int = 2,
+        read_retries: int = 1,
+        http2: bool = True,
+    ):
+        if http2 and h2 is None:
+            logger.warning("Package 'h2' is not installed, VK client uses HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._read_retries = read_retries
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            retries=connect_retries,
+        )
+        self._client = httpx.AsyncClient(
+            transport=self._transport,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+        self._requests = 0
+        self._retries = 0
+        self._errors = 0
+
+    async def request(
+        self, method: str, url: str, idempotent: bool = False, **kwargs
+    ) -> httpx.Response:
+        attempts = 1 + (self._read_retries if idempotent else 0)
+        for attempt in range(attempts):
+            self._requests += 1
+            try:
+                return await self._client.request(method, url, **kwargs)
+            except _READ_ERRORS:
+                if attempt + 1 >= attempts:
+                    self._errors += 1
+                    raise
+                self._retries += 1
+            except httpx.HTTPError:
+                self._errors += 1
+                raise
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, idempotent=True, **kwargs)
+
+    async def post(self, url: str, idempotent: bool = False, **kwargs):
+        return await self.request("POST", url, idempotent=idempotent, **kwargs)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def get_stats(self) -> Dict:
+        connections = self._transport._pool.connections
+        return {
+            "http2": self.http2,
+            "connections": len(connections),
+            "idle_connections": sum(1 for conn in connections if conn.is_idle()),
+            "requests": self._requests,
+            "read_retries": self._retries,
+            "errors": self._errors,
+        }
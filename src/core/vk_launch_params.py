@@ -0,0 +1,58 @@
+import base64
+import hashlib
+import hmac
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+# Допуск на расхождение часов с VK для vk_ts из будущего
+CLOCK_SKEW_SECONDS = 60
+
+
+def _sign(vk_params: dict, secret: str) -> str:
+    payload = urlencode(sorted(vk_params.items()))
+    digest = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def verify_launch_params(
+    query: str,
+    secret: str,
+    app_id: int,
+    max_age_seconds: int,
+    now: Optional[float] = None,
+) -> Optional[int]:
+    """
+    Проверяет подпись параметров запуска VK Mini App локально, без запроса к VK.
+    Подписываются только vk_* параметры, отсортированные по ключу.
+    Возвращает vk_user_id или None, если подпись или приложение не совпадают
+    либо параметры старше max_age_seconds (по vk_ts).
+    """
+    if not query or not secret or not app_id:
+        return None
+
+    params = dict(parse_qsl(query.lstrip("?"), keep_blank_values=True))
+    sign = params.get("sign")
+    if not sign:
+        return None
+
+    vk_params = {k: v for k, v in params.items() if k.startswith("vk_")}
+    # compare_digest не принимает str с не-ASCII символами, сравниваем байты
+    if not hmac.compare_digest(_sign(vk_params, secret).encode(), sign.encode()):
+        return None
+
+    if vk_params.get("vk_app_id") != str(app_id):
+        return None
+
+    try:
+        issued_at = int(vk_params["vk_ts"])
+    except (KeyError, ValueError):
+        return None
+    age = (time.time() if now is None else now) - issued_at
+    if age > max_age_seconds or age < -CLOCK_SKEW_SECONDS:
+        return None
+
+    try:
+        return int(vk_params["vk_user_id"])
+    except (KeyError, ValueError):
+        return None
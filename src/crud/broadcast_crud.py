@@ -0,0 +1,136 @@
+import zlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models import BroadcastJob, NotificationOutbox, User
+
+# Вид строки outbox с одним чанком рассылки
+BROADCAST_CHUNK = "broadcast_chunk"
+# Лимит peer_ids в одном messages.send
+BROADCAST_CHUNK_SIZE = 100
+
+
+def broadcast_text(message: str) -> str:
+    return f"📢 Сообщение от администратора:\n\n{message}"
+
+
+def chunk_random_id(job_id: int, seq: int) -> int:
+    """Постоянный random_id чанка: VK не продублирует его при повторе."""
+    return zlib.crc32(f"broadcast:{job_id}:{seq}".encode()) & 0x7FFFFFFF
+
+
+async def create_broadcast_job(
+    db: AsyncSession, message: str, target_group: str, created_by: Optional[int]
+) -> BroadcastJob:
+    """
+    Фиксирует список получателей и ставит его в outbox чанками по
+    BROADCAST_CHUNK_SIZE. Рассылка и все её чанки создаются в одной
+    транзакции.
+    """
+    query = select(User.vk_id).where(User.allow_notifications)
+    if target_group == "experts":
+        query = query.where(User.is_expert)
+    elif target_group == "users":
+        query = query.where(User.is_expert.is_not(True))
+    result = await db.execute(query.order_by(User.vk_id))
+    peer_ids = result.scalars().all()
+
+    chunks = [
+        peer_ids[start : start + BROADCAST_CHUNK_SIZE]
+        for start in range(0, len(peer_ids), BROADCAST_CHUNK_SIZE)
+    ]
+    job = BroadcastJob(
+        message=message,
+        target_group=target_group,
+        created_by=created_by,
+        total_recipients=len(peer_ids),
+        chunks_total=len(chunks),
+    )
+    if not chunks:
+        job.status = "done"
+        job.finished_at = datetime.now(timezone.utc)
+    db.add(job)
+    await db.flush()
+
+    if chunks:
+        await db.execute(
+            insert(NotificationOutbox),
+            [
+                {
+                    "kind": BROADCAST_CHUNK,
+                    "payload": {"job_id": job.id, "seq": seq, "peer_ids": chunk},
+                }
+                for seq, chunk in enumerate(chunks)
+            ],
+        )
+    await db.commit()
+    # created_at — серверный default: без RETURNING (MySQL) его нет в объекте
+    await db.refresh(job)
+    return job
+
+
+async def _add_chunk_result(db: AsyncSession, job_id: int, sent: int, failed: int):
+    await db.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id)
+        .values(
+            chunks_done=BroadcastJob.chunks_done + 1,
+            sent_count=BroadcastJob.sent_count + sent,
+            failed_count=BroadcastJob.failed_count + failed,
+            status="running",
+            started_at=func.coalesce(BroadcastJob.started_at, func.now()),
+        )
+    )
+    # Отдельным запросом: MySQL подставляет в SET уже обновлённые значения
+    await db.execute(
+        update(BroadcastJob)
+        .where(
+            BroadcastJob.id == job_id,
+            BroadcastJob.chunks_done >= BroadcastJob.chunks_total,
+        )
+        .values(status="done", finished_at=func.now())
+    )
+
+
+async def record_chunk_result(
+    db: AsyncSession, outbox_id: int, job_id: int, sent: int, failed: int
+) -> None:
+    """
+    Контрольная точка чанка: отмечает строку outbox отправленной и
+    прибавляет результат к рассылке в одной транзакции. Если чанк уже
+    учтён (повтор после сбоя), счётчики не меняются.
+    """
+    result = await db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.id == outbox_id,
+            NotificationOutbox.status == "processing",
+        )
+        .values(status="sent", sent_at=func.now(), last_error=None)
+    )
+    if result.rowcount:
+        await _add_chunk_result(db, job_id, sent, failed)
+    await db.commit()
+
+
+async def record_dead_chunk(db: AsyncSession, job_id: int, recipients: int) -> None:
+    """Чанк исчерпал попытки: все его получатели считаются недоставленными."""
+    await _add_chunk_result(db, job_id, 0, recipients)
+    await db.commit()
+
+
+async def get_broadcast_job(db: AsyncSession, job_id: int) -> Optional[BroadcastJob]:
+    return await db.get(BroadcastJob, job_id)
+
+
+async def get_recent_broadcast_jobs(
+    db: AsyncSession, limit: int = 20
+) -> list[BroadcastJob]:
+    result = await db.execute(
+        select(BroadcastJob).order_by(BroadcastJob.id.desc()).limit(limit)
+    )
+    return result.scalars().all()
@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Sequence
 
 from dateutil.parser import isoparse
 from loguru import logger
-from sqlalchemy import and_, case, func
+from sqlalchemy import and_, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from src.models import Event, EventFeedback, ExpertProfile, ExpertRating, Theme
+from src.crud import event_stats_crud, vote_crud
+from src.models import Event, EventFeedback, EventVoteStats, ExpertProfile, Theme
 from src.schemas import event_schemas
+from src.services.event_cache import EventCache, EventSnapshot, normalize_promo
+from src.services.live_event_state import LiveEventState
+from src.services.vote_ingestor import VoteIngestor
 
 
 async def get_expert_active_event_count_current_month(
@@ -27,20 +31,19 @@ async def get_expert_active_event_count_current_month(
     return result.scalar_one()
 
 
+def event_end_time(event_date: datetime, duration_minutes: int) -> datetime:
+    return event_date + timedelta(minutes=duration_minutes)
+
+
 async def check_event_availability(
     db: AsyncSession, promo_word: str, event_date: datetime, duration_minutes: int
 ) -> bool:
-    promo_normalized = promo_word.upper().strip()
-
-    query = select(Event).where(
-        func.upper(Event.promo_word) == promo_normalized,
-        Event.status.in_(["approved", "pending"]),
-    )
-    result = await db.execute(query)
-    conflicting_events = result.scalars().all()
-
-    if not conflicting_events:
-        return True
+    """
+    Проверяет, что промо-слово свободно на [начало - 30 мин, конец + 30 мин].
+    Один запрос с LIMIT 1 по индексу (promo_word, status, end_time):
+    условие end_time > начала окна сразу отсекает всю историю слова.
+    """
+    promo_normalized = normalize_promo(promo_word)
 
     buffer = timedelta(minutes=30)
 
@@ -50,29 +53,36 @@ async def check_event_availability(
     if new_event_start.tzinfo is None:
         new_event_start = new_event_start.replace(tzinfo=timezone.utc)
 
-    new_event_start -= buffer
-    new_event_end = new_event_start + timedelta(minutes=duration_minutes) + (buffer * 2)
+    window_start = new_event_start - buffer
+    window_end = event_end_time(new_event_start, duration_minutes) + buffer
 
-    for existing_event in conflicting_events:
-        existing_start = existing_event.event_date
-        if existing_start.tzinfo is None:
-            existing_start = existing_start.replace(tzinfo=timezone.utc)
-
-        existing_end = existing_start + timedelta(
-            minutes=existing_event.duration_minutes
+    query = (
+        select(Event.id)
+        .where(
+            Event.promo_word == promo_normalized,
+            Event.status.in_(["approved", "pending"]),
+            Event.end_time > window_start,
+            Event.event_date < window_end,
         )
-
-        if new_event_start < existing_end and new_event_end > existing_start:
-            logger.warning(
-                f"Availability check failed for '{promo_normalized}' on {event_date}. "
-                f"Conflict with event ID {existing_event.id}."
-            )
-            return False
+        .limit(1)
+    )
+    conflict_id = (await db.execute(query)).scalar_one_or_none()
+    if conflict_id is not None:
+        logger.warning(
+            f"Availability check failed for '{promo_normalized}' on {event_date}. "
+            f"Conflict with event ID {conflict_id}."
+        )
+        return False
 
     return True
 
 
-async def delete_event_by_id(db: AsyncSession, event_id: int, expert_id: int) -> bool:
+async def delete_event_by_id(
+    db: AsyncSession,
+    event_id: int,
+    expert_id: int,
+    event_cache: Optional[EventCache] = None,
+) -> bool:
     result = await db.execute(select(Event).where(Event.id == event_id))
     event = result.scalars().first()
 
@@ -89,11 +99,16 @@ async def delete_event_by_id(db: AsyncSession, event_id: int, expert_id: int) ->
 
     await db.delete(event)
     await db.commit()
+    if event_cache:
+        await event_cache.invalidate(event.promo_word)
     return True
 
 
 async def stop_event_voting(
-    db: AsyncSession, event_id: int, expert_id: int
+    db: AsyncSession,
+    event_id: int,
+    expert_id: int,
+    event_cache: Optional[EventCache] = None,
 ) -> Optional[Event]:
     result = await db.execute(select(Event).where(Event.id == event_id))
     event = result.scalars().first()
@@ -103,18 +118,20 @@ async def stop_event_voting(
 
     now = datetime.now(timezone.utc)
     event_start_time = event.event_date.replace(tzinfo=timezone.utc)
-    event_end_time = event_start_time + timedelta(minutes=event.duration_minutes)
 
-    if not (event_start_time <= now < event_end_time):
+    if not (event_start_time <= now < event.end_time.replace(tzinfo=timezone.utc)):
         raise ValueError(
             "Можно остановить только то голосование, которое идет в данный момент."
         )
 
     new_duration = (now - event_start_time).total_seconds() / 60
     event.duration_minutes = int(new_duration)
+    event.end_time = event_end_time(event.event_date, event.duration_minutes)
 
     await db.commit()
     await db.refresh(event)
+    if event_cache:
+        await event_cache.invalidate(event.promo_word)
     return event
 
 
@@ -144,7 +161,7 @@ async def create_event(
             "Это промо-слово уже занято на указанное время или близкое к нему."
         )
 
-    promo_normalized = event_data.promo_word.upper().strip()
+    promo_normalized = normalize_promo(event_data.promo_word)
 
     db_event = Event(
         expert_id=expert_id,
@@ -153,6 +170,7 @@ async def create_event(
         promo_word=promo_normalized,
         duration_minutes=event_data.duration_minutes,
         event_date=event_data.event_date,
+        end_time=event_end_time(event_data.event_date, event_data.duration_minutes),
         is_private=event_data.is_private,
         event_link=str(event_data.event_link) if event_data.event_link else None,
         voter_thank_you_message=event_data.voter_thank_you_message,
@@ -169,87 +187,65 @@ async def get_my_events(db: AsyncSession, expert_id: int):
     query = (
         select(
             Event,
-            func.count(EventFeedback.id).label("votes_count"),
-            func.sum(case((EventFeedback.rating_snapshot == 1, 1), else_=0)).label(
-                "trust_count"
-            ),
-            func.sum(case((EventFeedback.rating_snapshot == -1, 1), else_=0)).label(
-                "distrust_count"
-            ),
+            EventVoteStats.votes_count,
+            EventVoteStats.trust_count,
+            EventVoteStats.distrust_count,
         )
-        .outerjoin(EventFeedback, Event.id == EventFeedback.event_id)
+        .outerjoin(EventVoteStats, EventVoteStats.event_id == Event.id)
         .where(Event.expert_id == expert_id)
-        .group_by(Event.id)
         .order_by(Event.event_date.desc())
     )
     results = await db.execute(query)
     return results.all()
 
 
-async def get_event_by_promo(db: AsyncSession, promo_word: str):
-    normalized_promo = promo_word.strip().upper()
-
-    query = (
-        select(Event)
-        .where(Event.promo_word == normalized_promo, Event.status == "approved")
-        .options(selectinload(Event.expert).selectinload(ExpertProfile.user))
-        .order_by(Event.event_date.desc())
-    )
-    result = await db.execute(query)
-    return result.scalars().first()
-
-
 async def create_vote(
-    db: AsyncSession, vote_data: event_schemas.VoteCreate, event: Event
-):
-
-    target_value = 0
+    db: AsyncSession,
+    vote_data: event_schemas.VoteCreate,
+    event: EventSnapshot,
+    ingestor: Optional[VoteIngestor] = None,
+    live_state: Optional[LiveEventState] = None,
+    notifications: Sequence[tuple[str, dict]] = (),
+) -> None:
+    """
+    Записывает голос на мероприятии вместе с уведомлениями
+    [(kind, payload)] для outbox, одним коммитом. С live_state голос
+    сначала учитывается в Redis (там же проверяется лимит тарифа, см.
+    LiveEventState) и откатывается оттуда, если запись в MySQL не удалась.
+    """
+    vote_value = 0
     if vote_data.vote_type == "trust":
-        target_value = 1
+        vote_value = 1
     elif vote_data.vote_type == "distrust":
-        target_value = -1
-
-    rating_query = select(ExpertRating).filter(
-        ExpertRating.expert_id == event.expert_id,
-        ExpertRating.voter_id == vote_data.voter_vk_id,
-        ExpertRating.rating_type == "expert",
-    )
-    rating_res = await db.execute(rating_query)
-    existing_rating = rating_res.scalars().first()
-
-    if vote_data.vote_type == "remove":
-        if existing_rating:
-            await db.delete(existing_rating)
-    elif vote_data.vote_type in ["trust", "distrust"]:
-        if existing_rating:
-            existing_rating.vote_value = target_value
+        vote_value = -1
+
+    vote = {
+        "expert_id": event.expert_id,
+        "voter_id": vote_data.voter_vk_id,
+        "rating_type": "expert",
+        "vote_value": vote_value,
+        "comment": vote_data.comment,
+        "event_id": event.id,
+        "notifications": notifications,
+    }
+    new_voter = False
+    if live_state:
+        new_voter = await live_state.record_vote(
+            db, event, vote_data.voter_vk_id, vote_value
+        )
+    try:
+        if ingestor:
+            await ingestor.submit(**vote)
         else:
-            new_rating = ExpertRating(
-                expert_id=event.expert_id,
-                voter_id=vote_data.voter_vk_id,
-                rating_type="expert",
-                vote_value=target_value,
+            await vote_crud.write_vote(db, **vote)
+    except Exception:
+        if live_state:
+            await live_state.forget_vote(
+                event.id, vote_data.voter_vk_id, vote_value, drop_voter=new_voter
             )
-            db.add(new_rating)
-
-    snapshot_val = 0
-    if vote_data.vote_type == "trust":
-        snapshot_val = 1
-    elif vote_data.vote_type == "distrust":
-        snapshot_val = -1
-
-    db_feedback = EventFeedback(
-        voter_id=vote_data.voter_vk_id,
-        expert_id=event.expert_id,
-        event_id=event.id,
-        comment=vote_data.comment,
-        rating_snapshot=snapshot_val,
-    )
-    db.add(db_feedback)
-
-    await db.commit()
-    await db.refresh(db_feedback)
-    return db_feedback
+        raise
+    if live_state:
+        await live_state.publish(event.id)
 
 
 async def get_pending_events(db: AsyncSession):
@@ -258,7 +254,11 @@ async def get_pending_events(db: AsyncSession):
 
 
 async def set_event_status(
-    db: AsyncSession, event_id: int, status: str, reason: str = None
+    db: AsyncSession,
+    event_id: int,
+    status: str,
+    reason: str = None,
+    event_cache: Optional[EventCache] = None,
 ):
     result = await db.execute(select(Event).filter(Event.id == event_id))
     db_event = result.scalars().first()
@@ -269,6 +269,9 @@ async def set_event_status(
         db_event.rejection_reason = reason
     await db.commit()
     await db.refresh(db_event)
+    if event_cache:
+        # Сбрасывает и отрицательную запись, если слово искали до одобрения
+        await event_cache.invalidate(db_event.promo_word)
     return db_event
 
 
@@ -280,7 +283,7 @@ async def get_public_upcoming_events(db: AsyncSession):
             and_(
                 Event.status == "approved",
                 Event.is_private.is_(False),
-                Event.event_date >= now,
+                Event.end_time >= now,
             )
         )
         .order_by(Event.event_date.asc())
@@ -290,32 +293,40 @@ async def get_public_upcoming_events(db: AsyncSession):
 
 
 async def get_events_by_expert_id(db: AsyncSession, expert_id: int):
+    """
+    Текущие и прошедшие мероприятия эксперта: два диапазона по индексу
+    (expert_id, status, end_time) вместо разбора всей истории в Python.
+    """
+    now = datetime.now(timezone.utc)
+    base = select(Event).where(Event.expert_id == expert_id, Event.status == "approved")
+
+    current_res = await db.execute(
+        base.where(Event.end_time >= now).order_by(Event.event_date.asc())
+    )
+    past_res = await db.execute(
+        base.where(Event.end_time < now).order_by(Event.event_date.desc())
+    )
+    return {
+        "current": current_res.scalars().all(),
+        "past": past_res.scalars().all(),
+    }
+
+
+async def get_live_public_events(db: AsyncSession):
+    """Публичные мероприятия, голосование на которых идёт прямо сейчас."""
     now = datetime.now(timezone.utc)
     query = (
         select(Event)
         .where(
-            and_(
-                Event.expert_id == expert_id,
-                Event.status == "approved",
-            )
+            Event.status == "approved",
+            Event.end_time > now,
+            Event.event_date <= now,
+            Event.is_private.is_(False),
         )
-        .order_by(Event.event_date.desc())
+        .order_by(Event.end_time.asc())
     )
     result = await db.execute(query)
-    all_events = result.scalars().all()
-
-    current_events = []
-    past_events = []
-    for event in all_events:
-        start_time_aware = event.event_date.replace(tzinfo=timezone.utc)
-        end_time = start_time_aware + timedelta(minutes=event.duration_minutes)
-        if end_time < now:
-            past_events.append(event)
-        else:
-            current_events.append(event)
-
-    current_events.sort(key=lambda e: e.event_date)
-    return {"current": current_events, "past": past_events}
+    return result.scalars().all()
 
 
 async def get_public_events_feed(
@@ -325,6 +336,8 @@ async def get_public_events_feed(
     search_query: Optional[str] = None,
     region: Optional[str] = None,
     category_id: Optional[int] = None,
+    cursor: Optional[dict] = None,
+    include_total: bool = True,
 ):
     now = datetime.now(timezone.utc)
 
@@ -335,7 +348,8 @@ async def get_public_events_feed(
             and_(
                 Event.status == "approved",
                 Event.is_private.is_(False),
-                Event.event_date >= now,
+                # Идущие мероприятия остаются в ленте до конца голосования
+                Event.end_time >= now,
             )
         )
         .options(selectinload(Event.expert).selectinload(ExpertProfile.user))
@@ -346,25 +360,43 @@ async def get_public_events_feed(
     if region:
         query = query.where(ExpertProfile.region == region)
     if category_id:
-        query = query.join(ExpertProfile.selected_themes).where(
-            Theme.category_id == category_id
+        # EXISTS вместо JOIN: без дублей строк LIMIT отдаёт ровно size событий
+        query = query.where(
+            ExpertProfile.selected_themes.any(Theme.category_id == category_id)
         )
 
-    count_query = select(func.count()).select_from(query.distinct().subquery())
-    total_count_res = await db.execute(count_query)
-    total_count = total_count_res.scalar_one()
-
-    paginated_query = (
-        query.order_by(Event.event_date.asc(), Event.id.asc())
-        .offset((page - 1) * size)
-        .limit(size)
-    )
+    total_count = None
+    if include_total:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_count = (await db.execute(count_query)).scalar_one()
+
+    query = query.order_by(Event.event_date.asc(), Event.id.asc())
+    if cursor:
+        after_date = isoparse(cursor["d"])
+        query = query.where(
+            or_(
+                Event.event_date > after_date,
+                and_(Event.event_date == after_date, Event.id > cursor["id"]),
+            )
+        )
+    else:
+        query = query.offset((page - 1) * size)
 
-    results = await db.execute(paginated_query)
-    return results.scalars().unique().all(), total_count
+    results = await db.execute(query.limit(size + 1))
+    events = results.scalars().all()
+    next_cursor = None
+    if len(events) > size:
+        last = events[size - 1]
+        next_cursor = {"d": last.event_date.isoformat(), "id": last.id}
+    return events[:size], total_count, next_cursor
 
 
-async def delete_event_vote(db: AsyncSession, vote_id: int, voter_vk_id: int) -> bool:
+async def delete_event_vote(
+    db: AsyncSession,
+    vote_id: int,
+    voter_vk_id: int,
+    live_state: Optional[LiveEventState] = None,
+) -> bool:
     query = select(EventFeedback).where(
         EventFeedback.id == vote_id, EventFeedback.voter_id == voter_vk_id
     )
@@ -373,7 +405,22 @@ async def delete_event_vote(db: AsyncSession, vote_id: int, voter_vk_id: int) ->
 
     if vote_to_delete:
         await db.delete(vote_to_delete)
+        if vote_to_delete.event_id:
+            await event_stats_crud.remove_event_vote(
+                db, vote_to_delete.event_id, vote_to_delete.rating_snapshot
+            )
         await db.commit()
+        if live_state and vote_to_delete.event_id:
+            still_voted = await check_if_user_voted_on_event(
+                db, vote_to_delete.event_id, voter_vk_id
+            )
+            await live_state.forget_vote(
+                vote_to_delete.event_id,
+                voter_vk_id,
+                vote_to_delete.rating_snapshot,
+                drop_voter=not still_voted,
+            )
+            await live_state.publish(vote_to_delete.event_id)
         return True
     return False
 
@@ -0,0 +1,106 @@
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy import Integer, case, delete, func, insert, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models import EventFeedback, EventVoteStats
+
+STATS_COLUMNS = [
+    "event_id",
+    "votes_count",
+    "trust_count",
+    "distrust_count",
+    "last_vote_at",
+]
+
+
+def _count_snapshots(value: int):
+    return func.cast(
+        func.coalesce(
+            func.sum(case((EventFeedback.rating_snapshot == value, 1), else_=0)), 0
+        ),
+        Integer,
+    )
+
+
+async def record_event_votes(
+    db: AsyncSession, votes: Iterable[tuple[Optional[int], int]]
+) -> None:
+    """
+    Прибавляет голоса [(event_id, vote_value)] к счётчикам мероприятий
+    одним многострочным upsert. Коммит остаётся за вызывающим, чтобы
+    счётчики менялись в одной транзакции с event_feedbacks.
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    for event_id, vote_value in votes:
+        if event_id is None:
+            continue
+        row = totals[event_id]
+        row[0] += 1
+        row[1] += vote_value == 1
+        row[2] += vote_value == -1
+    if not totals:
+        return
+
+    # Строки блокируются по возрастанию event_id — как и в групповой записи
+    stmt = mysql_insert(EventVoteStats).values(
+        [
+            {
+                "event_id": event_id,
+                "votes_count": votes_count,
+                "trust_count": trust_count,
+                "distrust_count": distrust_count,
+                "last_vote_at": func.now(),
+            }
+            for event_id, (votes_count, trust_count, distrust_count) in sorted(
+                totals.items()
+            )
+        ]
+    )
+    stmt = stmt.on_duplicate_key_update(
+        votes_count=EventVoteStats.votes_count + stmt.inserted.votes_count,
+        trust_count=EventVoteStats.trust_count + stmt.inserted.trust_count,
+        distrust_count=EventVoteStats.distrust_count + stmt.inserted.distrust_count,
+        last_vote_at=stmt.inserted.last_vote_at,
+    )
+    await db.execute(stmt)
+
+
+async def remove_event_vote(db: AsyncSession, event_id: int, vote_value: int) -> None:
+    """Вычитает отменённый голос. Коммит остаётся за вызывающим."""
+    await db.execute(
+        update(EventVoteStats)
+        .where(EventVoteStats.event_id == event_id)
+        .values(
+            votes_count=EventVoteStats.votes_count - 1,
+            trust_count=EventVoteStats.trust_count - int(vote_value == 1),
+            distrust_count=EventVoteStats.distrust_count - int(vote_value == -1),
+        )
+    )
+
+
+async def rebuild_event_stats(db: AsyncSession) -> int:
+    """
+    Полностью пересчитывает event_vote_stats из event_feedbacks.
+    Используется командой `python -m src.cli rebuild-event-stats`.
+    """
+    aggregated = (
+        select(
+            EventFeedback.event_id,
+            func.count(EventFeedback.id),
+            _count_snapshots(1),
+            _count_snapshots(-1),
+            func.max(EventFeedback.created_at),
+        )
+        .where(EventFeedback.event_id.is_not(None))
+        .group_by(EventFeedback.event_id)
+    )
+    await db.execute(delete(EventVoteStats))
+    await db.execute(insert(EventVoteStats).from_select(STATS_COLUMNS, aggregated))
+    await db.commit()
+
+    count_res = await db.execute(select(func.count()).select_from(EventVoteStats))
+    return count_res.scalar_one()
@@ -1,18 +1,22 @@
 from typing import Optional
 
 import redis.asyncio as redis
+from dateutil.parser import isoparse
 from loguru import logger
-from sqlalchemy import func, and_, case, or_, String, desc, Integer
+from sqlalchemy import func, and_, case, or_, String, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
+from src.core.profile_cache import invalidate_user_profile
+from src.crud import event_stats_crud, score_crud, vote_crud
 from src.models import (
     Event,
     ExpertProfile,
     Theme,
     User,
     ExpertRating,
+    ExpertScore,
     ExpertUpdateRequest,
     EventFeedback,
 )
@@ -24,7 +28,7 @@ from src.schemas.expert_schemas import (
     UserVoteInfo,
     ExpertProfileUpdate,
 )
-from src.services.notifier import Notifier
+from src.services.leaderboard import Leaderboard
 
 
 async def create_expert_request(db: AsyncSession, expert_data: ExpertCreate) -> User:
@@ -74,43 +78,48 @@ async def get_user_with_profile(db: AsyncSession, vk_id: int):
     return result.first()
 
 
-async def get_full_user_profile_with_stats(db: AsyncSession, vk_id: int):
-    user_profile_tuple = await get_user_with_profile(db, vk_id)
-    if not user_profile_tuple:
-        return None
+def _build_stats(score_row, events_count: int) -> dict:
+    expert_trust = score_row.expert_trust if score_row else 0
+    expert_distrust = score_row.expert_distrust if score_row else 0
+    community_trust = score_row.community_trust if score_row else 0
+    community_distrust = score_row.community_distrust if score_row else 0
 
-    rating_query = (
-        select(
-            ExpertRating.rating_type,
-            func.cast(
-                func.sum(case((ExpertRating.vote_value == 1, 1), else_=0)), Integer
-            ).label("trust"),
-            func.cast(
-                func.sum(case((ExpertRating.vote_value == -1, 1), else_=0)), Integer
-            ).label("distrust"),
-        )
-        .where(ExpertRating.expert_id == vk_id)
-        .group_by(ExpertRating.rating_type)
+    return {
+        "expert": expert_trust - expert_distrust,
+        "community": community_trust - community_distrust,
+        "expert_trust": expert_trust,
+        "expert_distrust": expert_distrust,
+        "community_trust": community_trust,
+        "community_distrust": community_distrust,
+        "events_count": events_count,
+    }
+
+
+def _score_columns():
+    return (
+        ExpertScore.expert_id,
+        ExpertScore.expert_trust,
+        ExpertScore.expert_distrust,
+        ExpertScore.community_trust,
+        ExpertScore.community_distrust,
     )
 
-    rating_res = await db.execute(rating_query)
-    results = rating_res.all()
 
-    expert_trust = 0
-    expert_distrust = 0
-    community_trust = 0
-    community_distrust = 0
+def _format_topics(profile: Optional[ExpertProfile]) -> list[str]:
+    if not profile or not profile.selected_themes:
+        return []
+    return [f"{t.category.name} > {t.name}" for t in profile.selected_themes]
 
-    for row in results:
-        if row.rating_type == "expert":
-            expert_trust = int(row.trust or 0)
-            expert_distrust = int(row.distrust or 0)
-        elif row.rating_type == "community":
-            community_trust = int(row.trust or 0)
-            community_distrust = int(row.distrust or 0)
 
-    expert_total = expert_trust - expert_distrust
-    community_total = community_trust - community_distrust
+async def get_full_user_profile_with_stats(db: AsyncSession, vk_id: int):
+    user_profile_tuple = await get_user_with_profile(db, vk_id)
+    if not user_profile_tuple:
+        return None
+
+    score_res = await db.execute(
+        select(*_score_columns()).where(ExpertScore.expert_id == vk_id)
+    )
+    score_row = score_res.first()
 
     # Events count
     events_query = select(func.count(Event.id)).where(
@@ -119,15 +128,7 @@ async def get_full_user_profile_with_stats(db: AsyncSession, vk_id: int):
     events_res = await db.execute(events_query)
     events_count = events_res.scalar_one_or_none() or 0
 
-    stats = {
-        "expert": expert_total,
-        "community": community_total,
-        "expert_trust": expert_trust,
-        "expert_distrust": expert_distrust,
-        "community_trust": community_trust,
-        "community_distrust": community_distrust,
-        "events_count": events_count,
-    }
+    stats = _build_stats(score_row, events_count)
 
     my_votes_query = select(
         func.sum(case((ExpertRating.vote_value == 1, 1), else_=0)).label("trust"),
@@ -144,6 +145,50 @@ async def get_full_user_profile_with_stats(db: AsyncSession, vk_id: int):
     return tuple(user_profile_tuple) + (stats, my_votes_stats)
 
 
+async def get_user_profiles_batch(
+    db: AsyncSession, vk_ids: list[int]
+) -> dict[int, tuple]:
+    """
+    Загружает пользователей списком за фиксированное число запросов,
+    независимо от длины списка: пользователи с профилями (и их темы,
+    подписки), счётчики рейтинга и количество одобренных мероприятий.
+
+    Возвращает {vk_id: (user, profile, stats, topics)}; порядок задаёт
+    вызывающий код.
+    """
+    if not vk_ids:
+        return {}
+
+    users_res = await db.execute(
+        select(User, ExpertProfile)
+        .outerjoin(ExpertProfile, User.vk_id == ExpertProfile.user_vk_id)
+        .where(User.vk_id.in_(vk_ids))
+        .options(
+            selectinload(ExpertProfile.selected_themes).selectinload(Theme.category),
+            selectinload(User.subscription),
+        )
+    )
+    users_rows = users_res.all()
+
+    scores_res = await db.execute(
+        select(*_score_columns()).where(ExpertScore.expert_id.in_(vk_ids))
+    )
+    scores_map = {row.expert_id: row for row in scores_res.all()}
+
+    events_res = await db.execute(
+        select(Event.expert_id, func.count(Event.id))
+        .where(Event.expert_id.in_(vk_ids), Event.status == "approved")
+        .group_by(Event.expert_id)
+    )
+    events_map = {expert_id: count for expert_id, count in events_res.all()}
+
+    hydrated = {}
+    for user, profile in users_rows:
+        stats = _build_stats(scores_map.get(user.vk_id), events_map.get(user.vk_id, 0))
+        hydrated[user.vk_id] = (user, profile, stats, _format_topics(profile))
+    return hydrated
+
+
 async def update_user_regalia(db: AsyncSession, vk_id: int, regalia: str) -> bool:
     result = await db.execute(
         select(ExpertProfile).filter(ExpertProfile.user_vk_id == vk_id)
@@ -196,12 +241,10 @@ async def get_all_users_paginated(
     search_query: Optional[str] = None,
     user_type_filter: Optional[str] = None,
     date_sort_order: Optional[str] = None,
+    cursor: Optional[dict] = None,
+    include_total: bool = True,
 ):
-    query = (
-        select(User, ExpertProfile)
-        .outerjoin(ExpertProfile, User.vk_id == ExpertProfile.user_vk_id)
-        .options(selectinload(User.subscription))
-    )
+    query = select(User.vk_id, User.registration_date)
     if user_type_filter == "expert":
         query = query.where(User.is_expert.is_(True))
     elif user_type_filter == "user":
@@ -215,17 +258,52 @@ async def get_all_users_paginated(
                 func.cast(User.vk_id, String).like(f"{search_term}%"),
             )
         )
+
+    total_count = None
+    if include_total:
+        count_query = select(func.count()).select_from(query.subquery())
+        total_count = (await db.execute(count_query)).scalar_one()
+
+    # vk_id добавлен в сортировку, чтобы курсор был однозначным
+    # при совпадающих registration_date
     if date_sort_order == "asc":
-        query = query.order_by(User.registration_date.asc())
+        query = query.order_by(User.registration_date.asc(), User.vk_id.asc())
+    else:
+        query = query.order_by(User.registration_date.desc(), User.vk_id.desc())
+
+    if cursor:
+        after_date = isoparse(cursor["d"])
+        after_id = cursor["id"]
+        if date_sort_order == "asc":
+            query = query.where(
+                or_(
+                    User.registration_date > after_date,
+                    and_(User.registration_date == after_date, User.vk_id > after_id),
+                )
+            )
+        else:
+            query = query.where(
+                or_(
+                    User.registration_date < after_date,
+                    and_(User.registration_date == after_date, User.vk_id < after_id),
+                )
+            )
     else:
-        query = query.order_by(User.registration_date.desc())
-    count_query = select(func.count()).select_from(query.subquery())
-    total_count_res = await db.execute(count_query)
-    total_count = total_count_res.scalar_one()
-    offset = (page - 1) * size
-    paginated_query = query.offset(offset).limit(size)
-    results = await db.execute(paginated_query)
-    return results.all(), total_count
+        query = query.offset((page - 1) * size)
+
+    rows = (await db.execute(query.limit(size + 1))).all()
+    next_cursor = None
+    if len(rows) > size:
+        last = rows[size - 1]
+        next_cursor = {"d": last.registration_date.isoformat(), "id": last.vk_id}
+
+    page_ids = [row.vk_id for row in rows[:size]]
+    hydrated = await get_user_profiles_batch(db, page_ids)
+    return (
+        [hydrated[vk_id] for vk_id in page_ids if vk_id in hydrated],
+        total_count,
+        next_cursor,
+    )
 
 
 async def delete_user_by_vk_id(
@@ -237,8 +315,7 @@ async def delete_user_by_vk_id(
         await db.delete(db_user)
         await db.commit()
         logger.info(f"User {vk_id} deleted from database.")
-        cache_key = f"user_profile:{vk_id}"
-        await cache.delete(cache_key)
+        await invalidate_user_profile(cache, vk_id)
         logger.success(f"Cache for user {vk_id} has been invalidated.")
         return True
     logger.warning(f"Attempted to delete non-existent user {vk_id}.")
@@ -252,50 +329,45 @@ async def get_top_experts_paginated(
     search_query: Optional[str] = None,
     region: Optional[str] = None,
     category_id: Optional[int] = None,
+    leaderboard: Optional[Leaderboard] = None,
+    cursor: Optional[dict] = None,
+    include_total: bool = True,
 ):
-    scores_subquery = (
-        select(
-            ExpertRating.expert_id,
-            func.cast(
-                func.sum(
-                    case(
-                        (ExpertRating.rating_type == "expert", ExpertRating.vote_value),
-                        else_=0,
-                    )
-                ),
-                Integer,
-            ).label("expert_score"),
-            func.cast(
-                func.sum(
-                    case(
-                        (
-                            ExpertRating.rating_type == "community",
-                            ExpertRating.vote_value,
-                        ),
-                        else_=0,
+    """
+    Возвращает (страница, total_count | None, next_cursor | None).
+    Курсор хранит ранг последнего эксперта ("r") для SQL и позицию ("o")
+    для Redis, где ZRANGE по индексу и так не деградирует на глубоких страницах.
+    """
+    offset = cursor["o"] if cursor else (page - 1) * size
+
+    if leaderboard and not search_query:
+        try:
+            if await leaderboard.is_ready():
+                if region or category_id:
+                    ranked, total_count = await leaderboard.get_shard_page(
+                        offset, size + 1, region=region, category_id=category_id
                     )
-                ),
-                Integer,
-            ).label("community_score"),
-        )
-        .group_by(ExpertRating.expert_id)
-        .subquery()
-    )
+                else:
+                    ranked = await leaderboard.get_page(offset, size + 1)
+                    total_count = await leaderboard.count() if include_total else None
+                return (
+                    await _hydrate_ranked(db, ranked[:size]),
+                    total_count if include_total else None,
+                    _next_top_cursor(ranked, offset, size),
+                )
+        except redis.RedisError as e:
+            logger.error(f"Leaderboard unavailable, falling back to SQL: {e}")
 
     global_ranking_base = (
         select(
             ExpertProfile.user_vk_id,
             User.first_name,
             User.last_name,
-            func.coalesce(scores_subquery.c.expert_score, 0).label("expert_score"),
-            func.coalesce(scores_subquery.c.community_score, 0).label(
-                "community_score"
-            ),
+            func.coalesce(ExpertScore.expert_score, 0).label("expert_score"),
+            func.coalesce(ExpertScore.community_score, 0).label("community_score"),
         )
         .join(User, ExpertProfile.user_vk_id == User.vk_id)
-        .outerjoin(
-            scores_subquery, ExpertProfile.user_vk_id == scores_subquery.c.expert_id
-        )
+        .outerjoin(ExpertScore, ExpertProfile.user_vk_id == ExpertScore.expert_id)
         .where(ExpertProfile.status == "approved")
     ).subquery()
 
@@ -327,8 +399,8 @@ async def get_top_experts_paginated(
         final_query = final_query.where(ExpertProfile.region == region)
 
     if category_id:
-        final_query = final_query.join(ExpertProfile.selected_themes).where(
-            Theme.category_id == category_id
+        final_query = final_query.where(
+            ExpertProfile.selected_themes.any(Theme.category_id == category_id)
         )
 
     if search_query:
@@ -340,37 +412,42 @@ async def get_top_experts_paginated(
             )
         )
 
-    count_query = select(func.count()).select_from(final_query.subquery())
-    total_count = (await db.execute(count_query)).scalar_one()
+    total_count = None
+    if include_total:
+        count_query = select(func.count()).select_from(final_query.subquery())
+        total_count = (await db.execute(count_query)).scalar_one()
 
     final_query = final_query.order_by(ranked_cte.c.rank.asc())
-    final_query = final_query.offset((page - 1) * size).limit(size)
-
-    ranked_results = (await db.execute(final_query)).all()
-
-    if not ranked_results:
-        return [], 0
-
-    ranks_map = {row.user_vk_id: row.rank for row in ranked_results}
-    target_ids = list(ranks_map.keys())
+    if cursor:
+        final_query = final_query.where(ranked_cte.c.rank > cursor["r"])
+    else:
+        final_query = final_query.offset(offset)
+    final_query = final_query.limit(size + 1)
+
+    ranked = [(row.user_vk_id, row.rank) for row in (await db.execute(final_query))]
+    return (
+        await _hydrate_ranked(db, ranked[:size]),
+        total_count,
+        _next_top_cursor(ranked, offset, size),
+    )
 
-    profiles_data = []
 
-    for vk_id in target_ids:
-        full_data = await get_full_user_profile_with_stats(db, vk_id)
-        if full_data:
-            user_obj, profile_obj, stats_dict, my_votes_stats = full_data
+def _next_top_cursor(ranked: list[tuple[int, int]], offset: int, size: int):
+    if len(ranked) <= size:
+        return None
+    return {"o": offset + size, "r": ranked[size - 1][1]}
 
-            topics = []
-            if profile_obj and profile_obj.selected_themes:
-                topics = [
-                    f"{t.category.name} > {t.name}" for t in profile_obj.selected_themes
-                ]
 
-            rank = ranks_map[vk_id]
-            profiles_data.append((user_obj, profile_obj, stats_dict, topics, rank))
+async def _hydrate_ranked(db: AsyncSession, ranked: list[tuple[int, int]]):
+    hydrated = await get_user_profiles_batch(db, [vk_id for vk_id, _ in ranked])
 
-    return profiles_data, total_count
+    profiles_data = []
+    for vk_id, rank in ranked:
+        if vk_id not in hydrated:
+            continue
+        user_obj, profile_obj, stats_dict, topics = hydrated[vk_id]
+        profiles_data.append((user_obj, profile_obj, stats_dict, topics, rank))
+    return profiles_data
 
 
 async def create_user(db: AsyncSession, user_data: UserCreate) -> User:
@@ -389,7 +466,6 @@ async def create_community_vote(
     expert_vk_id: int,
     vote_data: CommunityVoteCreate,
     voter_vk_id: int,
-    notifier: Notifier,
 ):
     expert_profile_res = await db.execute(
         select(ExpertProfile)
@@ -407,53 +483,29 @@ async def create_community_vote(
     else:
         vote_val = 1 if vote_data.vote_type == "trust" else -1
 
-    rating_query = select(ExpertRating).filter(
-        ExpertRating.expert_id == expert_vk_id,
-        ExpertRating.voter_id == voter_vk_id,
-        ExpertRating.rating_type == "community",
-    )
-    rating_res = await db.execute(rating_query)
-    existing_rating = rating_res.scalars().first()
-
-    if vote_data.vote_type == "remove":
-        if existing_rating:
-            await db.delete(existing_rating)
-        else:
-            pass
-    else:
-        if existing_rating:
-            existing_rating.vote_value = vote_val
-        else:
-            new_rating = ExpertRating(
-                expert_id=expert_vk_id,
-                voter_id=voter_vk_id,
-                vote_value=vote_val,
-                rating_type="community",
-            )
-            db.add(new_rating)
-
-    comment = vote_data.comment
-
-    feedback = EventFeedback(
+    expert_name = f"{expert_profile.user.first_name} {expert_profile.user.last_name}"
+    await vote_crud.write_vote(
+        db,
         expert_id=expert_vk_id,
         voter_id=voter_vk_id,
-        event_id=None,
-        comment=comment,
-        rating_snapshot=vote_val,
-    )
-    db.add(feedback)
-
-    await db.commit()
-
-    expert_name = f"{expert_profile.user.first_name} {expert_profile.user.last_name}"
-    await notifier.send_vote_action_notification(
-        user_vk_id=voter_vk_id,
-        expert_name=expert_name,
-        expert_vk_id=expert_vk_id,
-        action="deleted" if vote_data.vote_type == "remove" else "submitted",
-        vote_type=vote_data.vote_type,
+        rating_type="community",
+        vote_value=vote_val,
+        comment=vote_data.comment,
+        notifications=[
+            (
+                "send_vote_action_notification",
+                {
+                    "user_vk_id": voter_vk_id,
+                    "expert_name": expert_name,
+                    "expert_vk_id": expert_vk_id,
+                    "action": (
+                        "deleted" if vote_data.vote_type == "remove" else "submitted"
+                    ),
+                    "vote_type": vote_data.vote_type,
+                },
+            )
+        ],
     )
-    return feedback
 
 
 async def withdraw_rating_vote(
@@ -463,16 +515,24 @@ async def withdraw_rating_vote(
     rating_type: str,
     comment: str = "Голос отозван пользователем",
 ) -> bool:
-    query = select(ExpertRating).where(
-        ExpertRating.voter_id == voter_vk_id,
-        ExpertRating.expert_id == expert_vk_id,
-        ExpertRating.rating_type == rating_type,
+    query = (
+        select(ExpertRating)
+        .where(
+            ExpertRating.voter_id == voter_vk_id,
+            ExpertRating.expert_id == expert_vk_id,
+            ExpertRating.rating_type == rating_type,
+        )
+        .with_for_update()
     )
     result = await db.execute(query)
     rating = result.scalars().first()
 
     if rating:
+        old_value = rating.vote_value
         await db.delete(rating)
+        await score_crud.apply_rating_change(
+            db, expert_vk_id, rating_type, old_value, 0
+        )
 
         feedback = EventFeedback(
             expert_id=expert_vk_id,
@@ -498,8 +558,10 @@ async def withdraw_rating_vote(
             feedback.event_id = last_ev_id
 
         db.add(feedback)
+        await event_stats_crud.record_event_votes(db, [(feedback.event_id, 0)])
         await db.commit()
         return True
+    await db.rollback()
     return False
 
 
@@ -544,7 +606,10 @@ async def update_user_settings(
     update_data = settings_data.model_dump(exclude_unset=True)
     object_to_return = None
 
-    if "show_community_rating" in update_data:
+    if (
+        "show_community_rating" in update_data
+        or "vote_notification_mode" in update_data
+    ):
         result = await db.execute(
             select(ExpertProfile).filter(ExpertProfile.user_vk_id == vk_id)
         )
@@ -552,7 +617,10 @@ async def update_user_settings(
         if not db_profile:
             raise ValueError("Expert profile not found.")
 
-        db_profile.show_community_rating = update_data["show_community_rating"]
+        if "show_community_rating" in update_data:
+            db_profile.show_community_rating = update_data["show_community_rating"]
+        if update_data.get("vote_notification_mode"):
+            db_profile.vote_notification_mode = update_data["vote_notification_mode"]
         object_to_return = db_profile
 
     if "allow_notifications" in update_data or "allow_expert_mailings" in update_data:
@@ -0,0 +1,133 @@
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.crud.broadcast_crud import BROADCAST_CHUNK
+from src.models import NotificationOutbox
+
+
+def notification_random_id(outbox_id: int) -> int:
+    """Постоянный random_id уведомления: VK не продублирует его при повторе."""
+    return zlib.crc32(f"outbox:{outbox_id}".encode()) & 0x7FFFFFFF
+
+
+def add_notification(db: AsyncSession, kind: str, **payload) -> None:
+    """Добавляет уведомление в текущую транзакцию, без коммита."""
+    db.add(NotificationOutbox(kind=kind, payload=payload))
+
+
+async def enqueue_notification(db: AsyncSession, kind: str, **payload) -> None:
+    """
+    Ставит уведомление в outbox и коммитит. Вызывается после коммита
+    основной операции: само уведомление отправит воркер.
+    """
+    add_notification(db, kind, **payload)
+    await db.commit()
+
+
+async def claim_due(
+    db: AsyncSession, limit: int, lease_seconds: int
+) -> list[NotificationOutbox]:
+    """
+    Забирает до `limit` готовых к отправке строк. FOR UPDATE SKIP LOCKED
+    позволяет нескольким воркерам работать параллельно без двойной
+    отправки; строки processing с истёкшей арендой (воркер упал) снова
+    считаются готовыми.
+    """
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        select(NotificationOutbox)
+        .where(
+            NotificationOutbox.status.in_(["pending", "processing"]),
+            NotificationOutbox.next_attempt_at <= now,
+        )
+        .order_by(NotificationOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.scalars().all()
+    for row in rows:
+        row.status = "processing"
+        row.next_attempt_at = now + timedelta(seconds=lease_seconds)
+    await db.commit()
+    return rows
+
+
+async def mark_sent(db: AsyncSession, outbox_id: int) -> None:
+    await db.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id == outbox_id)
+        .values(status="sent", sent_at=func.now(), last_error=None)
+    )
+    await db.commit()
+
+
+async def mark_failed(
+    db: AsyncSession,
+    outbox_id: int,
+    attempts: int,
+    error: str,
+    max_attempts: int,
+    base_backoff: int,
+) -> bool:
+    """
+    Планирует повтор с экспоненциальной задержкой или, если попытки
+    кончились, переводит строку в dead. Возвращает True для dead.
+    """
+    dead = attempts >= max_attempts
+    values = {"attempts": attempts, "last_error": error[:2000]}
+    if dead:
+        values["status"] = "dead"
+    else:
+        values["status"] = "pending"
+        values["next_attempt_at"] = datetime.now(timezone.utc) + timedelta(
+            seconds=base_backoff * 2 ** (attempts - 1)
+        )
+    await db.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id == outbox_id)
+        .values(**values)
+    )
+    await db.commit()
+    return dead
+
+
+async def requeue_dead(db: AsyncSession) -> int:
+    """
+    Возвращает dead-строки в очередь с обнулённым счётчиком попыток.
+    Чанки рассылок не трогаем: они уже учтены в её счётчиках как
+    недоставленные.
+    """
+    result = await db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.status == "dead",
+            NotificationOutbox.kind != BROADCAST_CHUNK,
+        )
+        .values(status="pending", attempts=0, next_attempt_at=func.now())
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def count_by_status(db: AsyncSession) -> dict[str, int]:
+    result = await db.execute(
+        select(NotificationOutbox.status, func.count()).group_by(
+            NotificationOutbox.status
+        )
+    )
+    return dict(result.all())
+
+
+async def purge_sent(db: AsyncSession, older_than: timedelta) -> int:
+    result = await db.execute(
+        delete(NotificationOutbox).where(
+            NotificationOutbox.status == "sent",
+            NotificationOutbox.sent_at < datetime.now(timezone.utc) - older_than,
+        )
+    )
+    await db.commit()
+    return result.rowcount
@@ -0,0 +1,143 @@
+from typing import Optional
+
+from sqlalchemy import Integer, case, delete, func, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models import ExpertRating, ExpertScore
+
+SCORE_COLUMNS = [
+    "expert_id",
+    "expert_trust",
+    "expert_distrust",
+    "community_trust",
+    "community_distrust",
+    "expert_score",
+    "community_score",
+]
+
+
+def _score_aggregates():
+    def _count(rating_type: str, value: int):
+        return func.cast(
+            func.coalesce(
+                func.sum(
+                    case(
+                        (
+                            (ExpertRating.rating_type == rating_type)
+                            & (ExpertRating.vote_value == value),
+                            1,
+                        ),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
+            Integer,
+        )
+
+    def _score(rating_type: str):
+        return func.cast(
+            func.coalesce(
+                func.sum(
+                    case(
+                        (
+                            ExpertRating.rating_type == rating_type,
+                            ExpertRating.vote_value,
+                        ),
+                        else_=0,
+                    )
+                ),
+                0,
+            ),
+            Integer,
+        )
+
+    return [
+        _count("expert", 1).label("expert_trust"),
+        _count("expert", -1).label("expert_distrust"),
+        _count("community", 1).label("community_trust"),
+        _count("community", -1).label("community_distrust"),
+        _score("expert").label("expert_score"),
+        _score("community").label("community_score"),
+    ]
+
+
+def _aggregated_scores_query():
+    return select(ExpertRating.expert_id, *_score_aggregates()).group_by(
+        ExpertRating.expert_id
+    )
+
+
+def rating_delta(rating_type: str, old_value: int, new_value: int) -> dict:
+    """Разница счётчиков expert_scores при смене голоса old_value -> new_value."""
+    prefix = "expert" if rating_type == "expert" else "community"
+    trust_delta = int(new_value == 1) - int(old_value == 1)
+    distrust_delta = int(new_value == -1) - int(old_value == -1)
+    return {
+        f"{prefix}_trust": trust_delta,
+        f"{prefix}_distrust": distrust_delta,
+        f"{prefix}_score": trust_delta - distrust_delta,
+    }
+
+
+async def apply_score_deltas(db: AsyncSession, expert_id: int, deltas: dict) -> None:
+    """
+    Прибавляет разницу к строке expert_scores, создавая её при
+    необходимости. Коммит остаётся за вызывающим кодом, чтобы счётчики и
+    expert_ratings менялись в одной транзакции.
+    """
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Новой строке достаются только неотрицательные счётчики, сумма — как есть
+    stmt = mysql_insert(ExpertScore).values(
+        expert_id=expert_id,
+        **{
+            column: delta if column.endswith("_score") else max(delta, 0)
+            for column, delta in deltas.items()
+        },
+    )
+    stmt = stmt.on_duplicate_key_update(
+        {
+            column: getattr(ExpertScore, column) + delta
+            for column, delta in deltas.items()
+        }
+    )
+    await db.execute(stmt)
+
+
+async def apply_rating_change(
+    db: AsyncSession,
+    expert_id: int,
+    rating_type: str,
+    old_value: Optional[int],
+    new_value: Optional[int],
+) -> None:
+    """
+    Применяет к expert_scores разницу между старым и новым голосом.
+    Старое значение вызывающий получает под блокировкой строки
+    expert_ratings (previous_value после upsert или SELECT ... FOR UPDATE
+    перед удалением), так что параллельные голоса одного пользователя
+    выстраиваются в очередь на этой строке.
+    """
+    await apply_score_deltas(
+        db, expert_id, rating_delta(rating_type, old_value or 0, new_value or 0)
+    )
+
+
+async def rebuild_expert_scores(db: AsyncSession) -> int:
+    """
+    Полностью пересчитывает expert_scores из expert_ratings.
+    Используется командой `python -m src.cli rebuild-scores` для устранения
+    расхождений (например, после каскадного удаления голосующих).
+    """
+    await db.execute(delete(ExpertScore))
+    await db.execute(
+        insert(ExpertScore).from_select(SCORE_COLUMNS, _aggregated_scores_query())
+    )
+    await db.commit()
+
+    count_res = await db.execute(select(func.count()).select_from(ExpertScore))
+    return count_res.scalar_one()
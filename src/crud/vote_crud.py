@@ -0,0 +1,140 @@
+from typing import Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.crud import event_stats_crud, outbox_crud, score_crud
+from src.models import EventFeedback, ExpertRating
+
+# ER_LOCK_DEADLOCK: InnoDB откатывает транзакцию целиком, её можно повторить
+DEADLOCK_ERROR_CODE = 1213
+WRITE_VOTE_ATTEMPTS = 3
+
+
+def is_deadlock(error: OperationalError) -> bool:
+    args = getattr(error.orig, "args", ())
+    return bool(args) and args[0] == DEADLOCK_ERROR_CODE
+
+
+def rating_upsert(rows: list[dict]):
+    """
+    Upsert голосов expert_ratings, который сам сохраняет прежний голос в
+    previous_value: MySQL выполняет присваивания ON DUPLICATE KEY UPDATE
+    слева направо. Блокировку строки берёт сам INSERT, без
+    предварительного SELECT ... FOR UPDATE, чьи gap-блокировки заставляли
+    два первых голоса одного пользователя взаимно блокироваться.
+    """
+    stmt = mysql_insert(ExpertRating).values(
+        [{**row, "previous_value": 0} for row in rows]
+    )
+    return stmt.on_duplicate_key_update(
+        [
+            ("previous_value", ExpertRating.vote_value),
+            ("vote_value", stmt.inserted.vote_value),
+            ("updated_at", func.now()),
+        ]
+    )
+
+
+async def write_vote(
+    db: AsyncSession,
+    expert_id: int,
+    voter_id: int,
+    rating_type: str,
+    vote_value: int,
+    comment: Optional[str],
+    event_id: Optional[int] = None,
+    notifications: Sequence[tuple[str, dict]] = (),
+) -> None:
+    """
+    Записывает голос upsert'ом по uq_expert_voter_rating_type (или
+    удалением при vote_value == 0) и прибавляет к expert_scores разницу с
+    прежним голосом. История, счётчики мероприятия, счётчики эксперта и
+    уведомления [(kind, payload)] для outbox записываются одним коммитом.
+    Параллельные голоса одного пользователя упорядочивает блокировка
+    строки голоса; транзакцию, выбранную InnoDB жертвой deadlock,
+    повторяем.
+    """
+    for attempt in range(1, WRITE_VOTE_ATTEMPTS + 1):
+        try:
+            await _write_vote(
+                db,
+                expert_id,
+                voter_id,
+                rating_type,
+                vote_value,
+                comment,
+                event_id,
+                notifications,
+            )
+            return
+        except OperationalError as e:
+            if attempt == WRITE_VOTE_ATTEMPTS or not is_deadlock(e):
+                raise
+            logger.warning(
+                f"Deadlock writing vote {expert_id}/{voter_id}/{rating_type}, "
+                f"retrying (attempt {attempt})"
+            )
+            await db.rollback()
+
+
+async def _write_vote(
+    db: AsyncSession,
+    expert_id: int,
+    voter_id: int,
+    rating_type: str,
+    vote_value: int,
+    comment: Optional[str],
+    event_id: Optional[int],
+    notifications: Sequence[tuple[str, dict]],
+) -> None:
+    key = (
+        ExpertRating.expert_id == expert_id,
+        ExpertRating.voter_id == voter_id,
+        ExpertRating.rating_type == rating_type,
+    )
+    if vote_value:
+        await db.execute(
+            rating_upsert(
+                [
+                    {
+                        "expert_id": expert_id,
+                        "voter_id": voter_id,
+                        "rating_type": rating_type,
+                        "vote_value": vote_value,
+                    }
+                ]
+            )
+        )
+        # Строка уже заблокирована upsert'ом, чтение видит свою же запись
+        old_res = await db.execute(select(ExpertRating.previous_value).where(*key))
+        old_value = old_res.scalar_one()
+    else:
+        # Удаление ничего не вставляет, gap-блокировка здесь не мешает
+        old_res = await db.execute(
+            select(ExpertRating.vote_value).where(*key).with_for_update()
+        )
+        old_value = old_res.scalar_one_or_none() or 0
+        if old_value:
+            await db.execute(delete(ExpertRating).where(*key))
+
+    await db.execute(
+        insert(EventFeedback).values(
+            expert_id=expert_id,
+            voter_id=voter_id,
+            event_id=event_id,
+            comment=comment,
+            rating_snapshot=vote_value,
+        )
+    )
+    await event_stats_crud.record_event_votes(db, [(event_id, vote_value)])
+    await score_crud.apply_rating_change(
+        db, expert_id, rating_type, old_value, vote_value
+    )
+    for kind, payload in notifications:
+        outbox_crud.add_notification(db, kind, **payload)
+    await db.commit()
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -19,8 +20,18 @@ from src.api.endpoints import (
     vk_callback,
 )
 from src.core.config import settings
-from src.crud import event_crud
-from src.services.notifier import Notifier
+from src.core.dependencies import (
+    leaderboard,
+    live_event_state,
+    live_tally_broadcaster,
+    notifier,
+    tariff_catalog,
+    vk_http,
+    vote_digest,
+    vote_ingestor,
+)
+from src.crud import event_crud, outbox_crud
+from src.services.outbox_worker import OutboxWorker
 from src.core.exceptions import (
     validation_exception_handler,
     IdempotentException,
@@ -65,7 +76,12 @@ engine_bg = create_async_engine(settings.DATABASE_URL_ASYNC)
 AsyncSessionLocal_bg = sessionmaker(
     engine_bg, class_=AsyncSession, expire_on_commit=False
 )
-notifier_bg = Notifier(token=settings.VK_BOT_TOKEN)
+outbox_worker = OutboxWorker(
+    AsyncSessionLocal_bg,
+    notifier,
+    concurrency=settings.OUTBOX_CONCURRENCY,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+)
 
 
 async def check_for_reminders():
@@ -78,10 +94,13 @@ async def check_for_reminders():
             print(f"Found {len(events_to_remind)} events to send reminders for.")
             for event in events_to_remind:
                 try:
-                    await notifier_bg.send_event_reminder(
+                    # Напоминание и отметка об отправке — в одной транзакции
+                    outbox_crud.add_notification(
+                        db,
+                        "send_event_reminder",
                         expert_id=event.expert_id,
                         event_name=event.name,
-                        event_date=event.event_date,
+                        event_date=event.event_date.isoformat(),
                     )
                     await event_crud.mark_reminder_as_sent(db, event.id)
                 except Exception as e:
@@ -90,6 +109,33 @@ async def check_for_reminders():
             print(f"An error occurred in the reminder job: {e}")
 
 
+async def rebuild_leaderboard():
+    async with AsyncSessionLocal_bg() as db:
+        try:
+            await leaderboard.rebuild(db)
+        except Exception as e:
+            logger.error(f"Leaderboard rebuild failed: {e}")
+
+
+async def reconcile_live_events():
+    async with AsyncSessionLocal_bg() as db:
+        try:
+            reconciled = await live_event_state.reconcile_finished(db)
+            if reconciled:
+                logger.info(f"Reconciled live state of {reconciled} finished events")
+        except Exception as e:
+            logger.error(f"Live event reconciliation failed: {e}")
+
+
+async def flush_vote_digests():
+    try:
+        flushed = await vote_digest.flush(AsyncSessionLocal_bg)
+        if flushed:
+            logger.info(f"Queued {flushed} vote digests")
+    except Exception as e:
+        logger.error(f"Vote digest flush failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with AsyncSessionLocal_bg() as db:
@@ -141,16 +187,39 @@ async def lifespan(app: FastAPI):
                 ]
                 db.add_all(tariffs_to_create)
                 await db.commit()
+                await tariff_catalog.publish_invalidation()
                 print("Tariffs seeded.")
         except Exception as e:
             print(f"Error seeding tariffs: {e}")
 
+    try:
+        if not await leaderboard.is_ready():
+            await rebuild_leaderboard()
+    except Exception as e:
+        logger.error(f"Leaderboard warm-up failed: {e}")
+
     scheduler.add_job(check_for_reminders, "interval", minutes=1)
+    scheduler.add_job(rebuild_leaderboard, "interval", minutes=30)
+    scheduler.add_job(reconcile_live_events, "interval", minutes=5)
+    scheduler.add_job(
+        flush_vote_digests, "interval", seconds=settings.VOTE_DIGEST_WINDOW_SECONDS
+    )
+    tariff_listener = asyncio.create_task(tariff_catalog.listen_for_invalidation())
+    outbox_task = None
+    if settings.OUTBOX_WORKER_EMBEDDED:
+        outbox_task = asyncio.create_task(outbox_worker.run_forever())
+
     scheduler.start()
     print("Scheduler for event reminders has been started.")
     yield
     scheduler.shutdown()
-    await notifier_bg.close()
+    tariff_listener.cancel()
+    if outbox_task:
+        outbox_task.cancel()
+    await vote_ingestor.stop()
+    await live_tally_broadcaster.stop()
+    await notifier.close()
+    await vk_http.aclose()
     print("Scheduler has been stopped.")
 
 
@@ -7,10 +7,11 @@ from .expert import (
     ExpertSelectedThemes,
     ExpertUpdateRequest,
 )
-from .social import ExpertRating, EventFeedback
+from .social import ExpertRating, EventFeedback, ExpertScore, EventVoteStats
 from .event import Event
 from .finance import DonutSubscription, PromoCode, PromoActivation
 from .tariff import Tariff
+from .notification import NotificationOutbox, BroadcastJob
 
 __all__ = [
     "Base",
@@ -23,9 +24,13 @@ __all__ = [
     "ExpertUpdateRequest",
     "ExpertRating",
     "EventFeedback",
+    "ExpertScore",
+    "EventVoteStats",
     "Event",
     "DonutSubscription",
     "PromoCode",
     "PromoActivation",
     "Tariff",
+    "NotificationOutbox",
+    "BroadcastJob",
 ]
@@ -8,6 +8,7 @@ from sqlalchemy import (
     ForeignKey,
     Enum,
     BigInteger,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -24,10 +25,13 @@ class Event(Base):
 
     name = Column(String(128))
     description = Column(Text, nullable=True)
+    # Хранится нормализованным (upper + strip), см. event_cache.normalize_promo
     promo_word = Column(String(100))
 
     event_date = Column(TIMESTAMP(timezone=True), nullable=False)
     duration_minutes = Column(Integer)
+    # event_date + duration_minutes; меняется вместе с ними
+    end_time = Column(TIMESTAMP(timezone=True), nullable=False)
 
     status = Column(Enum("pending", "approved", "rejected"), default="pending")
     rejection_reason = Column(Text)
@@ -43,3 +47,10 @@ class Event(Base):
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     expert = relationship("ExpertProfile", back_populates="events")
+
+    __table_args__ = (
+        Index("ix_events_promo_status_end", "promo_word", "status", "end_time"),
+        Index("ix_events_expert_status_end", "expert_id", "status", "end_time"),
+        Index("ix_events_status_end", "status", "end_time"),
+        Index("ix_events_status_date", "status", "event_date"),
+    )
@@ -32,6 +32,13 @@ class ExpertProfile(Base):
     referrer_info = Column(Text)
 
     show_community_rating = Column(Boolean, default=True, server_default="1")
+    # digest — вместо сообщения на каждый голос сводка раз в окно
+    vote_notification_mode = Column(
+        Enum("instant", "digest"),
+        nullable=False,
+        default="instant",
+        server_default="instant",
+    )
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="expert_profile")
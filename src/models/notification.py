@@ -0,0 +1,79 @@
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    Integer,
+    String,
+    Text,
+    TIMESTAMP,
+    JSON,
+    Enum,
+    Index,
+    func,
+)
+from .base import Base
+
+
+class NotificationOutbox(Base):
+    """
+    Очередь исходящих уведомлений VK. Обработчики только добавляют строку
+    после коммита, отправляет их отдельный воркер (services.outbox_worker).
+    kind — имя метода Notifier (или служебной операции), payload — его
+    аргументы. Строки со статусом dead исчерпали попытки и ждут разбора.
+    """
+
+    __tablename__ = "notification_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(
+        Enum("pending", "processing", "sent", "dead"),
+        nullable=False,
+        default="pending",
+        server_default="pending",
+    )
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Для pending — когда пробовать снова, для processing — конец аренды
+    next_attempt_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=func.now()
+    )
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    sent_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_notification_outbox_due", "status", "next_attempt_at"),)
+
+
+class BroadcastJob(Base):
+    """
+    Рассылка администратора. Получатели при создании разбиваются на чанки
+    по 100 — строки notification_outbox вида broadcast_chunk. Воркер
+    прибавляет результат каждого чанка к счётчикам вместе с отметкой
+    чанка, поэтому после перезапуска отправляются только оставшиеся.
+    """
+
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    message = Column(Text, nullable=False)
+    target_group = Column(String(16), nullable=False)
+    created_by = Column(BigInteger, nullable=True)
+
+    status = Column(
+        Enum("queued", "running", "done"),
+        nullable=False,
+        default="queued",
+        server_default="queued",
+    )
+    total_recipients = Column(Integer, nullable=False, default=0, server_default="0")
+    chunks_total = Column(Integer, nullable=False, default=0, server_default="0")
+    chunks_done = Column(Integer, nullable=False, default=0, server_default="0")
+    sent_count = Column(Integer, nullable=False, default=0, server_default="0")
+    failed_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    started_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    finished_at = Column(TIMESTAMP(timezone=True), nullable=True)
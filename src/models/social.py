@@ -8,6 +8,7 @@ from sqlalchemy import (
     ForeignKey,
     String,
     UniqueConstraint,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -27,6 +28,8 @@ class ExpertRating(Base):
     rating_type = Column(String(20), primary_key=True, default="community")
 
     vote_value = Column(Integer, nullable=False, default=0)
+    # Значение до последнего upsert: по нему считается разница для expert_scores
+    previous_value = Column(Integer, nullable=False, default=0, server_default="0")
 
     updated_at = Column(
         TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -66,3 +69,55 @@ class EventFeedback(Base):
 
     expert = relationship("ExpertProfile")
     event = relationship("Event")
+
+
+class ExpertScore(Base):
+    """
+    Материализованные счётчики рейтинга эксперта.
+    Обновляются в той же транзакции, что и запись в expert_ratings,
+    поэтому топ и профиль читают готовые суммы без GROUP BY.
+    """
+
+    __tablename__ = "expert_scores"
+
+    expert_id = Column(
+        BigInteger,
+        ForeignKey("expert_profiles.user_vk_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    expert_trust = Column(Integer, nullable=False, default=0, server_default="0")
+    expert_distrust = Column(Integer, nullable=False, default=0, server_default="0")
+    community_trust = Column(Integer, nullable=False, default=0, server_default="0")
+    community_distrust = Column(Integer, nullable=False, default=0, server_default="0")
+
+    expert_score = Column(Integer, nullable=False, default=0, server_default="0")
+    community_score = Column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    __table_args__ = (
+        Index("ix_expert_scores_ranking", "expert_score", "community_score"),
+    )
+
+
+class EventVoteStats(Base):
+    """
+    Готовые счётчики голосов мероприятия. Обновляются в той же транзакции,
+    что и запись в event_feedbacks, поэтому /events/my читает их без
+    агрегации по всей истории эксперта.
+    """
+
+    __tablename__ = "event_vote_stats"
+
+    event_id = Column(
+        Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    votes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    trust_count = Column(Integer, nullable=False, default=0, server_default="0")
+    distrust_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    last_vote_at = Column(TIMESTAMP(timezone=True), nullable=True)
@@ -56,6 +56,7 @@ class EventRead(EventBase):
     description: Optional[str] = None
     event_link: Optional[HttpUrl] = None
     is_private: bool
+    end_time: Optional[datetime] = None
     votes_count: int = 0
     trust_count: int = 0
     distrust_count: int = 0
@@ -72,8 +73,10 @@ class EventRead(EventBase):
             data.name = data.event_name
         return data
 
-    @field_serializer("event_date")
-    def serialize_dt(self, dt: datetime, _info):
+    @field_serializer("event_date", "end_time")
+    def serialize_dt(self, dt: Optional[datetime], _info):
+        if dt is None:
+            return None
         return dt.isoformat().replace("+00:00", "Z")
 
 
@@ -110,6 +113,7 @@ class ExpertEventsResponse(BaseModel):
 
 class PaginatedEventsResponse(BaseModel):
     items: List[EventRead]
-    total_count: int
+    total_count: Optional[int] = None
     page: int
     size: int
+    next_cursor: Optional[str] = None
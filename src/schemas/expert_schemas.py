@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from pydantic import BaseModel, Field, HttpUrl, field_validator, ConfigDict
 from src.schemas.base_schemas import VotedExpertInfo
 
@@ -70,6 +70,7 @@ class UserPrivateRead(UserPublicRead):
     email: Optional[str] = None
     allow_notifications: bool = True
     allow_expert_mailings: bool = True
+    vote_notification_mode: Optional[str] = None
     my_votes_stats: MyVotesStats = Field(default_factory=MyVotesStats)
     stats: StatsPrivate = Field(default_factory=StatsPrivate)
     next_payment_date: Optional[datetime] = None
@@ -135,22 +136,25 @@ class VoteRevoke(BaseModel):
 
 class UserSettingsUpdate(BaseModel):
     show_community_rating: Optional[bool] = None
+    vote_notification_mode: Optional[Literal["instant", "digest"]] = None
     allow_notifications: Optional[bool] = None
     allow_expert_mailings: Optional[bool] = None
 
 
 class PaginatedUsersResponse(BaseModel):
     items: List[UserPublicRead]
-    total_count: int
+    total_count: Optional[int] = None
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
 
 class PaginatedAdminUsersResponse(BaseModel):
     items: List[UserPrivateRead]
-    total_count: int
+    total_count: Optional[int] = None
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
 
 class ExpertProfileUpdate(BaseModel):
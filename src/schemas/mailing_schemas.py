@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from datetime import datetime
+from pydantic import BaseModel, Field, computed_field
+from datetime import datetime, timezone
 from typing import Optional, Literal
 
 
@@ -22,3 +22,37 @@ class MailingRead(BaseModel):
 class AdminBroadcastCreate(BaseModel):
     message: str = Field(..., min_length=5)
     target_group: Literal["all", "experts", "users"]
+
+
+class BroadcastJobRead(BaseModel):
+    id: int
+    target_group: str
+    status: str
+    total_recipients: int
+    chunks_total: int
+    chunks_done: int
+    sent_count: int
+    failed_count: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+    @computed_field
+    @property
+    def messages_per_second(self) -> Optional[float]:
+        """Средняя скорость обработки получателей с начала рассылки."""
+        if not self.started_at:
+            return None
+        started = self.started_at
+        if started.tzinfo is None:
+            started = started.replace(tzinfo=timezone.utc)
+        finished = self.finished_at or datetime.now(timezone.utc)
+        if finished.tzinfo is None:
+            finished = finished.replace(tzinfo=timezone.utc)
+        elapsed = (finished - started).total_seconds()
+        if elapsed <= 0:
+            return None
+        return round((self.sent_count + self.failed_count) / elapsed, 1)
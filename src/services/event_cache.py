@@ -0,0 +1,178 @@
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import orjson
+import redis.asyncio as redis
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from src.models import Event, ExpertProfile, User
+from src.services.tariff_catalog import TariffCatalog
+
+# Отметка «такого промо-слова нет» в Redis
+_MISSING = "null"
+
+
+def normalize_promo(promo_word: str) -> str:
+    return promo_word.strip().upper()
+
+
+@dataclass(frozen=True)
+class EventSnapshot:
+    id: int
+    expert_id: int
+    name: str
+    start_time: datetime
+    end_time: datetime
+    voter_thank_you_message: Optional[str]
+    expert: Dict
+    # max_votes_per_event тарифа эксперта на момент загрузки снимка
+    max_voters: Optional[int] = None
+    vote_notification_mode: str = "instant"
+
+    def status(self, now: datetime) -> str:
+        if self.start_time <= now <= self.end_time:
+            return "active"
+        if now < self.start_time:
+            return "not_started"
+        return "finished"
+
+    def dumps(self) -> bytes:
+        return orjson.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, raw) -> "EventSnapshot":
+        data = orjson.loads(raw)
+        data["start_time"] = datetime.fromisoformat(data["start_time"])
+        data["end_time"] = datetime.fromisoformat(data["end_time"])
+        return cls(**data)
+
+
+async def _load_event(db: AsyncSession, promo: str) -> Optional[Event]:
+    query = (
+        select(Event)
+        .where(Event.promo_word == promo, Event.status == "approved")
+        .options(
+            selectinload(Event.expert)
+            .selectinload(ExpertProfile.user)
+            .selectinload(User.subscription)
+        )
+        .order_by(Event.event_date.desc())
+    )
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+def snapshot_from_event(
+    event: Event, max_voters: Optional[int] = None
+) -> EventSnapshot:
+    user = event.expert.user
+    return EventSnapshot(
+        id=event.id,
+        expert_id=event.expert_id,
+        name=event.name,
+        start_time=event.event_date.replace(tzinfo=timezone.utc),
+        end_time=event.end_time.replace(tzinfo=timezone.utc),
+        voter_thank_you_message=event.voter_thank_you_message,
+        expert={
+            "vk_id": user.vk_id,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "photo_url": str(user.photo_url),
+            "regalia": event.expert.regalia,
+        },
+        max_voters=max_voters,
+        vote_notification_mode=event.expert.vote_notification_mode or "instant",
+    )
+
+
+class EventCache:
+    """
+    Кеш «промо-слово -> снимок одобренного мероприятия» для /events/vote
+    и опроса /events/status. Два уровня: Redis и короткий кеш в памяти
+    воркера. Неизвестные слова кешируются отдельно и ненадолго.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        tariff_catalog: Optional[TariffCatalog] = None,
+        ttl: int = 60,
+        negative_ttl: int = 15,
+        local_ttl: float = 2,
+        local_max_size: int = 1024,
+    ):
+        self._redis = redis_client
+        self._tariff_catalog = tariff_catalog
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._local_ttl = local_ttl
+        self._local_max_size = local_max_size
+        self._local: Dict[str, tuple[Optional[EventSnapshot], float]] = {}
+
+    @staticmethod
+    def _key(promo: str) -> str:
+        return f"event_promo:v3:{promo}"
+
+    async def get_by_promo(
+        self, db: AsyncSession, promo_word: str
+    ) -> Optional[EventSnapshot]:
+        promo = normalize_promo(promo_word)
+
+        entry = self._local.get(promo)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+
+        try:
+            raw = await self._redis.get(self._key(promo))
+        except redis.RedisError as e:
+            logger.error(f"Event cache unavailable: {e}")
+            raw = None
+
+        if raw is not None:
+            snapshot = None if raw == _MISSING else EventSnapshot.loads(raw)
+        else:
+            snapshot = await self._build(db, promo)
+            try:
+                if snapshot:
+                    await self._redis.set(
+                        self._key(promo), snapshot.dumps(), ex=self._ttl
+                    )
+                else:
+                    await self._redis.set(
+                        self._key(promo), _MISSING, ex=self._negative_ttl
+                    )
+            except redis.RedisError as e:
+                logger.error(f"Event cache unavailable: {e}")
+
+        self._remember(promo, snapshot)
+        return snapshot
+
+    async def _build(self, db: AsyncSession, promo: str) -> Optional[EventSnapshot]:
+        event = await _load_event(db, promo)
+        if not event:
+            return None
+        max_voters = None
+        if self._tariff_catalog:
+            tariff = await self._tariff_catalog.resolve(event.expert.user)
+            max_voters = tariff.max_votes_per_event
+        return snapshot_from_event(event, max_voters)
+
+    def _remember(self, promo: str, snapshot: Optional[EventSnapshot]):
+        if len(self._local) >= self._local_max_size:
+            self._local.clear()
+        self._local[promo] = (snapshot, time.monotonic() + self._local_ttl)
+
+    async def invalidate(self, promo_word: Optional[str]):
+        if not promo_word:
+            return
+        promo = normalize_promo(promo_word)
+        self._local.pop(promo, None)
+        try:
+            await self._redis.delete(self._key(promo))
+        except redis.RedisError as e:
+            logger.error(f"Failed to invalidate event cache for '{promo}': {e}")
@@ -40,7 +40,7 @@ async def generate_event_excel_report(db: AsyncSession, event_id: int) -> str |
     # 3. Расчет времени
     msk_tz = timezone(timedelta(hours=3))
     start_dt = event.event_date.astimezone(msk_tz)
-    end_dt = start_dt + timedelta(minutes=event.duration_minutes)
+    end_dt = event.end_time.astimezone(msk_tz)
 
     date_str = f"{start_dt.strftime('%d.%m.%Y %H:%M')} — {end_dt.strftime('%H:%M')}"
 
@@ -0,0 +1,427 @@
+import json
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import redis.asyncio as redis
+from loguru import logger
+from redis.exceptions import LockError
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models import ExpertProfile, ExpertScore, ExpertSelectedThemes, Theme, User
+
+LEADERBOARD_KEY = "leaderboard:experts"
+MEMBERS_KEY = "leaderboard:members"
+SHARDS_KEY = "leaderboard:shards"
+SHARD_INDEX_KEY = "leaderboard:shard_index"
+READY_KEY = "leaderboard:ready"
+REBUILD_LOCK_KEY = "lock:leaderboard:rebuild"
+# Пока идёт перестройка, обновления отмечают экспертов в TOUCHED_KEY,
+# чтобы применить их повторно поверх подменённых ключей
+REBUILDING_KEY = "leaderboard:rebuilding"
+TOUCHED_KEY = "leaderboard:rebuild:touched"
+REBUILD_TIMEOUT_SECONDS = 600
+
+# community_score занимает младшие разряды составного счёта
+COMMUNITY_SCORE_SPAN = 2**24
+COMMUNITY_SCORE_LIMIT = COMMUNITY_SCORE_SPAN // 2 - 1
+
+REBUILD_CHUNK_SIZE = 1000
+INTERSECTION_TTL_SECONDS = 30
+
+# KEYS: global, members, shards, shard_index, rebuilding, touched
+# ARGV: vk_id, member, score, json-список шардов
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    redis.call('SADD', KEYS[6], ARGV[1])
+end
+local old = redis.call('HGET', KEYS[2], ARGV[1])
+local old_shards = redis.call('HGET', KEYS[3], ARGV[1])
+if old_shards then
+    for _, shard in ipairs(cjson.decode(old_shards)) do
+        redis.call('ZREM', shard, old or ARGV[2])
+    end
+end
+if old and old ~= ARGV[2] then
+    redis.call('ZREM', KEYS[1], old)
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+local shards = cjson.decode(ARGV[4])
+for _, shard in ipairs(shards) do
+    redis.call('ZADD', shard, ARGV[3], ARGV[2])
+    redis.call('SADD', KEYS[4], shard)
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[4])
+return 1
+"""
+
+# KEYS: global, members, shards, rebuilding, touched
+_REMOVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    redis.call('SADD', KEYS[5], ARGV[1])
+end
+local old = redis.call('HGET', KEYS[2], ARGV[1])
+if old then
+    local old_shards = redis.call('HGET', KEYS[3], ARGV[1])
+    if old_shards then
+        for _, shard in ipairs(cjson.decode(old_shards)) do
+            redis.call('ZREM', shard, old)
+        end
+    end
+    redis.call('ZREM', KEYS[1], old)
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('HDEL', KEYS[3], ARGV[1])
+end
+return 1
+"""
+
+_RANK_SCRIPT = """
+local member = redis.call('HGET', KEYS[2], ARGV[1])
+if not member then
+    return nil
+end
+return redis.call('ZRANK', KEYS[1], member)
+"""
+
+
+def region_shard_key(region: str) -> str:
+    return f"leaderboard:region:{region}"
+
+
+def category_shard_key(category_id: int) -> str:
+    return f"leaderboard:category:{category_id}"
+
+
+def shard_keys_for(region: Optional[str], category_ids) -> list[str]:
+    keys = [category_shard_key(c) for c in sorted(set(category_ids))]
+    if region:
+        keys.insert(0, region_shard_key(region))
+    return keys
+
+
+class Leaderboard:
+    """
+    Глобальный рейтинг экспертов в sorted set.
+
+    Порядок совпадает с row_number() из get_top_experts_paginated:
+    expert_score DESC, community_score DESC, first_name, last_name, vk_id.
+    Оба счёта упакованы в score (со знаком минус, чтобы ZRANGE отдавал
+    лучших первыми), а имена и vk_id — в member, который Redis сравнивает
+    лексикографически при равном score.
+
+    Шарды по региону и категории хранят тех же member с тем же score,
+    поэтому их порядок совпадает с глобальным, а глобальное место
+    берётся через ZRANK основного набора.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self._redis = redis_client
+        self._update = redis_client.register_script(_UPDATE_SCRIPT)
+        self._remove = redis_client.register_script(_REMOVE_SCRIPT)
+        self._rank = redis_client.register_script(_RANK_SCRIPT)
+
+    @staticmethod
+    def composite_score(expert_score: int, community_score: int) -> int:
+        community_score = max(
+            -COMMUNITY_SCORE_LIMIT, min(COMMUNITY_SCORE_LIMIT, community_score)
+        )
+        return -(expert_score * COMMUNITY_SCORE_SPAN + community_score)
+
+    @staticmethod
+    def member(vk_id: int, first_name: Optional[str], last_name: Optional[str]) -> str:
+        return (
+            f"{(first_name or '').casefold()}\x1f"
+            f"{(last_name or '').casefold()}\x1f"
+            f"{vk_id:020d}"
+        )
+
+    @staticmethod
+    def vk_id_from_member(member: str) -> int:
+        return int(member.rsplit("\x1f", 1)[1])
+
+    async def is_ready(self) -> bool:
+        return bool(await self._redis.exists(READY_KEY))
+
+    async def update(
+        self,
+        vk_id: int,
+        first_name: Optional[str],
+        last_name: Optional[str],
+        expert_score: int,
+        community_score: int,
+        region: Optional[str] = None,
+        category_ids: Iterable[int] = (),
+    ):
+        await self._update(
+            keys=[
+                LEADERBOARD_KEY,
+                MEMBERS_KEY,
+                SHARDS_KEY,
+                SHARD_INDEX_KEY,
+                REBUILDING_KEY,
+                TOUCHED_KEY,
+            ],
+            args=[
+                vk_id,
+                self.member(vk_id, first_name, last_name),
+                self.composite_score(expert_score, community_score),
+                json.dumps(shard_keys_for(region, category_ids)),
+            ],
+        )
+
+    async def remove(self, vk_id: int):
+        await self._remove(
+            keys=[
+                LEADERBOARD_KEY,
+                MEMBERS_KEY,
+                SHARDS_KEY,
+                REBUILDING_KEY,
+                TOUCHED_KEY,
+            ],
+            args=[vk_id],
+        )
+
+    async def get_rank(self, vk_id: int) -> Optional[int]:
+        rank = await self._rank(keys=[LEADERBOARD_KEY, MEMBERS_KEY], args=[vk_id])
+        return int(rank) + 1 if rank is not None else None
+
+    async def count(self) -> int:
+        return await self._redis.zcard(LEADERBOARD_KEY)
+
+    async def get_page(self, offset: int, limit: int) -> list[tuple[int, int]]:
+        """Возвращает [(vk_id, rank)] для среза [offset, offset + limit)."""
+        if limit <= 0:
+            return []
+        members = await self._redis.zrange(LEADERBOARD_KEY, offset, offset + limit - 1)
+        return [
+            (self.vk_id_from_member(member), offset + i + 1)
+            for i, member in enumerate(members)
+        ]
+
+    async def _shard_key(
+        self, region: Optional[str], category_id: Optional[int]
+    ) -> str:
+        if region and category_id:
+            # Пересечение двух шардов кэшируется на короткое время;
+            # веса 1/0 сохраняют исходный score
+            key = f"leaderboard:intersect:{region}:{category_id}"
+            if not await self._redis.exists(key):
+                pipe = self._redis.pipeline(transaction=True)
+                pipe.zinterstore(
+                    key,
+                    {region_shard_key(region): 1, category_shard_key(category_id): 0},
+                )
+                pipe.expire(key, INTERSECTION_TTL_SECONDS)
+                await pipe.execute()
+            return key
+        if region:
+            return region_shard_key(region)
+        return category_shard_key(category_id)
+
+    async def get_shard_page(
+        self,
+        offset: int,
+        limit: int,
+        region: Optional[str] = None,
+        category_id: Optional[int] = None,
+    ) -> tuple[list[tuple[int, int]], int]:
+        """
+        Срез шарда без пересчёта рейтинга.
+        Возвращает ([(vk_id, глобальное место)], размер шарда).
+        """
+        key = await self._shard_key(region, category_id)
+        if limit <= 0:
+            return [], await self._redis.zcard(key)
+
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zrange(key, offset, offset + limit - 1)
+        pipe.zcard(key)
+        members, total = await pipe.execute()
+        if not members:
+            return [], total
+
+        pipe = self._redis.pipeline(transaction=False)
+        for member in members:
+            pipe.zrank(LEADERBOARD_KEY, member)
+        ranks = await pipe.execute()
+
+        page = [
+            (self.vk_id_from_member(member), rank + 1)
+            for member, rank in zip(members, ranks)
+            if rank is not None
+        ]
+        return page, total
+
+    @staticmethod
+    def _experts_query():
+        return (
+            select(
+                ExpertProfile.user_vk_id,
+                ExpertProfile.status,
+                ExpertProfile.region,
+                User.first_name,
+                User.last_name,
+                func.coalesce(ExpertScore.expert_score, 0).label("expert_score"),
+                func.coalesce(ExpertScore.community_score, 0).label("community_score"),
+            )
+            .join(User, ExpertProfile.user_vk_id == User.vk_id)
+            .outerjoin(ExpertScore, ExpertProfile.user_vk_id == ExpertScore.expert_id)
+        )
+
+    @staticmethod
+    def _categories_query():
+        return (
+            select(ExpertSelectedThemes.expert_vk_id, Theme.category_id)
+            .join(Theme, Theme.id == ExpertSelectedThemes.theme_id)
+            .distinct()
+        )
+
+    async def sync_expert(self, db: AsyncSession, vk_id: int):
+        """
+        Приводит позицию эксперта в рейтинге к состоянию MySQL.
+        Вызывается после коммита голосования и модерации.
+        """
+        result = await db.execute(
+            self._experts_query().where(ExpertProfile.user_vk_id == vk_id)
+        )
+        row = result.first()
+        category_ids = []
+        if row and row.status == "approved":
+            categories_res = await db.execute(
+                self._categories_query().where(
+                    ExpertSelectedThemes.expert_vk_id == vk_id
+                )
+            )
+            category_ids = [category_id for _, category_id in categories_res.all()]
+        try:
+            if row and row.status == "approved":
+                await self.update(
+                    vk_id,
+                    row.first_name,
+                    row.last_name,
+                    row.expert_score,
+                    row.community_score,
+                    region=row.region,
+                    category_ids=category_ids,
+                )
+            else:
+                await self.remove(vk_id)
+        except redis.RedisError as e:
+            logger.error(f"Failed to sync leaderboard for expert {vk_id}: {e}")
+
+    async def rebuild(self, db: AsyncSession) -> Optional[int]:
+        """
+        Полностью перестраивает рейтинг из MySQL во временные ключи
+        и атомарно подменяет ими рабочие; эксперты, обновлённые за время
+        перестройки, затем синхронизируются повторно. Если перестройку уже
+        выполняет другой воркер, возвращает None.
+        """
+        try:
+            async with self._redis.lock(
+                REBUILD_LOCK_KEY, timeout=REBUILD_TIMEOUT_SECONDS, blocking_timeout=0
+            ):
+                await self._redis.delete(TOUCHED_KEY)
+                await self._redis.set(REBUILDING_KEY, 1, ex=REBUILD_TIMEOUT_SECONDS)
+                try:
+                    total = await self._rebuild(db)
+                finally:
+                    touched = await self._finish_rebuild()
+                await self._replay(db, touched)
+                return total
+        except LockError:
+            logger.info("Leaderboard rebuild is already running elsewhere.")
+            return None
+
+    async def _finish_rebuild(self) -> set[str]:
+        """Снимает флаг перестройки и забирает отмеченных за это время."""
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.delete(REBUILDING_KEY)
+        pipe.smembers(TOUCHED_KEY)
+        pipe.delete(TOUCHED_KEY)
+        _, touched, _ = await pipe.execute()
+        return touched
+
+    async def _replay(self, db: AsyncSession, touched: set[str]):
+        """
+        Повторно синхронизирует экспертов, обновлённых во время
+        перестройки: их изменения могли затереться при подмене ключей.
+        """
+        if not touched:
+            return
+        # Новая транзакция: при REPEATABLE READ чтение видело бы снимок
+        # начала перестройки
+        await db.commit()
+        for vk_id in touched:
+            await self.sync_expert(db, int(vk_id))
+        logger.info(f"Re-applied {len(touched)} leaderboard updates after rebuild.")
+
+    async def _rebuild(self, db: AsyncSession) -> int:
+        categories_res = await db.execute(
+            self._categories_query()
+            .join(
+                ExpertProfile,
+                ExpertProfile.user_vk_id == ExpertSelectedThemes.expert_vk_id,
+            )
+            .where(ExpertProfile.status == "approved")
+        )
+        categories_map = defaultdict(list)
+        for vk_id, category_id in categories_res.all():
+            categories_map[vk_id].append(category_id)
+
+        def _tmp(key: str) -> str:
+            return f"{key}:rebuild"
+
+        tmp_board = _tmp(LEADERBOARD_KEY)
+        tmp_members = _tmp(MEMBERS_KEY)
+        tmp_shards = _tmp(SHARDS_KEY)
+        await self._redis.delete(tmp_board, tmp_members, tmp_shards)
+
+        total = 0
+        shard_keys = set()
+        result = await db.stream(
+            self._experts_query().where(ExpertProfile.status == "approved")
+        )
+        async for rows in result.partitions(REBUILD_CHUNK_SIZE):
+            pipe = self._redis.pipeline(transaction=False)
+            for row in rows:
+                member = self.member(row.user_vk_id, row.first_name, row.last_name)
+                score = self.composite_score(row.expert_score, row.community_score)
+                expert_shards = shard_keys_for(
+                    row.region, categories_map.get(row.user_vk_id, [])
+                )
+                for shard in expert_shards:
+                    if shard not in shard_keys:
+                        shard_keys.add(shard)
+                        pipe.delete(_tmp(shard))
+                    pipe.zadd(_tmp(shard), {member: score})
+                pipe.zadd(tmp_board, {member: score})
+                pipe.hset(tmp_members, row.user_vk_id, member)
+                pipe.hset(tmp_shards, row.user_vk_id, json.dumps(expert_shards))
+            await pipe.execute()
+            total += len(rows)
+
+        stale_shards = await self._redis.smembers(SHARD_INDEX_KEY) - shard_keys
+
+        pipe = self._redis.pipeline(transaction=True)
+        if total:
+            pipe.rename(tmp_board, LEADERBOARD_KEY)
+            pipe.rename(tmp_members, MEMBERS_KEY)
+            pipe.rename(tmp_shards, SHARDS_KEY)
+        else:
+            pipe.delete(LEADERBOARD_KEY, MEMBERS_KEY, SHARDS_KEY)
+        for shard in shard_keys:
+            pipe.rename(_tmp(shard), shard)
+        if stale_shards:
+            pipe.delete(*stale_shards)
+        pipe.delete(SHARD_INDEX_KEY)
+        if shard_keys:
+            pipe.sadd(SHARD_INDEX_KEY, *shard_keys)
+        pipe.set(READY_KEY, 1)
+        await pipe.execute()
+
+        logger.info(
+            f"Leaderboard rebuilt with {total} experts in {len(shard_keys)} shards."
+        )
+        return total
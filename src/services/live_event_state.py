@@ -0,0 +1,346 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional
+
+import orjson
+
+import redis.asyncio as redis
+from loguru import logger
+from sqlalchemy import case, distinct, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from src.models import Event, EventFeedback
+from src.services.event_cache import EventSnapshot
+
+ACTIVE_EVENTS_KEY = "event_live:active"
+UPDATES_CHANNEL_PREFIX = "event_live:updates:"
+
+# Ключи живут сутки после конца мероприятия, даже если сверка не прошла
+STATE_GRACE_SECONDS = 86400
+
+_NOT_SEEDED = -2
+_LIMIT_REACHED = -1
+
+# KEYS: hash, voters
+# ARGV: voter_id, vote_value, max_voters (0 — без лимита), expire_at
+_RECORD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -2
+end
+local is_new = redis.call('SISMEMBER', KEYS[2], ARGV[1]) == 0
+local max_voters = tonumber(ARGV[3])
+if is_new and max_voters > 0 and redis.call('SCARD', KEYS[2]) >= max_voters then
+    return -1
+end
+if is_new then
+    redis.call('SADD', KEYS[2], ARGV[1])
+    redis.call('HINCRBY', KEYS[1], 'voters', 1)
+end
+redis.call('HINCRBY', KEYS[1], 'total', 1)
+if ARGV[2] == '1' then
+    redis.call('HINCRBY', KEYS[1], 'trust', 1)
+elseif ARGV[2] == '-1' then
+    redis.call('HINCRBY', KEYS[1], 'distrust', 1)
+end
+redis.call('EXPIREAT', KEYS[1], ARGV[4])
+redis.call('EXPIREAT', KEYS[2], ARGV[4])
+if is_new then
+    return 1
+end
+return 0
+"""
+
+# KEYS: hash, voters
+# ARGV: voter_id, vote_value, drop_voter (1/0)
+_FORGET_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'total', -1)
+if ARGV[2] == '1' then
+    redis.call('HINCRBY', KEYS[1], 'trust', -1)
+elseif ARGV[2] == '-1' then
+    redis.call('HINCRBY', KEYS[1], 'distrust', -1)
+end
+if ARGV[3] == '1' and redis.call('SREM', KEYS[2], ARGV[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], 'voters', -1)
+end
+return 1
+"""
+
+# KEYS: hash, voters, active
+# ARGV: event_id, total, trust, distrust, expire_at, voter_id...
+_SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+for i = 6, #ARGV do
+    redis.call('SADD', KEYS[2], ARGV[i])
+end
+redis.call('HSET', KEYS[1], 'total', ARGV[2], 'trust', ARGV[3],
+    'distrust', ARGV[4], 'voters', #ARGV - 5)
+redis.call('EXPIREAT', KEYS[1], ARGV[5])
+if #ARGV > 5 then
+    redis.call('EXPIREAT', KEYS[2], ARGV[5])
+end
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: hash
+# ARGV: channel
+_PUBLISH_SCRIPT = """
+local data = redis.call('HGETALL', KEYS[1])
+if #data == 0 then
+    return 0
+end
+local tallies = {}
+for i = 1, #data, 2 do
+    tallies[data[i]] = tonumber(data[i + 1])
+end
+return redis.call('PUBLISH', ARGV[1], cjson.encode(tallies))
+"""
+
+
+def updates_channel(event_id: int) -> str:
+    return f"{UPDATES_CHANNEL_PREFIX}{event_id}"
+
+
+class EventVoteLimitError(Exception):
+    pass
+
+
+def _tallies_query(event_id: int):
+    return select(
+        func.count(EventFeedback.id),
+        func.coalesce(
+            func.sum(case((EventFeedback.rating_snapshot == 1, 1), else_=0)), 0
+        ),
+        func.coalesce(
+            func.sum(case((EventFeedback.rating_snapshot == -1, 1), else_=0)), 0
+        ),
+        func.count(distinct(EventFeedback.voter_id)),
+    ).where(EventFeedback.event_id == event_id)
+
+
+class LiveEventState:
+    """
+    Счётчики идущего мероприятия в Redis: hash event_live:{id} с полями
+    total/trust/distrust/voters и множество проголосовавших. Голос
+    учитывается Lua-скриптом до записи в MySQL, поэтому лимит
+    max_votes_per_event (число уникальных голосующих) проверяется за O(1)
+    и без обращения к БД. Источник истины — event_feedbacks: hash
+    заполняется из MySQL при первом голосе и сверяется с ним после конца
+    мероприятия.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self._redis = redis_client
+        self._record = redis_client.register_script(_RECORD_SCRIPT)
+        self._forget = redis_client.register_script(_FORGET_SCRIPT)
+        self._seed_script = redis_client.register_script(_SEED_SCRIPT)
+        self._publish = redis_client.register_script(_PUBLISH_SCRIPT)
+
+    @staticmethod
+    def _keys(event_id: int) -> list[str]:
+        return [f"event_live:{event_id}", f"event_live:{event_id}:voters"]
+
+    @staticmethod
+    def _expire_at(end_time: datetime) -> int:
+        return int(end_time.timestamp()) + STATE_GRACE_SECONDS
+
+    async def record_vote(
+        self, db: AsyncSession, event: EventSnapshot, voter_id: int, vote_value: int
+    ) -> bool:
+        """
+        Учитывает голос. Возвращает True, если голосующий новый.
+        Бросает EventVoteLimitError, если новый голосующий не влезает в лимит.
+        """
+        args = [
+            voter_id,
+            vote_value,
+            event.max_voters or 0,
+            self._expire_at(event.end_time),
+        ]
+        result = await self._record(keys=self._keys(event.id), args=args)
+        if result == _NOT_SEEDED:
+            await self._seed(db, event.id, event.end_time)
+            result = await self._record(keys=self._keys(event.id), args=args)
+        if result == _LIMIT_REACHED:
+            raise EventVoteLimitError()
+        return result == 1
+
+    async def forget_vote(
+        self, event_id: int, voter_id: int, vote_value: int, drop_voter: bool
+    ):
+        """Откатывает учтённый голос: после ошибки записи или при отмене."""
+        try:
+            await self._forget(
+                keys=self._keys(event_id),
+                args=[voter_id, vote_value, 1 if drop_voter else 0],
+            )
+        except redis.RedisError as e:
+            logger.error(f"Failed to update live state of event {event_id}: {e}")
+
+    async def publish(self, event_id: int):
+        """Рассылает текущие счётчики всем открытым трансляциям мероприятия."""
+        try:
+            await self._publish(
+                keys=self._keys(event_id)[:1], args=[updates_channel(event_id)]
+            )
+        except redis.RedisError as e:
+            logger.error(f"Failed to publish live tallies of event {event_id}: {e}")
+
+    async def get_tallies(self, event_id: int) -> Optional[Dict[str, int]]:
+        data = await self._redis.hgetall(self._keys(event_id)[0])
+        if not data:
+            return None
+        return {field: int(value) for field, value in data.items()}
+
+    async def get_or_seed_tallies(
+        self, db: AsyncSession, event_id: int, end_time: datetime
+    ) -> Dict[str, int]:
+        """
+        Счётчики для первого снимка трансляции. Если hash ещё нет (не было
+        голосов после холодного старта Redis), он заполняется из MySQL,
+        как при первом голосе.
+        """
+        tallies = await self.get_tallies(event_id)
+        if tallies is not None:
+            return tallies
+        seeded = await self._seed(db, event_id, end_time)
+        # У завершившегося мероприятия hash сразу истекает
+        return await self.get_tallies(event_id) or seeded
+
+    async def _seed(
+        self, db: AsyncSession, event_id: int, end_time: datetime
+    ) -> Dict[str, int]:
+        total, trust, distrust, voters_count = (
+            await db.execute(_tallies_query(event_id))
+        ).one()
+        voters = (
+            await db.execute(
+                select(distinct(EventFeedback.voter_id)).where(
+                    EventFeedback.event_id == event_id
+                )
+            )
+        ).scalars()
+        await self._seed_script(
+            keys=[*self._keys(event_id), ACTIVE_EVENTS_KEY],
+            args=[
+                event_id,
+                int(total),
+                int(trust),
+                int(distrust),
+                self._expire_at(end_time),
+                *voters,
+            ],
+        )
+        return {
+            "total": int(total),
+            "trust": int(trust),
+            "distrust": int(distrust),
+            "voters": int(voters_count),
+        }
+
+    async def reconcile_finished(self, db: AsyncSession) -> int:
+        """
+        Сверяет счётчики завершившихся мероприятий с MySQL и удаляет их
+        из Redis. Расхождение только логируется: голоса в event_feedbacks
+        уже записаны, hash — их производная.
+        """
+        event_ids = [int(i) for i in await self._redis.smembers(ACTIVE_EVENTS_KEY)]
+        if not event_ids:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            select(Event.id, Event.end_time).where(Event.id.in_(event_ids))
+        )
+        end_times = dict(result.all())
+
+        reconciled = 0
+        for event_id in event_ids:
+            end_time = end_times.get(event_id)
+            if end_time:
+                if end_time.replace(tzinfo=timezone.utc) > now:
+                    continue
+
+                live = await self.get_tallies(event_id)
+                tallies = (await db.execute(_tallies_query(event_id))).one()
+                stored = dict(
+                    zip(("total", "trust", "distrust", "voters"), map(int, tallies))
+                )
+                if live is not None and live != stored:
+                    logger.warning(
+                        f"Live tallies of event {event_id} drifted: "
+                        f"redis={live}, mysql={stored}"
+                    )
+
+            await self._redis.delete(*self._keys(event_id))
+            await self._redis.srem(ACTIVE_EVENTS_KEY, event_id)
+            reconciled += 1
+        return reconciled
+
+
+class LiveTallyBroadcaster:
+    """
+    Раздача обновлений счётчиков SSE-клиентам воркера. Одна подписка
+    на Redis (PSUBSCRIBE на все мероприятия) на процесс, дальше —
+    локальные очереди по event_id. Клиенту важен только последний снимок,
+    поэтому очередь на одно сообщение и старое значение вытесняется.
+    """
+
+    def __init__(self, redis_client: redis.Redis):
+        self._redis = redis_client
+        self._subscribers: Dict[int, set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def subscribe(self, event_id: int) -> AsyncIterator[asyncio.Queue]:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(event_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(event_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[event_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _dispatch(self, channel: str, data: str):
+        try:
+            event_id = int(channel[len(UPDATES_CHANNEL_PREFIX) :])
+        except ValueError:
+            return
+        for queue in self._subscribers.get(event_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(orjson.loads(data))
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{UPDATES_CHANNEL_PREFIX}*")
+                    async for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            self._dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live tally listener failed: {e}")
+                await asyncio.sleep(1)
@@ -1,67 +1,304 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 import os
 import httpx
 import json
+import redis.asyncio as redis
 from loguru import logger
 
 from src.core.config import settings
+from src.core.rate_limiter import VkRateLimiter
+from src.core.vk_http import VkHttpClient
 from src.schemas import event_schemas
 from src.models import Event
 
 VK_API_VERSION = "5.199"
 VK_API_URL = "https://api.vk.com/method/"
 
+# Лимит VK на число обращений к API внутри одного execute
+VK_EXECUTE_MAX_CALLS = 25
+
+# Максимум получателей в одном messages.send с peer_ids
+VK_MESSAGES_MAX_PEERS = 100
+
+# «Нельзя отправить сообщение пользователю без разрешения»
+VK_ERROR_MESSAGES_DENIED = 901
+
+# random_id для messages.send в текущей задаче (0 — без защиты от дублей)
+_message_random_id: ContextVar[int] = ContextVar("vk_message_random_id", default=0)
+
+
+@contextmanager
+def message_random_id(random_id: int):
+    """
+    Сообщения, отправленные внутри блока, получают этот random_id: при
+    повторной доставке той же строки outbox VK не продублирует сообщение.
+    """
+    token = _message_random_id.set(random_id)
+    try:
+        yield
+    finally:
+        _message_random_id.reset(token)
+
+
+class VkCallError(Exception):
+    def __init__(self, method: str, message: str, code: Optional[int] = None):
+        super().__init__(f"{method}: {message}")
+        self.method = method
+        self.code = code
+
+
+@dataclass
+class PendingCall:
+    method: str
+    params: dict
+    future: asyncio.Future
+
 
 class Notifier:
-    def __init__(self, token: str):
+    """
+    Отправка сообщений и постов от имени сообщества.
+
+    Вызовы API, сделанные почти одновременно (в пределах
+    VK_EXECUTE_MAX_DELAY_MS), склеиваются в один запрос execute до 25
+    методов; каждый вызывающий получает свой результат. Каждый HTTP-запрос
+    ждёт слот в rate_limiter, так что всплеск уведомлений укладывается в
+    лимит запросов сообщества в секунду.
+
+    По умолчанию ошибки VK только логируются. С raise_errors=True вызовы
+    бросают VkCallError, чтобы воркер outbox мог повторить доставку;
+    отказ пользователя в сообщениях (901) ошибкой не считается.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        redis_client: Optional[redis.Redis] = None,
+        max_delay_ms: Optional[int] = None,
+        permission_ttl: Optional[int] = None,
+        raise_errors: bool = False,
+        rate_limiter: Optional[VkRateLimiter] = None,
+        http_client: Optional[VkHttpClient] = None,
+    ):
+        # Общий пул соединений закрывает его владелец, а не Notifier
+        self._owns_client = http_client is None
         if not token:
             print("WARNING: VK_BOT_TOKEN is not set. Notifier will not send messages.")
             self.token = None
             self.client = None
         else:
             self.token = token
-            self.client = httpx.AsyncClient()
-
-    async def _call_api(self, method: str, params: dict):
-        if not self.client or not self.token:
-            return None
-
+            self.client = http_client or httpx.AsyncClient()
+        if max_delay_ms is None:
+            max_delay_ms = settings.VK_EXECUTE_MAX_DELAY_MS
+        self._max_delay = max_delay_ms / 1000
+        self._redis = redis_client
+        self._permission_ttl = permission_ttl or settings.VK_MSG_PERMISSION_TTL
+        self._queue: asyncio.Queue[Optional[PendingCall]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._flushes: set[asyncio.Task] = set()
+        self._raise_errors = raise_errors
+        self._rate_limiter = rate_limiter
+
+    async def _request(self, method: str, params: dict) -> Optional[dict]:
         base_params = {
             "access_token": self.token,
             "v": VK_API_VERSION,
         }
         try:
+            if self._rate_limiter:
+                await self._rate_limiter.acquire()
             response = await self.client.post(
                 f"{VK_API_URL}{method}", data={**base_params, **params}
             )
             response.raise_for_status()
-            data = response.json()
-            if "error" in data:
-                logger.error(
-                    f"VK API Error in method '{method}': {data['error']['error_msg']}"
-                )
-                return None
-            return data.get("response")
+            return response.json()
         except httpx.HTTPStatusError as e:
             logger.error(
                 f"HTTP error calling VK API method '{method}': {e.response.status_code} {e.response.text}"
             )
+            error = e
         except Exception as e:
             logger.error(
                 f"An unexpected error occurred in _call_api for method '{method}': {e}"
             )
+            error = e
+        if self._raise_errors:
+            raise VkCallError(method, str(error)) from error
+        return None
+
+    async def _call_direct(self, method: str, params: dict):
+        data = await self._request(method, params)
+        if data is None:
+            return None
+        if "error" in data:
+            return await self._on_call_error(method, params, data["error"])
+        return data.get("response")
+
+    async def _call_api(self, method: str, params: dict):
+        if not self.client or not self.token:
+            return None
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(PendingCall(method=method, params=params, future=future))
+        return await future
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = asyncio.get_running_loop().time() + self._max_delay
+            while len(batch) < VK_EXECUTE_MAX_CALLS:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    call = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if call is None:
+                    stopping = True
+                    break
+                batch.append(call)
+            # Сбор следующей пачки не ждёт ответа VK на текущую
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[PendingCall]):
+        try:
+            if len(batch) == 1:
+                results = [await self._call_direct(batch[0].method, batch[0].params)]
+            else:
+                results = await self._execute(batch)
+        except Exception as e:
+            logger.error(f"VK call batch of {len(batch)} failed: {e}")
+            results = [e if self._raise_errors else None] * len(batch)
+
+        for call, result in zip(batch, results):
+            if call.future.done():
+                continue
+            if isinstance(result, Exception):
+                call.future.set_exception(result)
+            else:
+                call.future.set_result(result)
+
+    async def _execute(self, batch: list[PendingCall]) -> list:
+        code = (
+            "return ["
+            + ",".join(
+                f"API.{call.method}({json.dumps(call.params, ensure_ascii=False)})"
+                for call in batch
+            )
+            + "];"
+        )
+        data = await self._request("execute", {"code": code})
+        if data is None:
+            # Сбой транспорта: неизвестно, выполнил ли VK вызовы, поэтому
+            # не повторяем их здесь, а отдаём решение вызывающим
+            return [None] * len(batch)
+        if "error" in data:
+            logger.error(f"VK execute failed: {data['error']['error_msg']}")
+            # VK отклонил сам execute (например, слишком длинный код) и ни
+            # один вызов не выполнил — отправляем их по одному
+            return await asyncio.gather(
+                *(self._call_direct(call.method, call.params) for call in batch),
+                return_exceptions=True,
+            )
+
+        # Упавший внутри execute метод возвращает false, а его ошибка
+        # лежит в execute_errors в том же порядке
+        errors = iter(data.get("execute_errors", []))
+        results = []
+        for call, result in zip(batch, data.get("response") or []):
+            if result is False:
+                try:
+                    result = await self._on_call_error(
+                        call.method, call.params, next(errors, {})
+                    )
+                except VkCallError as e:
+                    result = e
+            results.append(result)
+        return results + [None] * (len(batch) - len(results))
+
+    async def _on_call_error(self, method: str, params: dict, error: dict):
+        """Разбирает ошибку VK: возвращает None или бросает VkCallError."""
+        logger.error(f"VK API Error in method '{method}': {error.get('error_msg')}")
+        code = error.get("error_code")
+        if method == "messages.send" and code == VK_ERROR_MESSAGES_DENIED:
+            for peer_id in self._denied_peers(params):
+                await self.remember_messages_permission(peer_id, False)
+            return None
+        if self._raise_errors:
+            raise VkCallError(method, error.get("error_msg", ""), code)
         return None
 
+    @staticmethod
+    def _denied_peers(params: dict) -> list[int]:
+        """
+        Кому относится 901 на весь messages.send. При массовой отправке
+        отказы приходят в ответе по каждому получателю, и ошибка всего
+        вызова однозначна, только если получатель один.
+        """
+        if params.get("peer_id") is not None:
+            return [int(params["peer_id"])]
+        peer_ids = [p for p in str(params.get("peer_ids", "")).split(",") if p]
+        return [int(peer_ids[0])] if len(peer_ids) == 1 else []
+
+    @staticmethod
+    def _permission_key(user_id: int) -> str:
+        return f"vk_msg_allowed:{user_id}"
+
+    async def remember_messages_permission(self, user_id: int, allowed: bool):
+        """
+        Запоминает, можно ли писать пользователю. Вызывается из колбэков
+        message_allow/message_deny и при ошибке 901 на отправке.
+        """
+        if not self._redis:
+            return
+        try:
+            await self._redis.set(
+                self._permission_key(user_id),
+                "1" if allowed else "0",
+                ex=self._permission_ttl,
+            )
+        except redis.RedisError as e:
+            logger.error(f"Failed to cache messages permission of {user_id}: {e}")
+
     async def is_messages_allowed(self, user_id: int) -> bool:
         if not self.client or not self.token:
             return False
 
+        if self._redis:
+            try:
+                cached = await self._redis.get(self._permission_key(user_id))
+            except redis.RedisError as e:
+                logger.error(f"Messages permission cache unavailable: {e}")
+                cached = None
+            if cached is not None:
+                return cached == "1"
+
         response = await self._call_api(
             "messages.isMessagesFromGroupAllowed",
             {"group_id": settings.VK_GROUP_ID, "user_id": user_id},
         )
-        return response and response.get("is_allowed") == 1
+        if response is None:
+            # Ошибку VK не кешируем: это не ответ пользователя
+            return False
+        allowed = response.get("is_allowed") == 1
+        await self.remember_messages_permission(user_id, allowed)
+        return allowed
 
     async def send_message(
         self, peer_id: int, message: str, keyboard=None, attachment=None
@@ -76,7 +313,7 @@ class Notifier:
         params = {
             "peer_id": peer_id,
             "message": message,
-            "random_id": 0,
+            "random_id": _message_random_id.get(),
         }
         if keyboard:
             params["keyboard"] = json.dumps(keyboard)
@@ -85,6 +322,58 @@ class Notifier:
 
         await self._call_api("messages.send", params)
 
+    async def _drop_denied(self, peer_ids: list[int]) -> list[int]:
+        """Убирает получателей, запретивших сообщения (по кешу разрешений)."""
+        if not self._redis:
+            return list(peer_ids)
+        try:
+            cached = await self._redis.mget(
+                [self._permission_key(peer_id) for peer_id in peer_ids]
+            )
+        except redis.RedisError as e:
+            logger.error(f"Messages permission cache unavailable: {e}")
+            return list(peer_ids)
+        return [peer_id for peer_id, value in zip(peer_ids, cached) if value != "0"]
+
+    async def send_bulk_message(
+        self, peer_ids: list[int], message: str, random_id: int = 0
+    ) -> tuple[int, int]:
+        """
+        Отправляет одно сообщение до VK_MESSAGES_MAX_PEERS получателям одним
+        messages.send. Разрешение заранее не проверяется: отказ 901 приходит
+        в ответе по каждому получателю и запоминается. Одинаковый random_id
+        не даёт VK продублировать сообщение при повторе.
+        Возвращает (доставлено, не доставлено).
+        """
+        if not self.client or not self.token:
+            return 0, len(peer_ids)
+        recipients = await self._drop_denied(peer_ids)
+        if not recipients:
+            return 0, len(peer_ids)
+
+        response = await self._call_api(
+            "messages.send",
+            {
+                "peer_ids": ",".join(map(str, recipients)),
+                "message": message,
+                "random_id": random_id,
+            },
+        )
+        if response is None:
+            return 0, len(peer_ids)
+
+        sent = 0
+        for item in response:
+            error = item.get("error")
+            if not error:
+                sent += 1
+            elif (
+                error.get("code") == VK_ERROR_MESSAGES_DENIED
+                and item.get("peer_id") is not None
+            ):
+                await self.remember_messages_permission(item["peer_id"], False)
+        return sent, len(peer_ids) - sent
+
     async def send_document(self, user_id: int, file_path: str, message: str):
         if not self.client:
             return
@@ -278,6 +567,27 @@ class Notifier:
 
         await self.send_message(expert_id, message)
 
+    async def send_vote_digest(
+        self,
+        expert_id: int,
+        promo_word: str,
+        trust: int,
+        distrust: int,
+        comments: list[str],
+        minutes: int,
+    ):
+        message = (
+            f"🗳️ Голоса на мероприятии {promo_word} за последние {minutes} мин.:\n\n"
+            f"👍 +{trust} (доверяю)\n"
+            f"👎 +{distrust} (не доверяю)\n"
+        )
+        if comments:
+            message += "\nПоследние комментарии:\n" + "\n".join(
+                f"«{comment}»" for comment in comments
+            )
+
+        await self.send_message(expert_id, message)
+
     async def send_vote_action_notification(
         self,
         user_vk_id: int,
@@ -340,5 +650,10 @@ class Notifier:
         await self.send_message(expert_id, message)
 
     async def close(self):
-        if self.client:
+        if self._task is not None and not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        if self.client and self._owns_client:
             await self.client.aclose()
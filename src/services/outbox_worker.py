@@ -0,0 +1,177 @@
+import asyncio
+from datetime import timedelta
+
+from dateutil.parser import isoparse
+from loguru import logger
+from sqlalchemy.orm import selectinload
+from sqlalchemy.future import select
+
+from src.crud import broadcast_crud, outbox_crud
+from src.models import BroadcastJob, Event, ExpertProfile, NotificationOutbox
+from src.schemas import event_schemas
+from src.services.notifier import Notifier, message_random_id
+
+# Методы Notifier, которые можно ставить в outbox как есть
+NOTIFIER_KINDS = {
+    "send_message",
+    "send_new_request_to_admin",
+    "send_new_event_to_admin",
+    "send_moderation_result",
+    "send_event_status_notification",
+    "send_new_vote_notification",
+    "send_vote_digest",
+    "send_vote_action_notification",
+    "send_event_reminder",
+    "delete_wall_post",
+}
+# Служебные операции воркера
+POST_EVENT_ANNOUNCEMENT = "post_event_announcement"
+
+SENT_RETENTION = timedelta(days=7)
+
+
+class OutboxWorker:
+    """
+    Отправляет уведомления из notification_outbox: забирает пачку через
+    SKIP LOCKED, доставляет не больше `concurrency` одновременно, при
+    ошибке повторяет с задержкой base_backoff * 2^(попытка - 1), после
+    max_attempts переводит в dead. Можно запускать в нескольких процессах.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        notifier: Notifier,
+        concurrency: int = 5,
+        batch_size: int = 50,
+        max_attempts: int = 8,
+        base_backoff: int = 5,
+        lease_seconds: int = 300,
+    ):
+        self._session_factory = session_factory
+        self._notifier = notifier
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._base_backoff = base_backoff
+        self._lease_seconds = lease_seconds
+
+    async def run_forever(self, poll_interval: float = 1.0):
+        purge_every = 3600 / poll_interval
+        iterations = 0
+        while True:
+            try:
+                processed = await self.run_once()
+                iterations += 1
+                if iterations >= purge_every:
+                    iterations = 0
+                    async with self._session_factory() as db:
+                        await outbox_crud.purge_sent(db, SENT_RETENTION)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker iteration failed: {e}")
+                processed = 0
+            # Полная пачка — скорее всего, есть ещё: берём следующую сразу
+            if processed < self._batch_size:
+                await asyncio.sleep(poll_interval)
+
+    async def run_once(self) -> int:
+        async with self._session_factory() as db:
+            rows = await outbox_crud.claim_due(
+                db, self._batch_size, self._lease_seconds
+            )
+        if rows:
+            await asyncio.gather(*(self._process(row) for row in rows))
+        return len(rows)
+
+    async def _process(self, row: NotificationOutbox):
+        async with self._semaphore:
+            try:
+                if row.kind == broadcast_crud.BROADCAST_CHUNK:
+                    # Чанк рассылки сам отмечает строку отправленной
+                    await self._send_broadcast_chunk(row.id, row.payload)
+                    return
+                with message_random_id(outbox_crud.notification_random_id(row.id)):
+                    await self._deliver(row.kind, dict(row.payload))
+            except Exception as e:
+                attempts = row.attempts + 1
+                async with self._session_factory() as db:
+                    dead = await outbox_crud.mark_failed(
+                        db,
+                        row.id,
+                        attempts,
+                        f"{type(e).__name__}: {e}",
+                        self._max_attempts,
+                        self._base_backoff,
+                    )
+                if dead and row.kind == broadcast_crud.BROADCAST_CHUNK:
+                    async with self._session_factory() as db:
+                        await broadcast_crud.record_dead_chunk(
+                            db, row.payload["job_id"], len(row.payload["peer_ids"])
+                        )
+                if dead:
+                    logger.error(
+                        f"Outbox notification {row.id} ({row.kind}) moved to "
+                        f"dead letters after {attempts} attempts: {e}"
+                    )
+                else:
+                    logger.warning(
+                        f"Outbox notification {row.id} ({row.kind}) failed, "
+                        f"attempt {attempts}: {e}"
+                    )
+                return
+
+            async with self._session_factory() as db:
+                await outbox_crud.mark_sent(db, row.id)
+
+    async def _deliver(self, kind: str, payload: dict):
+        if kind == POST_EVENT_ANNOUNCEMENT:
+            await self._post_event_announcement(payload["event_id"])
+            return
+        if kind not in NOTIFIER_KINDS:
+            raise ValueError(f"Unknown outbox kind '{kind}'")
+
+        if kind == "send_new_vote_notification":
+            payload["vote_data"] = event_schemas.VoteCreate(**payload["vote_data"])
+        elif kind == "send_event_reminder":
+            payload["event_date"] = isoparse(payload["event_date"])
+        await getattr(self._notifier, kind)(**payload)
+
+    async def _post_event_announcement(self, event_id: int):
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Event)
+                .where(Event.id == event_id)
+                .options(selectinload(Event.expert).selectinload(ExpertProfile.user))
+            )
+            event = result.scalars().first()
+            # Уже опубликовано при прошлой попытке или мероприятие удалено
+            if not event or event.wall_post_id or event.status != "approved":
+                return
+
+            user = event.expert.user
+            post_id = await self._notifier.post_announcement_to_wall(
+                event, f"{user.first_name} {user.last_name}"
+            )
+            if post_id:
+                event.wall_post_id = post_id
+                await db.commit()
+
+    async def _send_broadcast_chunk(self, outbox_id: int, payload: dict):
+        job_id, seq = payload["job_id"], payload["seq"]
+        async with self._session_factory() as db:
+            job = await db.get(BroadcastJob, job_id)
+            message = job.message if job else None
+        if message is None:
+            return
+
+        sent, failed = await self._notifier.send_bulk_message(
+            payload["peer_ids"],
+            broadcast_crud.broadcast_text(message),
+            random_id=broadcast_crud.chunk_random_id(job_id, seq),
+        )
+        async with self._session_factory() as db:
+            await broadcast_crud.record_chunk_result(
+                db, outbox_id, job_id, sent, failed
+            )
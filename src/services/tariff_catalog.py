@@ -0,0 +1,156 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional
+
+import redis.asyncio as redis
+from loguru import logger
+from sqlalchemy.future import select
+
+from src.models import Tariff, User
+
+INVALIDATION_CHANNEL = "tariffs:invalidate"
+
+DEFAULT_TARIFF_NAME = "Начальный"
+DEFAULT_EVENT_LIMIT = 3
+DEFAULT_MAX_VOTES_PER_EVENT = 100
+DEFAULT_EVENT_DURATION_HOURS = 1
+
+
+@dataclass(frozen=True)
+class TariffInfo:
+    id: int
+    code: str
+    name: str
+    price: float
+    price_votes: int
+    vk_donut_link: Optional[str]
+    event_limit: int
+    event_duration_hours: int
+    max_votes_per_event: int
+    is_active: bool
+
+
+@dataclass(frozen=True)
+class ResolvedTariff:
+    name: str
+    event_limit: int
+    max_votes_per_event: int
+    event_duration_hours: int
+
+
+def resolve_tariff(tariffs: list[TariffInfo], user: User) -> ResolvedTariff:
+    """
+    Тариф пользователя: принудительно назначенный, иначе самый дорогой тариф,
+    покрытый суммой активной подписки, иначе бесплатный.
+    `tariffs` — активные тарифы по убыванию цены.
+    """
+    start = next((t for t in tariffs if t.price == 0), None)
+    resolved = ResolvedTariff(
+        name=DEFAULT_TARIFF_NAME,
+        event_limit=start.event_limit if start else DEFAULT_EVENT_LIMIT,
+        max_votes_per_event=(
+            start.max_votes_per_event if start else DEFAULT_MAX_VOTES_PER_EVENT
+        ),
+        event_duration_hours=(
+            start.event_duration_hours if start else DEFAULT_EVENT_DURATION_HOURS
+        ),
+    )
+
+    matched = None
+    if user.forced_tariff_id:
+        matched = next((t for t in tariffs if t.id == user.forced_tariff_id), None)
+    elif user.subscription and user.subscription.is_active:
+        matched = next(
+            (t for t in tariffs if user.subscription.amount >= t.price), None
+        )
+
+    if matched:
+        resolved = ResolvedTariff(
+            name=matched.name,
+            event_limit=matched.event_limit,
+            max_votes_per_event=matched.max_votes_per_event,
+            event_duration_hours=matched.event_duration_hours,
+        )
+    return resolved
+
+
+class TariffCatalog:
+    """
+    Снимок активных тарифов в памяти воркера. Загружается при первом
+    обращении и сбрасывается сообщением в Redis-канал после изменения
+    тарифов, поэтому определение тарифа не стоит ни одного запроса к БД.
+    """
+
+    def __init__(self, session_factory, redis_client: redis.Redis):
+        self._session_factory = session_factory
+        self._redis = redis_client
+        self._tariffs: Optional[list[TariffInfo]] = None
+        self._generation = 0
+        self._load_lock = asyncio.Lock()
+
+    async def get_active(self) -> list[TariffInfo]:
+        tariffs = self._tariffs
+        if tariffs is not None:
+            return tariffs
+        async with self._load_lock:
+            if self._tariffs is not None:
+                return self._tariffs
+            generation = self._generation
+            tariffs = await self._load()
+            # Сброс во время загрузки означает, что прочитанное уже устарело
+            if generation == self._generation:
+                self._tariffs = tariffs
+            return tariffs
+
+    async def _load(self) -> list[TariffInfo]:
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Tariff).where(Tariff.is_active).order_by(Tariff.price.desc())
+            )
+            return [
+                TariffInfo(
+                    id=t.id,
+                    code=t.code,
+                    name=t.name,
+                    price=t.price,
+                    price_votes=t.price_votes,
+                    vk_donut_link=t.vk_donut_link,
+                    event_limit=t.event_limit,
+                    event_duration_hours=t.event_duration_hours,
+                    max_votes_per_event=t.max_votes_per_event,
+                    is_active=t.is_active,
+                )
+                for t in result.scalars().all()
+            ]
+
+    async def resolve(self, user: User) -> ResolvedTariff:
+        return resolve_tariff(await self.get_active(), user)
+
+    def invalidate(self):
+        self._generation += 1
+        self._tariffs = None
+
+    async def publish_invalidation(self):
+        self.invalidate()
+        try:
+            await self._redis.publish(INVALIDATION_CHANNEL, "1")
+        except redis.RedisError as e:
+            logger.error(f"Failed to publish tariff invalidation: {e}")
+
+    async def listen_for_invalidation(self):
+        """Фоновая задача: сбрасывает снимок по сообщениям других воркеров."""
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # Пока подписки не было, сообщения могли потеряться
+                    self.invalidate()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Tariff invalidation listener failed: {e}")
+                self.invalidate()
+                await asyncio.sleep(5)
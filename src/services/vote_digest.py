@@ -0,0 +1,103 @@
+import math
+import time
+from typing import Dict, List
+
+import redis.asyncio as redis
+from loguru import logger
+
+from src.crud import outbox_crud
+
+PENDING_KEY = "vote_digest:pending"
+
+# Ключи накопителя живут не дольше суток, даже если сводка не ушла
+DIGEST_TTL_SECONDS = 86400
+
+# KEYS: hash, comments, pending; ARGV: event_id
+# Забирает накопленное и удаляет его одним шагом, чтобы сводку по
+# мероприятию отправил ровно один воркер
+_TAKE_SCRIPT = """
+local data = redis.call('HGETALL', KEYS[1])
+local comments = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('SREM', KEYS[3], ARGV[1])
+return {data, comments}
+"""
+
+
+class VoteDigest:
+    """
+    Копит голоса по мероприятиям экспертов, выбравших режим digest, и раз
+    в окно отправляет одну сводку вместо сообщения на каждый голос.
+    Сводки ставятся в notification_outbox, отправляет их воркер.
+    """
+
+    def __init__(self, redis_client: redis.Redis, max_comments: int = 3):
+        self._redis = redis_client
+        self._max_comments = max_comments
+        self._take = redis_client.register_script(_TAKE_SCRIPT)
+
+    @staticmethod
+    def _keys(event_id: int) -> tuple[str, str]:
+        return f"vote_digest:{event_id}", f"vote_digest:{event_id}:comments"
+
+    async def add(
+        self,
+        expert_id: int,
+        event_id: int,
+        promo_word: str,
+        vote_type: str,
+        comment: str,
+    ) -> bool:
+        """Учитывает голос в сводке. False — Redis недоступен."""
+        hash_key, comments_key = self._keys(event_id)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hsetnx(hash_key, "expert_id", expert_id)
+                pipe.hsetnx(hash_key, "promo_word", promo_word)
+                pipe.hsetnx(hash_key, "since", int(time.time()))
+                pipe.hincrby(hash_key, vote_type, 1)
+                pipe.lpush(comments_key, comment.strip())
+                pipe.ltrim(comments_key, 0, self._max_comments - 1)
+                pipe.expire(hash_key, DIGEST_TTL_SECONDS)
+                pipe.expire(comments_key, DIGEST_TTL_SECONDS)
+                pipe.sadd(PENDING_KEY, event_id)
+                await pipe.execute()
+            return True
+        except redis.RedisError as e:
+            logger.error(f"Vote digest unavailable for event {event_id}: {e}")
+            return False
+
+    async def drain(self) -> List[Dict]:
+        """Забирает все накопленные сводки."""
+        digests = []
+        for event_id in await self._redis.smembers(PENDING_KEY):
+            hash_key, comments_key = self._keys(event_id)
+            data, comments = await self._take(
+                keys=[hash_key, comments_key, PENDING_KEY], args=[event_id]
+            )
+            fields = dict(zip(data[::2], data[1::2]))
+            if "expert_id" not in fields:
+                continue
+            minutes = math.ceil((time.time() - int(fields["since"])) / 60)
+            digests.append(
+                {
+                    "expert_id": int(fields["expert_id"]),
+                    "promo_word": fields["promo_word"],
+                    "trust": int(fields.get("trust", 0)),
+                    "distrust": int(fields.get("distrust", 0)),
+                    "comments": comments,
+                    "minutes": max(minutes, 1),
+                }
+            )
+        return digests
+
+    async def flush(self, session_factory) -> int:
+        """Ставит накопленные сводки в outbox. Возвращает их число."""
+        digests = await self.drain()
+        if not digests:
+            return 0
+        async with session_factory() as db:
+            for digest in digests:
+                outbox_crud.add_notification(db, "send_vote_digest", **digest)
+            await db.commit()
+        return len(digests)
@@ -0,0 +1,232 @@
+import asyncio
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.future import select
+
+from src.crud import event_stats_crud, outbox_crud, score_crud, vote_crud
+from src.models import EventFeedback, ExpertRating
+
+
+def _rating_key():
+    return tuple_(
+        ExpertRating.expert_id, ExpertRating.voter_id, ExpertRating.rating_type
+    )
+
+
+@dataclass
+class PendingVote:
+    expert_id: int
+    voter_id: int
+    rating_type: str
+    vote_value: int
+    comment: Optional[str]
+    event_id: Optional[int]
+    notifications: Sequence[tuple[str, dict]]
+    future: asyncio.Future
+
+
+class VoteIngestor:
+    """
+    Групповая запись голосов для всплесков на живых мероприятиях.
+    Запросы кладут голос в очередь и ждут, пока фоновая задача запишет
+    пачку одной транзакцией: многострочный upsert в expert_ratings,
+    многострочная вставка в event_feedbacks, приращение счётчиков и
+    уведомления голосов в outbox. Ответ уходит только после коммита пачки.
+    """
+
+    def __init__(self, session_factory, max_batch_size: int, max_delay_ms: int):
+        self._session_factory = session_factory
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay_ms / 1000
+        self._queue: asyncio.Queue[Optional[PendingVote]] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        expert_id: int,
+        voter_id: int,
+        rating_type: str,
+        vote_value: int,
+        comment: Optional[str],
+        event_id: Optional[int] = None,
+        notifications: Sequence[tuple[str, dict]] = (),
+    ) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(
+            PendingVote(
+                expert_id=expert_id,
+                voter_id=voter_id,
+                rating_type=rating_type,
+                vote_value=vote_value,
+                comment=comment,
+                event_id=event_id,
+                notifications=notifications,
+                future=future,
+            )
+        )
+        await future
+
+    async def stop(self):
+        """Дописывает всё, что уже в очереди, и останавливает запись."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = asyncio.get_running_loop().time() + self._max_delay
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    vote = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if vote is None:
+                    stopping = True
+                    break
+                batch.append(vote)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[PendingVote]):
+        try:
+            async with self._session_factory() as db:
+                await self._write_batch(db, batch)
+        except Exception as e:
+            # Одна битая строка не должна ронять всю пачку: повторяем поштучно
+            logger.warning(
+                f"Vote batch of {len(batch)} failed, retrying one by one: {e}"
+            )
+            await self._write_one_by_one(batch)
+            return
+
+        for vote in batch:
+            if not vote.future.done():
+                vote.future.set_result(None)
+
+    async def _write_batch(self, db, batch: list[PendingVote]):
+        # Последний голос одного и того же пользователя в пачке побеждает
+        latest = {}
+        for vote in batch:
+            latest[(vote.expert_id, vote.voter_id, vote.rating_type)] = vote.vote_value
+
+        # Upsert по возрастанию ключа, чтобы пачки брали блокировки строк
+        # в одном порядке; прежний голос каждая строка сохраняет в
+        # previous_value, как в vote_crud.write_vote
+        keys = list(latest)
+        upserted = sorted(key for key in keys if latest[key])
+        removals = sorted(key for key in keys if not latest[key])
+        previous = {}
+
+        if upserted:
+            await db.execute(
+                vote_crud.rating_upsert(
+                    [
+                        {
+                            "expert_id": expert_id,
+                            "voter_id": voter_id,
+                            "rating_type": rating_type,
+                            "vote_value": latest[(expert_id, voter_id, rating_type)],
+                        }
+                        for expert_id, voter_id, rating_type in upserted
+                    ]
+                )
+            )
+            previous_res = await db.execute(
+                select(
+                    ExpertRating.expert_id,
+                    ExpertRating.voter_id,
+                    ExpertRating.rating_type,
+                    ExpertRating.previous_value,
+                ).where(_rating_key().in_(upserted))
+            )
+            previous.update(
+                ((row.expert_id, row.voter_id, row.rating_type), row.previous_value)
+                for row in previous_res
+            )
+        if removals:
+            removed_res = await db.execute(
+                select(
+                    ExpertRating.expert_id,
+                    ExpertRating.voter_id,
+                    ExpertRating.rating_type,
+                    ExpertRating.vote_value,
+                )
+                .where(_rating_key().in_(removals))
+                .with_for_update()
+            )
+            previous.update(
+                ((row.expert_id, row.voter_id, row.rating_type), row.vote_value)
+                for row in removed_res
+            )
+            await db.execute(delete(ExpertRating).where(_rating_key().in_(removals)))
+
+        await db.execute(
+            insert(EventFeedback).values(
+                [
+                    {
+                        "expert_id": vote.expert_id,
+                        "voter_id": vote.voter_id,
+                        "event_id": vote.event_id,
+                        "comment": vote.comment,
+                        "rating_snapshot": vote.vote_value,
+                    }
+                    for vote in batch
+                ]
+            )
+        )
+        await event_stats_crud.record_event_votes(
+            db, [(vote.event_id, vote.vote_value) for vote in batch]
+        )
+
+        deltas = defaultdict(Counter)
+        for key, vote_value in latest.items():
+            expert_id, _, rating_type = key
+            deltas[expert_id].update(
+                score_crud.rating_delta(rating_type, previous.get(key, 0), vote_value)
+            )
+        # Строки expert_scores — по возрастанию id, чтобы пачки не
+        # блокировали друг друга встречно
+        for expert_id in sorted(deltas):
+            await score_crud.apply_score_deltas(db, expert_id, deltas[expert_id])
+        for vote in batch:
+            for kind, payload in vote.notifications:
+                outbox_crud.add_notification(db, kind, **payload)
+        await db.commit()
+
+    async def _write_one_by_one(self, batch: list[PendingVote]):
+        for vote in batch:
+            try:
+                async with self._session_factory() as db:
+                    await vote_crud.write_vote(
+                        db,
+                        expert_id=vote.expert_id,
+                        voter_id=vote.voter_id,
+                        rating_type=vote.rating_type,
+                        vote_value=vote.vote_value,
+                        comment=vote.comment,
+                        event_id=vote.event_id,
+                        notifications=vote.notifications,
+                    )
+            except Exception as e:
+                if not vote.future.done():
+                    vote.future.set_exception(e)
+                continue
+            if not vote.future.done():
+                vote.future.set_result(None)
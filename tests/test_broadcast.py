@@ -0,0 +1,92 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import func, select
+
+from src.core.dependencies import get_current_admin_user, get_db
+from src.crud import broadcast_crud
+from src.models import NotificationOutbox, User
+from src.schemas.mailing_schemas import BroadcastJobRead
+
+
+@pytest.fixture
+def no_returning(engine):
+    # Как в MySQL: без RETURNING серверные default'ы не приходят с INSERT
+    engine.sync_engine.dialect.insert_returning = False
+
+
+@pytest.fixture
+async def client(no_returning, session_factory):
+    # В дереве пока нет mailing_crud, без него роутер рассылок не импортируется
+    mailings = pytest.importorskip("src.api.endpoints.mailings", exc_type=ImportError)
+
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(mailings.router)
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_current_admin_user] = lambda: {
+        "vk_id": 1,
+        "is_admin": True,
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+async def _add_users(db, count: int):
+    db.add_all(
+        User(
+            vk_id=vk_id,
+            first_name="Имя",
+            last_name="Фамилия",
+            allow_notifications=True,
+        )
+        for vk_id in range(100, 100 + count)
+    )
+    await db.commit()
+
+
+async def test_created_job_serializes_without_lazy_load(no_returning, db):
+    count = broadcast_crud.BROADCAST_CHUNK_SIZE + 5
+    await _add_users(db, count)
+
+    job = await broadcast_crud.create_broadcast_job(db, "Привет всем", "all", 1)
+
+    read = BroadcastJobRead.model_validate(job)
+    assert read.created_at is not None
+    assert read.status == "queued"
+    assert read.total_recipients == count
+    assert read.chunks_total == 2
+    chunks = await db.scalar(select(func.count()).select_from(NotificationOutbox))
+    assert chunks == 2
+
+
+async def test_admin_broadcast_returns_job(client, db):
+    await _add_users(db, 3)
+
+    response = await client.post(
+        "/mailings/admin/broadcast",
+        json={"message": "Привет всем", "target_group": "all"},
+    )
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "queued"
+    assert body["total_recipients"] == 3
+    assert body["created_at"]
+
+
+async def test_admin_broadcast_without_recipients_is_done(client):
+    response = await client.post(
+        "/mailings/admin/broadcast",
+        json={"message": "Привет всем", "target_group": "experts"},
+    )
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "done"
+    assert body["chunks_total"] == 0
+    assert body["finished_at"]
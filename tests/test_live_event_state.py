@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+
+from src.models import Event, EventFeedback
+from src.services.event_cache import EventSnapshot
+from src.services.live_event_state import (
+    ACTIVE_EVENTS_KEY,
+    EventVoteLimitError,
+    LiveEventState,
+    updates_channel,
+)
+
+EVENT_ID = 7
+
+
+def _snapshot(max_voters=None) -> EventSnapshot:
+    now = datetime.now(timezone.utc)
+    return EventSnapshot(
+        id=EVENT_ID,
+        expert_id=1,
+        name="Лекция",
+        start_time=now - timedelta(minutes=10),
+        end_time=now + timedelta(minutes=50),
+        voter_thank_you_message=None,
+        expert={},
+        max_voters=max_voters,
+    )
+
+
+@pytest.fixture
+def live_state(redis_client):
+    return LiveEventState(redis_client)
+
+
+async def _add_feedback(db, voter_id: int, value: int):
+    db.add(
+        EventFeedback(
+            expert_id=1,
+            voter_id=voter_id,
+            event_id=EVENT_ID,
+            comment="ok",
+            rating_snapshot=value,
+        )
+    )
+    await db.commit()
+
+
+async def test_first_vote_seeds_tallies_from_mysql(db, live_state, redis_client):
+    await _add_feedback(db, 10, 1)
+    await _add_feedback(db, 11, -1)
+
+    assert await live_state.record_vote(db, _snapshot(), 12, 1) is True
+
+    assert await live_state.get_tallies(EVENT_ID) == {
+        "total": 3,
+        "trust": 2,
+        "distrust": 1,
+        "voters": 3,
+    }
+    assert await redis_client.smembers(ACTIVE_EVENTS_KEY) == {str(EVENT_ID)}
+
+
+async def test_repeat_voter_counts_vote_but_not_voter(db, live_state):
+    assert await live_state.record_vote(db, _snapshot(), 10, 1) is True
+    assert await live_state.record_vote(db, _snapshot(), 10, -1) is False
+
+    assert await live_state.get_tallies(EVENT_ID) == {
+        "total": 2,
+        "trust": 1,
+        "distrust": 1,
+        "voters": 1,
+    }
+
+
+async def test_limit_rejects_only_new_voters(db, live_state):
+    event = _snapshot(max_voters=2)
+    await live_state.record_vote(db, event, 10, 1)
+    await live_state.record_vote(db, event, 11, 1)
+
+    with pytest.raises(EventVoteLimitError):
+        await live_state.record_vote(db, event, 12, 1)
+    assert await live_state.record_vote(db, event, 11, -1) is False
+    assert (await live_state.get_tallies(EVENT_ID))["voters"] == 2
+
+
+async def test_forget_vote_frees_limit_slot(db, live_state):
+    event = _snapshot(max_voters=1)
+    new_voter = await live_state.record_vote(db, event, 10, -1)
+
+    await live_state.forget_vote(EVENT_ID, 10, -1, drop_voter=new_voter)
+
+    assert await live_state.get_tallies(EVENT_ID) == {
+        "total": 0,
+        "trust": 0,
+        "distrust": 0,
+        "voters": 0,
+    }
+    assert await live_state.record_vote(db, event, 11, 1) is True
+
+
+async def test_publish_sends_current_tallies(db, live_state, redis_client):
+    await live_state.record_vote(db, _snapshot(), 10, 1)
+
+    async with redis_client.pubsub() as pubsub:
+        await pubsub.subscribe(updates_channel(EVENT_ID))
+        await pubsub.get_message(timeout=1)
+        await live_state.publish(EVENT_ID)
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+
+    assert message is not None
+    assert orjson.loads(message["data"]) == {
+        "total": 1,
+        "trust": 1,
+        "distrust": 0,
+        "voters": 1,
+    }
+
+
+async def test_reconcile_drops_finished_events(db, live_state, redis_client):
+    now = datetime.now(timezone.utc)
+    db.add(
+        Event(
+            id=EVENT_ID,
+            expert_id=1,
+            name="Лекция",
+            promo_word="PROMO",
+            event_date=now - timedelta(hours=2),
+            duration_minutes=60,
+            end_time=now - timedelta(hours=1),
+            status="approved",
+        )
+    )
+    await db.commit()
+    await live_state.record_vote(db, _snapshot(), 10, 1)
+
+    assert await live_state.reconcile_finished(db) == 1
+    assert await live_state.get_tallies(EVENT_ID) is None
+    assert await redis_client.smembers(ACTIVE_EVENTS_KEY) == set()
+
+
+async def test_stream_snapshot_seeds_after_cold_start(db, live_state, redis_client):
+    await _add_feedback(db, 10, 1)
+    await _add_feedback(db, 11, -1)
+    end_time = _snapshot().end_time
+
+    tallies = await live_state.get_or_seed_tallies(db, EVENT_ID, end_time)
+
+    assert tallies == {"total": 2, "trust": 1, "distrust": 1, "voters": 2}
+    assert await live_state.get_tallies(EVENT_ID) == tallies
+    # Следующий голос дописывается к заполненному hash, а не к нулям
+    assert await live_state.record_vote(db, _snapshot(), 12, 1) is True
+    assert (await live_state.get_tallies(EVENT_ID))["total"] == 3
+
+
+async def test_stream_snapshot_of_finished_event_comes_from_mysql(db, live_state):
+    await _add_feedback(db, 10, 1)
+    end_time = datetime.now(timezone.utc) - timedelta(days=2)
+
+    tallies = await live_state.get_or_seed_tallies(db, EVENT_ID, end_time)
+
+    assert tallies == {"total": 1, "trust": 1, "distrust": 0, "voters": 1}
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.future import select
+
+from src.crud import outbox_crud
+from src.crud.broadcast_crud import BROADCAST_CHUNK
+from src.models import NotificationOutbox
+from src.services import notifier as notifier_module
+from src.services.outbox_worker import OutboxWorker
+
+LEASE_SECONDS = 300
+
+
+def _past(seconds: int = 1) -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+
+
+async def _add_rows(db, count: int, **values) -> list[int]:
+    rows = [
+        NotificationOutbox(
+            **{
+                "kind": "send_message",
+                "payload": {"peer_id": 1, "message": f"#{i}"},
+                "next_attempt_at": _past(),
+                **values,
+            }
+        )
+        for i in range(count)
+    ]
+    db.add_all(rows)
+    await db.commit()
+    return [row.id for row in rows]
+
+
+async def _get(session_factory, outbox_id: int) -> NotificationOutbox:
+    async with session_factory() as db:
+        result = await db.execute(
+            select(NotificationOutbox).where(NotificationOutbox.id == outbox_id)
+        )
+        return result.scalar_one()
+
+
+async def test_claim_leases_rows_once(db, session_factory):
+    ids = await _add_rows(db, 3)
+
+    async with session_factory() as session:
+        claimed = await outbox_crud.claim_due(session, 2, LEASE_SECONDS)
+    async with session_factory() as session:
+        rest = await outbox_crud.claim_due(session, 10, LEASE_SECONDS)
+    async with session_factory() as session:
+        again = await outbox_crud.claim_due(session, 10, LEASE_SECONDS)
+
+    assert len(claimed) == 2
+    assert sorted(row.id for row in claimed + rest) == ids
+    assert again == []
+    row = await _get(session_factory, claimed[0].id)
+    assert row.status == "processing"
+
+
+async def test_claim_skips_rows_not_due(db, session_factory):
+    future = datetime.now(timezone.utc) + timedelta(minutes=5)
+    await _add_rows(db, 1, next_attempt_at=future)
+
+    async with session_factory() as session:
+        assert await outbox_crud.claim_due(session, 10, LEASE_SECONDS) == []
+
+
+async def test_expired_lease_is_claimed_again(db, session_factory):
+    # Воркер взял строку и упал: аренда истекла, статус остался processing
+    [outbox_id] = await _add_rows(db, 1, status="processing", next_attempt_at=_past())
+
+    async with session_factory() as session:
+        claimed = await outbox_crud.claim_due(session, 10, LEASE_SECONDS)
+
+    assert [row.id for row in claimed] == [outbox_id]
+
+
+async def test_mark_failed_backs_off_then_dead(db, session_factory):
+    [outbox_id] = await _add_rows(db, 1)
+
+    async with session_factory() as session:
+        dead = await outbox_crud.mark_failed(session, outbox_id, 1, "boom", 3, 5)
+    row = await _get(session_factory, outbox_id)
+    assert not dead
+    assert row.status == "pending"
+    assert row.attempts == 1
+    async with session_factory() as session:
+        assert await outbox_crud.claim_due(session, 10, LEASE_SECONDS) == []
+
+    async with session_factory() as session:
+        dead = await outbox_crud.mark_failed(session, outbox_id, 3, "boom", 3, 5)
+    assert dead
+    assert (await _get(session_factory, outbox_id)).status == "dead"
+
+
+async def test_requeue_dead_keeps_broadcast_chunks(db, session_factory):
+    [message_id] = await _add_rows(db, 1, status="dead", attempts=8)
+    [chunk_id] = await _add_rows(db, 1, status="dead", kind=BROADCAST_CHUNK)
+
+    async with session_factory() as session:
+        assert await outbox_crud.requeue_dead(session) == 1
+
+    message = await _get(session_factory, message_id)
+    assert (message.status, message.attempts) == ("pending", 0)
+    assert (await _get(session_factory, chunk_id)).status == "dead"
+
+
+class FakeNotifier:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_message(self, peer_id: int, message: str):
+        if self.fail:
+            raise RuntimeError("VK is down")
+        self.sent.append((peer_id, message, notifier_module._message_random_id.get()))
+
+
+async def test_worker_marks_delivered_rows_sent(db, session_factory):
+    [outbox_id] = await _add_rows(db, 1)
+    notifier = FakeNotifier()
+    worker = OutboxWorker(session_factory, notifier, lease_seconds=LEASE_SECONDS)
+
+    assert await worker.run_once() == 1
+
+    assert notifier.sent == [
+        (1, "#0", outbox_crud.notification_random_id(outbox_id)),
+    ]
+    assert (await _get(session_factory, outbox_id)).status == "sent"
+
+
+async def test_worker_schedules_retry_on_failure(db, session_factory):
+    [outbox_id] = await _add_rows(db, 1)
+    worker = OutboxWorker(session_factory, FakeNotifier(fail=True), max_attempts=3)
+
+    await worker.run_once()
+
+    row = await _get(session_factory, outbox_id)
+    assert (row.status, row.attempts) == ("pending", 1)
+    assert "VK is down" in row.last_error
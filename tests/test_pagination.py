@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from src.core.pagination import decode_cursor, encode_cursor
+
+DATE_CURSOR = {"d": str, "id": int}
+TOP_CURSOR = {"o": int, "r": int}
+
+
+def test_roundtrip():
+    cursor = encode_cursor({"d": "2026-10-17T12:00:00+00:00", "id": 5})
+
+    assert decode_cursor(cursor, DATE_CURSOR) == {
+        "d": "2026-10-17T12:00:00+00:00",
+        "id": 5,
+    }
+    assert decode_cursor(None, DATE_CURSOR) is None
+
+
+@pytest.mark.parametrize(
+    "payload, fields",
+    [
+        ({"d": 1, "id": 5}, DATE_CURSOR),
+        ({"d": "2026-10-17", "id": "5"}, DATE_CURSOR),
+        ({"d": "2026-10-17"}, DATE_CURSOR),
+        ({"o": "x", "r": 3}, TOP_CURSOR),
+        ({"o": 20, "r": None}, TOP_CURSOR),
+        ({"o": True, "r": 3}, TOP_CURSOR),
+        ([1, 2], TOP_CURSOR),
+    ],
+)
+def test_malformed_payload_is_rejected(payload, fields):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(encode_cursor(payload), fields)
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24"])
+def test_garbage_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, TOP_CURSOR)
+    assert exc_info.value.status_code == 400
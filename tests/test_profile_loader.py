@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from src.crud import expert_crud
+from src.models import (
+    Category,
+    DonutSubscription,
+    Event,
+    ExpertProfile,
+    ExpertScore,
+    Theme,
+    User,
+)
+
+
+async def _seed_experts(db, count: int) -> list[int]:
+    category = Category(id=1, name="Наука")
+    themes = [Theme(name=f"Тема {i}", category=category) for i in range(3)]
+    db.add_all([category, *themes])
+
+    now = datetime.now(timezone.utc)
+    vk_ids = list(range(100, 100 + count))
+    for vk_id in vk_ids:
+        db.add(User(vk_id=vk_id, first_name="Имя", last_name=str(vk_id)))
+        db.add(
+            ExpertProfile(
+                user_vk_id=vk_id,
+                status="approved",
+                region="Москва",
+                selected_themes=themes[: vk_id % 3 + 1],
+            )
+        )
+        db.add(DonutSubscription(user_id=vk_id, is_active=True))
+        db.add(
+            ExpertScore(
+                expert_id=vk_id,
+                expert_trust=vk_id % 5,
+                expert_distrust=1,
+                community_trust=2,
+                community_distrust=0,
+            )
+        )
+        db.add(
+            Event(
+                expert_id=vk_id,
+                name="Лекция",
+                promo_word=f"PROMO{vk_id}",
+                event_date=now,
+                duration_minutes=60,
+                end_time=now + timedelta(minutes=60),
+                status="approved",
+            )
+        )
+    await db.commit()
+    db.expunge_all()
+    return vk_ids
+
+
+class _QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self._engine = engine.sync_engine
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self._engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self._engine, "before_cursor_execute", self._on_execute)
+
+
+async def _count_batch_queries(engine, session_factory, vk_ids) -> tuple[int, dict]:
+    async with session_factory() as db:
+        with _QueryCounter(engine) as counter:
+            hydrated = await expert_crud.get_user_profiles_batch(db, vk_ids)
+    return counter.count, hydrated
+
+
+async def test_batch_loader_query_count_does_not_grow(engine, session_factory):
+    async with session_factory() as db:
+        vk_ids = await _seed_experts(db, 25)
+
+    single, _ = await _count_batch_queries(engine, session_factory, vk_ids[:1])
+    many, hydrated = await _count_batch_queries(engine, session_factory, vk_ids)
+
+    assert single > 0
+    assert many == single
+    assert len(hydrated) == 25
+
+
+async def test_batch_loader_builds_stats_and_topics(db):
+    vk_ids = await _seed_experts(db, 3)
+
+    hydrated = await expert_crud.get_user_profiles_batch(db, vk_ids + [999])
+
+    assert set(hydrated) == set(vk_ids)
+    user, profile, stats, topics = hydrated[101]
+    assert user.vk_id == 101
+    assert profile.status == "approved"
+    assert stats["expert"] == 101 % 5 - 1
+    assert stats["community"] == 2
+    assert stats["events_count"] == 1
+    assert sorted(topics) == ["Наука > Тема 0", "Наука > Тема 1", "Наука > Тема 2"]
+    assert user.subscription.is_active
+
+
+async def test_batch_loader_empty_list_skips_queries(engine, session_factory):
+    queries, hydrated = await _count_batch_queries(engine, session_factory, [])
+
+    assert queries == 0
+    assert hydrated == {}
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from src.core import dependencies
+from src.core.circuit_breaker import CircuitBreaker
+from src.core.exceptions import TokenCheckUnavailableError
+from src.core.rate_limiter import RateLimitTimeout, VkRateLimiter
+
+
+async def test_burst_passes_then_waits_for_refill(redis_client):
+    limiter = VkRateLimiter(redis_client, "token", rate=5, burst=2)
+
+    started = time.monotonic()
+    await limiter.acquire()
+    await limiter.acquire()
+    assert time.monotonic() - started < 0.15
+
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+
+    stats = limiter.get_stats()
+    assert stats["acquired"] == 3
+    assert stats["wait_seconds_max"] >= 0.1
+
+
+async def test_max_wait_raises_timeout(redis_client):
+    limiter = VkRateLimiter(redis_client, "token", rate=1)
+    await limiter.acquire()
+
+    with pytest.raises(RateLimitTimeout):
+        await limiter.acquire(max_wait=0.05)
+    assert limiter.get_stats()["timeouts"] == 1
+
+
+async def test_limit_is_shared_per_token(redis_client):
+    first = VkRateLimiter(redis_client, "token", rate=1)
+    second_worker = VkRateLimiter(redis_client, "token", rate=1)
+    other_token = VkRateLimiter(redis_client, "other", rate=1)
+
+    await first.acquire()
+    with pytest.raises(RateLimitTimeout):
+        await second_worker.acquire(max_wait=0.05)
+    await other_token.acquire(max_wait=0.05)
+
+
+async def test_waiters_queue_inside_worker(redis_client):
+    limiter = VkRateLimiter(redis_client, "token", rate=50, burst=1)
+
+    await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+
+    assert limiter.get_stats()["queue_depth"] == 0
+    assert limiter.get_stats()["acquired"] == 4
+
+
+async def test_redis_outage_passes_through():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    limiter = VkRateLimiter(client, "token", rate=1)
+
+    await limiter.acquire(max_wait=0.05)
+    await limiter.acquire(max_wait=0.05)
+    await client.aclose()
+
+
+async def test_limiter_timeout_does_not_take_breaker_trial(monkeypatch, redis_client):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, trial_timeout=60)
+    breaker.record_failure()
+    limiter = VkRateLimiter(redis_client, "service", rate=1)
+    await limiter.acquire()
+    monkeypatch.setattr(dependencies, "vk_breaker", breaker)
+    monkeypatch.setattr(dependencies, "vk_service_limiter", limiter)
+    monkeypatch.setattr(dependencies.settings, "VK_SERVICE_MAX_WAIT", 0.05)
+
+    with pytest.raises(TokenCheckUnavailableError):
+        await dependencies._check_token_via_vk("token")
+
+    # Очередь лимита не добралась до размыкателя: пробная попытка свободна
+    assert breaker.allow()
@@ -0,0 +1,144 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.core import dependencies
+from src.core.circuit_breaker import CircuitBreaker
+from src.core.exceptions import InvalidTokenError, TokenCheckUnavailableError
+from src.core.rate_limiter import VkRateLimiter
+
+RESET_TIMEOUT = 0.05
+
+
+class FakeVk:
+    """secure.checkToken, отвечающий по сценарию теста."""
+
+    def __init__(self):
+        self.calls = 0
+        self.mode = "ok"
+        self.release = asyncio.Event()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.mode == "down":
+            return httpx.Response(502)
+        if self.mode == "hang":
+            await self.release.wait()
+        if self.mode == "invalid":
+            return httpx.Response(
+                200, json={"error": {"error_code": 5, "error_msg": "bad token"}}
+            )
+        if self.mode == "flood":
+            return httpx.Response(
+                200, json={"error": {"error_code": 6, "error_msg": "too many"}}
+            )
+        return httpx.Response(200, json={"response": {"user_id": 42}})
+
+
+@pytest.fixture
+async def fake_vk(monkeypatch, redis_client):
+    vk = FakeVk()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(vk.handler))
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+    monkeypatch.setattr(dependencies, "vk_http", client)
+    monkeypatch.setattr(dependencies, "vk_breaker", breaker)
+    monkeypatch.setattr(
+        dependencies,
+        "vk_service_limiter",
+        VkRateLimiter(redis_client, "service", rate=1000),
+    )
+    vk.breaker = breaker
+    yield vk
+    await client.aclose()
+
+
+async def test_valid_token_returns_user_id(fake_vk):
+    assert await dependencies._check_token_via_vk("token") == 42
+    assert fake_vk.breaker.state == "closed"
+
+
+async def test_invalid_token_is_not_a_vk_failure(fake_vk):
+    fake_vk.mode = "invalid"
+
+    with pytest.raises(InvalidTokenError):
+        await dependencies._check_token_via_vk("token")
+    assert fake_vk.breaker.get_stats()["consecutive_failures"] == 0
+
+
+@pytest.mark.parametrize("mode", ["down", "flood"])
+async def test_failures_open_breaker_without_calling_vk(fake_vk, mode):
+    fake_vk.mode = mode
+    for _ in range(2):
+        with pytest.raises(TokenCheckUnavailableError):
+            await dependencies._check_token_via_vk("token")
+    assert fake_vk.breaker.state == "open"
+
+    with pytest.raises(TokenCheckUnavailableError):
+        await dependencies._check_token_via_vk("token")
+    assert fake_vk.calls == 2
+
+
+async def test_half_open_trial_closes_breaker_on_success(fake_vk):
+    fake_vk.mode = "down"
+    for _ in range(2):
+        with pytest.raises(TokenCheckUnavailableError):
+            await dependencies._check_token_via_vk("token")
+
+    await asyncio.sleep(RESET_TIMEOUT)
+    fake_vk.mode = "ok"
+
+    assert await dependencies._check_token_via_vk("token") == 42
+    assert fake_vk.breaker.state == "closed"
+
+
+async def test_only_one_trial_in_half_open(fake_vk):
+    fake_vk.mode = "down"
+    for _ in range(2):
+        with pytest.raises(TokenCheckUnavailableError):
+            await dependencies._check_token_via_vk("token")
+    await asyncio.sleep(RESET_TIMEOUT)
+
+    fake_vk.mode = "hang"
+    trial = asyncio.create_task(dependencies._check_token_via_vk("token"))
+    await asyncio.sleep(0.01)
+    with pytest.raises(TokenCheckUnavailableError):
+        await dependencies._check_token_via_vk("token")
+
+    fake_vk.release.set()
+    assert await trial == 42
+    assert fake_vk.breaker.state == "closed"
+
+
+async def test_cancelled_trial_does_not_keep_breaker_open(fake_vk):
+    fake_vk.mode = "down"
+    for _ in range(2):
+        with pytest.raises(TokenCheckUnavailableError):
+            await dependencies._check_token_via_vk("token")
+    await asyncio.sleep(RESET_TIMEOUT)
+
+    fake_vk.mode = "hang"
+    trial = asyncio.create_task(dependencies._check_token_via_vk("token"))
+    await asyncio.sleep(0.01)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    fake_vk.mode = "ok"
+    assert await dependencies._check_token_via_vk("token") == 42
+    assert fake_vk.breaker.state == "closed"
+
+
+def test_lost_trial_expires_after_trial_timeout(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.core.circuit_breaker.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, trial_timeout=5)
+    breaker.record_failure()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # Исход пробной попытки так и не записан
+    now[0] += 5
+    assert breaker.allow()
@@ -0,0 +1,66 @@
+import pytest
+
+from src.core.vk_launch_params import verify_launch_params
+
+SECRET = "test_secret_key"
+APP_ID = 51234567
+ISSUED_AT = 1760000000
+MAX_AGE = 3600
+
+# Подпись посчитана независимо:
+# printf '%s' '<vk_* параметры>' | openssl dgst -sha256 -hmac test_secret_key -binary
+#   | base64 | tr '+/' '-_' | tr -d '='
+SIGNED_QUERY = (
+    "vk_app_id=51234567&vk_is_app_user=1&vk_language=ru"
+    "&vk_platform=mobile_android&vk_ts=1760000000&vk_user_id=494075"
+    "&sign=FRoCP7czMW2wSr7OCWpfPKX0bGfn-uj21C6fVjgYsYU"
+)
+
+
+def _verify(query: str, app_id: int = APP_ID, now: float = ISSUED_AT + 10):
+    return verify_launch_params(query, SECRET, app_id, MAX_AGE, now=now)
+
+
+def test_known_good_params():
+    assert _verify(SIGNED_QUERY) == 494075
+    assert _verify("?" + SIGNED_QUERY + "&utm_source=feed") == 494075
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        SIGNED_QUERY.replace("vk_user_id=494075", "vk_user_id=1"),
+        SIGNED_QUERY.replace("vk_ts=1760000000", "vk_ts=1760003000"),
+        SIGNED_QUERY.replace("sign=FRoC", "sign=XRoC"),
+        SIGNED_QUERY + "&vk_are_notifications_enabled=1",
+        SIGNED_QUERY.split("&sign=")[0],
+    ],
+    ids=["user_id", "vk_ts", "sign", "extra_vk_param", "no_sign"],
+)
+def test_tampered_params_are_rejected(query):
+    assert _verify(query) is None
+
+
+@pytest.mark.parametrize("sign", ["%D0%B9", "%D0%B9" * 43, "%00"])
+def test_non_ascii_sign_is_rejected(sign):
+    query = SIGNED_QUERY.split("&sign=")[0] + "&sign=" + sign
+
+    assert _verify(query) is None
+
+
+def test_other_app_is_rejected():
+    assert _verify(SIGNED_QUERY, app_id=APP_ID + 1) is None
+
+
+@pytest.mark.parametrize(
+    "now",
+    [ISSUED_AT + MAX_AGE + 1, ISSUED_AT - 120],
+    ids=["stale", "from_future"],
+)
+def test_vk_ts_out_of_window_is_rejected(now):
+    assert _verify(SIGNED_QUERY, now=now) is None
+
+
+def test_missing_secret_or_app_id():
+    assert verify_launch_params(SIGNED_QUERY, "", APP_ID, MAX_AGE) is None
+    assert verify_launch_params(SIGNED_QUERY, SECRET, 0, MAX_AGE) is None
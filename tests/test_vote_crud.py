@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.crud import vote_crud
+
+
+class FlakyWrite:
+    """_write_vote, который первые failures раз падает с кодом MySQL code."""
+
+    def __init__(self, failures: int = 1, code: int = vote_crud.DEADLOCK_ERROR_CODE):
+        self.calls = 0
+        self.failures = failures
+        self.code = code
+
+    async def __call__(self, db, *args):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OperationalError("INSERT ...", {}, Exception(self.code, "error"))
+
+
+async def _vote(db, monkeypatch, write: FlakyWrite):
+    monkeypatch.setattr(vote_crud, "_write_vote", write)
+    await vote_crud.write_vote(db, 1, 2, "community", 1, None)
+
+
+async def test_deadlock_is_retried(db, monkeypatch):
+    write = FlakyWrite()
+
+    await _vote(db, monkeypatch, write)
+
+    assert write.calls == 2
+
+
+async def test_retries_are_limited(db, monkeypatch):
+    write = FlakyWrite(failures=vote_crud.WRITE_VOTE_ATTEMPTS)
+
+    with pytest.raises(OperationalError):
+        await _vote(db, monkeypatch, write)
+    assert write.calls == vote_crud.WRITE_VOTE_ATTEMPTS
+
+
+async def test_other_errors_are_not_retried(db, monkeypatch):
+    # 2013: потеряно соединение с сервером
+    write = FlakyWrite(code=2013)
+
+    with pytest.raises(OperationalError):
+        await _vote(db, monkeypatch, write)
+    assert write.calls == 1